@@ -0,0 +1,36 @@
+"""
+MapReduce input compressor.
+
+Compress input files to block gzip, so that the Manager can split large
+files across map tasks.  Output files are still valid gzip, readable with
+zcat.
+$ mapreduce-compress tests/testdata/input/file01 -o file01.gz
+"""
+
+import pathlib
+import click
+from mapreduce import utils
+
+
+@click.command()
+@click.argument(
+    "infiles", nargs=-1, required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+)
+@click.option(
+    "--output", "-o", "output", default=None, type=click.Path(),
+    help="Output file for a single input, default=input file name + .gz",
+)
+@click.option(
+    "--level", "level", default=6, type=click.IntRange(1, 9),
+    help="Compression level, default=6",
+)
+def main(infiles, output, level):
+    """Compress each input file to block gzip."""
+    if output and len(infiles) > 1:
+        raise click.UsageError("--output requires a single input file")
+    for infile in infiles:
+        outfile = pathlib.Path(output or f"{infile}.gz")
+        with infile.open("rb") as source, outfile.open("wb") as target:
+            utils.write_block_gzip(source, target, level)
+        print(outfile)
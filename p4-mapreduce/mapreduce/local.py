@@ -0,0 +1,146 @@
+"""
+MapReduce local runner.
+
+Run a job in one process, without a Manager or Workers.  Map and reduce
+tasks run in a multiprocessing pool and produce the same output files as a
+cluster would.  Everything has a default.
+$ mapreduce-local
+
+You can change any of the options.
+$ mapreduce-local --help
+"""
+
+import functools
+import logging
+import multiprocessing
+import pathlib
+import tempfile
+from typing import Optional
+import click
+from mapreduce import utils
+from mapreduce.submit import validate_grouping, validate_sort_keys
+from mapreduce.worker.__main__ import worker_map, worker_reduce
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+
+def run_job(job, processes=None):
+    """Run a job to completion in a pool of processes.
+
+    job has the same keys as a new_manager_job message.  Tasks are split
+    exactly as the Manager splits them and run by the same functions as on a
+    Worker, so the output matches a cluster run, including the _SUCCESS
+    marker.  If the job fails, a previous run's output is put back, see
+    utils.output.
+    """
+    output_dir = pathlib.Path(job["output_directory"])
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    utils.stage_output(output_dir)
+    try:
+        run_stages(job, output_dir, processes)
+    except BaseException:
+        utils.restore_output(output_dir)
+        raise
+    utils.commit_job(output_dir)
+
+
+def run_stages(job, output_dir, processes):
+    """Run a job's map and reduce stages, reduce output goes to output_dir."""
+    prefix = "mapreduce-local-job-"
+    with tempfile.TemporaryDirectory(prefix=prefix) as tmpdir, \
+            multiprocessing.Pool(processes) as pool:
+        tasks = utils.map_tasks(job["input_directory"], job["num_mappers"])
+        settings = {"partition_fields": job.get("partition_fields"),
+                    "sort_keys": job.get("sort_keys")}
+        if job.get("total_order"):
+            settings["splits"] = utils.sample_splits(
+                job["mapper_executable"],
+                [path for paths in tasks.values() for path in paths],
+                job["num_reducers"],
+            )
+        pool.starmap(functools.partial(worker_map, settings=settings), [
+            (job["mapper_executable"], input_paths, job["num_reducers"],
+             tmpdir, task_id)
+            for task_id, input_paths in sorted(tasks.items())
+        ])
+        LOGGER.info("Map stage done")
+
+        tasks = utils.reduce_tasks(tmpdir)
+        pool.starmap(functools.partial(worker_reduce, settings=settings), [
+            (job["reducer_executable"], input_paths, str(output_dir), task_id)
+            for task_id, input_paths in sorted(tasks.items())
+        ])
+        LOGGER.info("Reduce stage done")
+
+
+# Configure command line options
+@click.command()
+@click.option(
+    "--input", "-i", "input_directory", default="tests/testdata/input",
+    help="Input directory, default=tests/testdata/input",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--output", "-o", "output_directory", default="output",
+    help="Output directory, default=output",
+    type=click.Path(exists=False, file_okay=False, dir_okay=True),
+)
+@click.option(
+    "--mapper", "-m", "mapper_executable",
+    default="tests/testdata/exec/wc_map.sh",
+    help="Mapper executable, default=tests/testdata/exec/wc_map.sh",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--reducer", "-r", "reducer_executable",
+    default="tests/testdata/exec/wc_reduce.sh",
+    help="Reducer executable, default=tests/testdata/exec/wc_reduce.sh",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+)
+@click.option(
+    "--nmappers", "num_mappers", default=2, type=int,
+    help="Number of mappers, default=2",
+)
+@click.option(
+    "--nreducers", "num_reducers", default=2, type=int,
+    help="Number of reducers, default=2",
+)
+@click.option(
+    "--processes", "processes", default=None, type=int,
+    help="Number of processes running tasks, default=number of CPUs",
+)
+@click.option(
+    "--total-order", "total_order", is_flag=True, default=False,
+    help="Range partition by sampled keys so that the output files "
+         "concatenate in sorted order",
+)
+@click.option(
+    "--partition-fields", "partition_fields", default=None,
+    type=click.IntRange(min=1),
+    help="Number of leading fields that partition and group map output, "
+         "default=1",
+)
+@click.option(
+    "--sort-key", "-k", "sort_keys", multiple=True,
+    callback=validate_sort_keys,
+    help="Field that orders map output, e.g. 2nr for the second field, "
+         "numeric, reversed, may be repeated, default=whole line",
+)
+@click.option("--loglevel", "loglevel", default="warning")
+def main(processes: Optional[int], loglevel: str, **job) -> None:
+    """Top level command line interface."""
+    if job["total_order"] and job["sort_keys"]:
+        raise click.UsageError(
+            "--total-order partitions by text order, use it without --sort-key"
+        )
+    validate_grouping(job["sort_keys"], job["partition_fields"])
+    logging.basicConfig(format="Local [%(levelname)s] %(message)s",
+                        level=loglevel.upper())
+    run_job(job, processes)
+
+    # Print to CLI
+    print("Finished job locally")
+    for path in sorted(pathlib.Path(job["output_directory"]).glob("part-*")):
+        print("output file         ", path)
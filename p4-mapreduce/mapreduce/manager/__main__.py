@@ -1,13 +1,13 @@
 """MapReduce framework Manager node."""
 import heapq
 import os
-import shutil
 import socket
+import subprocess
 import tempfile
+import time
 import logging
 import json
 import threading
-import time
 from collections import deque
 import pathlib
 import click
@@ -17,12 +17,32 @@ from mapreduce import utils
 # Configure logging
 LOGGER = logging.getLogger(__name__)
 
+# Job options passed on to map and reduce tasks when set
+MAP_OPTIONS = ("partition_splits", "partition_fields", "sort_keys")
+REDUCE_OPTIONS = ("sort_keys",)
+
+# Per-task demands a job may declare, and the Worker capacity each needs
+TASK_DEMANDS = {"task_memory_mb": "memory_mb", "task_cpus": "cpus"}
+
+# Seconds between checks of Worker liveness
+HEARTBEAT_CHECK_INTERVAL = 0.5
+
+# Seconds no live Worker must have room for a job's tasks before the job
+# fails, so Workers that register late or are wrongly declared dead and
+# come back can still run it
+UNPLACEABLE_GRACE = 3 * utils.liveness.HEARTBEAT_INTERVAL
+
 
 class Manager:
     """Represent a MapReduce framework Manager node."""
 
-    def __init__(self, host, port):
-        """Construct a Manager instance and start listening for messages."""
+    def __init__(self, host, port, *, options=None):
+        """Construct a Manager instance and start listening for messages.
+
+        options may set "max_workers" to start and stop local Workers with
+        demand, keeping at least "min_workers" live.  Started Workers log to
+        options["log_dir"].
+        """
         LOGGER.info(
             "Starting manager host=%s port=%s",
             host, port,
@@ -38,21 +58,30 @@ class Manager:
         self.register_order = []  # (state, order, host, port)
         self.job_queue = deque()
         self.dead_task = deque()
-        self.signals = {"shutdown": False, "job_id": 0, "finished_task": []}
-
-        self.threads = {"udp_thread": threading.Thread(target=self.server_udp),
-                        "job_thread": threading.Thread(target=self.run_job),
-                        "fault_fix": threading.Thread(
-                            target=self.check_heartbeat)}
-
-        self.threads["udp_thread"].start()
-        self.threads["job_thread"].start()
-        self.threads["fault_fix"].start()
+        self.signals = {"shutdown": False, "job_id": 0, "finished_task": set(),
+                        "failures": utils.FailureTracker(), "trace": None,
+                        "pending": deque(), "autoscaler": None,
+                        "stage": None, "unplaceable_since": None}
+
+        # Guards all shared state above.  The job thread waits on it and the
+        # message handlers notify it whenever a Worker or job changes state.
+        self.lock = threading.Condition(threading.RLock())
+
+        threads = [threading.Thread(target=self.server_udp),
+                   threading.Thread(target=self.run_job),
+                   threading.Thread(target=self.check_heartbeat)]
+        options = options or {}
+        if options.get("max_workers"):
+            self.signals["autoscaler"] = utils.Autoscaler(
+                (host, port), options.get("min_workers") or 0,
+                options["max_workers"], options.get("log_dir"),
+            )
+            threads.append(threading.Thread(target=self.autoscale))
+        for thread in threads:
+            thread.start()
         self.server_tcp()
-
-        self.threads["udp_thread"].join()  # for shutdown test
-        self.threads["job_thread"].join()
-        self.threads["fault_fix"].join()
+        for thread in threads:
+            thread.join()  # for shutdown test
 
     def server_tcp(self):
         """Wait on a message from a socket OR a shutdown signal."""
@@ -72,8 +101,6 @@ class Manager:
             sock.settimeout(1)
 
             while not self.signals["shutdown"]:
-                # LOGGER.info("TCP waiting ...")
-                time.sleep(0.1)
                 try:
                     clientsocket, _ = sock.accept()
                 except socket.timeout:
@@ -86,59 +113,91 @@ class Manager:
 
                 LOGGER.debug("Manager TCP recv \n%s",
                              json.dumps(message_dict, indent=2), )
-
-                # shutdown when receive special shutdown message
-                if message_dict.get('message_type', "") == "shutdown":
-                    # forward msg to all workers
-                    shut_thread = threading.Thread(target=self.shut_workers)
-                    shut_thread.start()
-                    shut_thread.join()
-                    LOGGER.info("========== WORKERS ALL SHUTDOWN ===========")
-                    self.signals['shutdown'] = True
-                elif message_dict.get('message_type', "") == "register":
-                    if (message_dict['worker_host'],
-                        message_dict['worker_port']) in \
-                            self.workers:
-                        self.worker_die(message_dict['worker_host'],
-                                        message_dict['worker_port'])
-                        LOGGER.info("This worker revives")
-                    self.workers[(message_dict['worker_host'],
-                                  message_dict['worker_port'])] \
-                        = {'state': 0, 'missed_heartbeat': 0}
-                    heapq.heappush(self.register_order,
-                                   [0, len(self.register_order),
-                                    message_dict['worker_host'],
-                                    message_dict['worker_port']])
-                    # send back ACK
-                    ack_thread = threading.Thread(
-                        target=self.ack,
-                        args=(message_dict['worker_host'],
-                              message_dict['worker_port']))
-                    ack_thread.start()
-                    ack_thread.join()
-                    LOGGER.info("================= ACK SENT ===============")
-                elif message_dict.get('message_type', "") == "new_manager_job":
-                    message_dict["job_id"] = self.signals["job_id"]
-                    self.signals["job_id"] += 1
-                    self.job_queue.append(message_dict)
-                elif message_dict.get('message_type', "") == "finished":
-                    num_workers = len(self.register_order)
-                    for i in range(num_workers):
-                        if self.register_order[i][2] == \
-                                message_dict["worker_host"] \
-                                and self.register_order[i][3] == \
-                                message_dict["worker_port"]:
-                            self.workers[
-                                (message_dict["worker_host"],
-                                 message_dict["worker_port"])]["state"] = 0
-                            self.register_order[i][0] = 0  # busy -> ready
-                            heapq.heapify(self.register_order)
-                            break
-                    self.signals["finished_task"].append(
-                        message_dict["task_id"])
+                self.handle_tcp_message(message_dict)
 
         LOGGER.info("server TCP shutting down")
 
+    def handle_tcp_message(self, message_dict):
+        """Update Manager state for one TCP message."""
+        message_type = message_dict.get("message_type", "")
+        with self.lock:
+            # shutdown when receive special shutdown message
+            if message_type == "shutdown":
+                # forward msg to all workers
+                self.shut_workers()
+                LOGGER.info("========== WORKERS ALL SHUTDOWN ===========")
+                self.signals['shutdown'] = True
+            elif message_type == "register":
+                self.register(message_dict["worker_host"],
+                              message_dict["worker_port"], message_dict)
+            elif message_type == "new_manager_job":
+                message_dict["job_id"] = self.signals["job_id"]
+                self.signals["job_id"] += 1
+                self.job_queue.append(message_dict)
+            elif message_type in ("finished", "failed"):
+                self.task_result(message_dict)
+            self.lock.notify_all()
+
+    def task_result(self, message_dict):
+        """Count a Worker's finished or failed task, unless it is stale.
+
+        A result counts only for the task the Worker was last assigned, in
+        the stage that is running.  A Worker declared dead may still finish
+        its task after the task was assigned again, or during the next
+        stage, where the same task id is another task.
+        """
+        host, port = message_dict["worker_host"], message_dict["worker_port"]
+        info = self.workers.get((host, port))
+        if info is None or \
+                info.get("task", (None, None))[1] != message_dict["task_id"]:
+            LOGGER.warning("Ignoring result of task %s from Worker %s:%d, "
+                           "it was not assigned the task",
+                           message_dict["task_id"], host, port)
+            return
+        stage, task_id = info.pop("task")
+        worker = self.registered_worker(host, port)
+        info["state"] = 0
+        worker[0] = 0  # busy -> ready
+        heapq.heapify(self.register_order)
+        if stage != self.signals["stage"]:
+            LOGGER.warning("Ignoring result of task %s from Worker %s:%d, "
+                           "its stage is over", task_id, host, port)
+            return
+        if "trace" in message_dict and self.signals["trace"]:
+            self.signals["trace"].add(
+                message_dict, self.signals["failures"].stage)
+        if message_dict["message_type"] == "finished":
+            # Duplicate attempts of a task count once
+            self.signals["finished_task"].add(task_id)
+            if task_id in self.dead_task:
+                self.dead_task.remove(task_id)
+        else:
+            self.task_failed(task_id, host, port,
+                             message_dict.get("error", ""))
+
+    def register(self, host, port, message_dict):
+        """Add a Worker, or revive it if it registered before."""
+        if (host, port) in self.workers:
+            self.worker_die(host, port)
+            LOGGER.info("This worker revives")
+        self.workers[(host, port)] = {
+            'state': 0, 'liveness': utils.PhiAccrualDetector(),
+            'suspect': False,
+            'memory_mb': message_dict.get('memory_mb'),
+            'cpus': message_dict.get('cpus'),
+        }
+        heapq.heappush(self.register_order,
+                       [0, len(self.register_order), host, port])
+        # send back ACK
+        self.ack(host, port)
+        LOGGER.info("================= ACK SENT ===============")
+
+    def registered_worker(self, host, port):
+        """Return the latest register_order entry of a Worker, or None."""
+        entries = [worker for worker in self.register_order
+                   if worker[2] == host and worker[3] == port]
+        return max(entries, key=lambda worker: worker[1], default=None)
+
     def server_udp(self):
         """Wait on a message from a socket OR a shutdown signal."""
         LOGGER.info("Start UDP server thread")
@@ -153,7 +212,6 @@ class Manager:
 
             # Receive incoming UDP messages
             while not self.signals["shutdown"]:
-                time.sleep(0.1)
                 try:
                     message_bytes = sock.recv(4096)
                 except socket.timeout:
@@ -169,9 +227,10 @@ class Manager:
                     # recv a heartbeat, update worker
                     host, port = message_dict['worker_host'], \
                                  message_dict['worker_port']
-                    if (host, port) in self.workers:
-                        # ignore heartbeat before worker registration
-                        self.workers[(host, port)]['missed_heartbeat'] = 0
+                    with self.lock:
+                        if (host, port) in self.workers:
+                            # ignore heartbeat before worker registration
+                            self.workers[(host, port)]['liveness'].heartbeat()
                 LOGGER.debug("UDP recv \n%s",
                              json.dumps(message_dict, indent=2), )
 
@@ -202,18 +261,18 @@ class Manager:
         """Handle job running."""
         LOGGER.info("Start job thread")
         while not self.signals["shutdown"]:
-            time.sleep(0.1)
-            if self.job_queue:
+            with self.lock:
+                self.lock.wait_for(lambda: self.job_queue or
+                                   self.signals["shutdown"], timeout=1)
+                job = self.job_queue.popleft() if self.job_queue else None
+            if job:
                 # have new job to run
                 LOGGER.info("Detect new job.")
-                job = self.job_queue.popleft()
                 job_id = job["job_id"]
 
+                # Previous output is deleted only once this job commits
                 output_dir = pathlib.Path(job["output_directory"])
-                if pathlib.Path.exists(output_dir):
-                    # remove existing output dir
-                    shutil.rmtree(output_dir)
-                output_dir.mkdir()
+                utils.stage_output(output_dir)
                 LOGGER.info("Created output_dir %s", output_dir)
 
                 prefix = f"mapreduce-shared-job{job_id:05d}-"
@@ -221,204 +280,369 @@ class Manager:
                     LOGGER.info("Created tmpdir %s", tmpdir)
 
                     # Mapping
-                    input_dir = pathlib.Path(job["input_directory"])
-                    files = []
-                    for filename in input_dir.iterdir():
-                        files.append(str(filename))
-                    files.sort()
-                    LOGGER.info(files)
-
-                    tasks = {}
-                    for i, filename in enumerate(files):
-                        task_id = i % job["num_mappers"]
-                        if task_id not in tasks:
-                            tasks[task_id] = [filename]
-                        else:
-                            tasks[task_id].append(filename)
-
-                    self.run_map(tasks, job, tmpdir)
-                    self.signals["finished_task"].clear()
+                    # Memoized tasks keep their inputs as inputs are added
+                    tasks = utils.map_tasks(job["input_directory"],
+                                            job["num_mappers"],
+                                            stable=bool(job.get("memo_dir")))
+                    LOGGER.info(tasks)
+
+                    self.signals["failures"] = utils.FailureTracker(
+                        job.get("max_task_attempts"),
+                        job.get("max_job_failures"),
+                    )
+                    self.signals["trace"] = utils.JobTrace(job_id)
+                    self.signals["unplaceable_since"] = None
+                    if job.get("total_order") and not sample_partitions(
+                            tasks, job, self.signals["failures"]):
+                        self.job_failed(job, output_dir)
+                        continue
+                    with self.signals["trace"].span("map stage"):
+                        self.run_map(tasks, job, tmpdir)
+                    with self.lock:
+                        self.signals["finished_task"].clear()
+                    if self.signals["failures"].failed:
+                        self.job_failed(job, output_dir)
+                        continue
+                    LOGGER.info("Map stage done job_id=%s", job_id)
 
                     # Reducing
-                    input_dir = pathlib.Path(str(tmpdir))
-                    files = []
-                    for filename in input_dir.iterdir():
-                        files.append(str(filename))
-                    files.sort()
-                    LOGGER.info(files)
-
-                    tasks = {}
-                    for filename in files:
-                        task_id = int(filename[-5:])
-                        if task_id not in tasks:
-                            tasks[task_id] = [filename]
-                        else:
-                            tasks[task_id].append(filename)
-
-                    self.run_reduce(tasks, job, output_dir)
-                    self.signals["finished_task"].clear()
+                    tasks = utils.reduce_tasks(tmpdir)
+                    LOGGER.info(tasks)
+
+                    with self.signals["trace"].span("reduce stage"):
+                        self.run_reduce(tasks, job, output_dir)
+                    with self.lock:
+                        self.signals["finished_task"].clear()
+                    if self.signals["failures"].failed:
+                        self.job_failed(job, output_dir)
+                        continue
+                    if not self.signals["shutdown"]:
+                        utils.commit_job(output_dir)
+                    write_trace(self.signals["trace"], job)
+                    LOGGER.info("Reduce stage done job_id=%s", job_id)
 
                 LOGGER.info("Current job done. Move to next job.")
                 LOGGER.info("Cleaned up tmpdir %s", tmpdir)
 
+    def job_failed(self, job, output_dir):
+        """Log why a job failed and write diagnostics to its output dir.
+
+        The output of the last job that succeeded is put back, so _FAILED
+        may be next to its _SUCCESS.
+        """
+        utils.restore_output(output_dir)
+        diagnostics = {"job_id": job["job_id"],
+                       **self.signals["failures"].diagnostics()}
+        LOGGER.error("Job failed job_id=%s: %s", job["job_id"],
+                     diagnostics["reason"])
+        with open(pathlib.Path(output_dir, "_FAILED"), "w",
+                  encoding="utf-8") as outfile:
+            json.dump(diagnostics, outfile, indent=2)
+        write_trace(self.signals["trace"], job)
+
     def run_map(self, tasks, job, tmpdir):
-        """Run map stage."""
-        task_id = 0
-        while not self.signals["shutdown"] \
-                and task_id < len(tasks):
-            time.sleep(0.1)
-            # allocate tasks to workers
-            if not self.register_order:
-                continue
-            if self.register_order[0][0] == 0:
-                LOGGER.info("Current task id %s", task_id)
-                LOGGER.info("Current workers %s", self.register_order)
-                host = self.register_order[0][2]
-                port = self.register_order[0][3]
-                LOGGER.info("SEND TASK TO worker %s", port)
-                message_dict = {
-                    "message_type": "new_map_task",
-                    "task_id": task_id,
-                    "input_paths": tasks[task_id],
-                    "executable": job["mapper_executable"],
-                    "output_directory": str(tmpdir),
-                    "num_partitions": job["num_reducers"],
-                    "worker_host": host,
-                    "worker_port": port
-                }
-                if not utils.send_tcp_message(
-                        host, port, message_dict):
-                    self.worker_die(host, port)
-                    continue
-                self.workers[host, port]["state"] = 1
-                self.workers[host, port]["task_id"] = task_id
-                self.register_order[0][0] = 1  # ready -> busy
-                heapq.heapify(self.register_order)  # reorder
-                task_id += 1
-        LOGGER.info("Task Allocation Done")
-        # check job done
-        while not self.signals["shutdown"] and \
-                len(self.signals["finished_task"]) != len(tasks):
-            time.sleep(0.1)  # wait for all tasks to be finished
-            if self.dead_task and self.register_order[0][0] == 0:
-                task_id = self.dead_task.popleft()
-                LOGGER.info("Current dead task id %s", task_id)
-                LOGGER.info("Current workers %s", self.register_order)
-                host = self.register_order[0][2]
-                port = self.register_order[0][3]
-                LOGGER.info("SEND DEAD TASK TO worker %s", port)
-                message_dict = {
-                    "message_type": "new_map_task",
-                    "task_id": task_id,
-                    "input_paths": tasks[task_id],
-                    "executable": job["mapper_executable"],
-                    "output_directory": str(tmpdir),
-                    "num_partitions": job["num_reducers"],
-                    "worker_host": host,
-                    "worker_port": port
-                }
-                if not utils.send_tcp_message(
-                        host, port, message_dict):
-                    self.worker_die(host, port)
-                    self.dead_task.appendleft(task_id)
-                    continue
-                self.workers[host, port]["state"] = 1
-                self.workers[host, port]["task_id"] = task_id
-                self.register_order[0][0] = 1  # ready -> busy
-                heapq.heapify(self.register_order)  # reorder
+        """Run map stage.
+
+        When the job sets memo_dir, map tasks whose output is cached there are
+        not run, and the output of the tasks that do run is added to it.
+        """
+        def new_map_task(task_id):
+            return {
+                "message_type": "new_map_task",
+                "task_id": task_id,
+                "input_paths": tasks[task_id],
+                "executable": job["mapper_executable"],
+                "output_directory": str(tmpdir),
+                "num_partitions": job["num_reducers"],
+                **task_options(job, MAP_OPTIONS),
+            }
+        self.signals["failures"].stage = "map"
+        if not job.get("memo_dir"):
+            self.run_stage(sorted(tasks), job, new_map_task)
+            return
+
+        memo = utils.MapOutputCache(job["memo_dir"],
+                                    job.get("memo_max_bytes"))
+        keys = {}
+        for task_id in sorted(tasks):
+            try:
+                keys[task_id] = memo.fingerprint(
+                    tasks[task_id], job["mapper_executable"],
+                    job["num_reducers"], task_options(job, MAP_OPTIONS),
+                    job.get("cache_files", []),
+                )
+            except OSError:
+                keys[task_id] = None
+        pending = [task_id for task_id, key in keys.items()
+                   if key is None or not memo.restore(
+                       key, tmpdir, task_id, job["num_reducers"])]
+        LOGGER.info("Reused cached output of %s map tasks",
+                    len(tasks) - len(pending))
+        self.run_stage(pending, job, new_map_task)
+        if self.signals["shutdown"] or self.signals["failures"].failed:
+            return
+        for task_id in pending:
+            if keys[task_id] is not None:
+                memo.store(keys[task_id], tmpdir, task_id,
+                           job["num_reducers"])
+        memo.evict()
 
     def run_reduce(self, tasks, job, output_dir):
         """Run reduce stage."""
-        task_id = 0
-        while not self.signals["shutdown"] \
-                and task_id < len(tasks):
-            time.sleep(0.1)
-            # allocate tasks to workers
-            if not self.register_order:
+        def new_reduce_task(task_id):
+            return {
+                "message_type": "new_reduce_task",
+                "task_id": task_id,
+                "executable": job["reducer_executable"],
+                "input_paths": tasks[task_id],
+                "output_directory": str(output_dir),
+                **task_options(job, REDUCE_OPTIONS),
+            }
+        self.signals["failures"].stage = "reduce"
+        self.run_stage(sorted(tasks), job, new_reduce_task)
+
+    def run_stage(self, task_ids, job, new_task):
+        """Assign tasks to Workers and wait for them to finish.
+
+        new_task(task_id) returns the message for a task, without the Worker
+        it is sent to.  If the job fails, wait for running tasks to end so
+        their messages do not reach the next job.
+        """
+        pending = self.signals["pending"] = deque(task_ids)
+        failures = self.signals["failures"]
+        with self.lock:
+            # Results of tasks assigned in another stage are ignored
+            self.signals["stage"] = (job["job_id"], failures.stage)
+            while not self.signals["shutdown"] and not failures.failed \
+                    and pending:
+                # allocate tasks to workers
+                if self.assign_task(new_task(pending[0]), job):
+                    pending.popleft()
+                else:
+                    self.lock.wait(timeout=0.1)
+            LOGGER.info("Task Allocation Done")
+            # check job done
+            while not self.signals["shutdown"] and \
+                    not failures.failed and \
+                    len(self.signals["finished_task"]) != len(task_ids):
+                if self.dead_task and self.assign_task(
+                        new_task(self.dead_task[0]), job):
+                    LOGGER.info("Reassigned dead task id %s",
+                                self.dead_task.popleft())
+                else:
+                    # wait for all tasks to be finished
+                    self.lock.wait(timeout=0.1)
+            if failures.failed:
+                self.lock.wait_for(lambda: self.signals["shutdown"] or all(
+                    info["state"] != 1 for info in self.workers.values()
+                ))
+            self.dead_task.clear()
+            self.signals["stage"] = None
+
+    def assign_task(self, message_dict, job):
+        """Send a task to a ready Worker, return False if none took it.
+
+        The job fails if no live Worker could ever run the task.
+        """
+        worker = self.select_worker(job)
+        if worker is None:
+            if self.unplaceable(job):
+                self.signals["failures"].reason = (
+                    "no live Worker has the memory and CPUs a task needs"
+                )
+            return False
+        host, port = worker[2], worker[3]
+        LOGGER.info("Current workers %s", self.register_order)
+        LOGGER.info("SEND TASK %s TO worker %s",
+                    message_dict["task_id"], port)
+        if job.get("task_memory_mb"):
+            message_dict["memory_mb"] = job["task_memory_mb"]
+        if job.get("cache_files"):
+            message_dict["cache_files"] = job["cache_files"]
+        if job.get("trace"):
+            message_dict["trace"] = True
+        message_dict["worker_host"] = host
+        message_dict["worker_port"] = port
+        if not utils.send_tcp_message(host, port, message_dict):
+            self.worker_die(host, port)
+            return False
+        self.workers[host, port]["state"] = 1
+        self.workers[host, port]["task"] = (self.signals["stage"],
+                                            message_dict["task_id"])
+        worker[0] = 1  # ready -> busy
+        heapq.heapify(self.register_order)  # reorder
+        return True
+
+    def select_worker(self, job):
+        """Return the first ready Worker with room for a job's task, or None.
+
+        Workers are considered in registration order, skipping suspected
+        ones.  Workers blacklisted for the job are used only when no other
+        Worker is alive.
+        """
+        failures = self.signals["failures"]
+        alive = [(host, port) for (host, port), info in self.workers.items()
+                 if info["state"] != 2]
+        use_blacklisted = all(failures.blacklisted(w) for w in alive)
+        for worker in sorted(self.register_order):
+            if worker[0] != 0:
+                # Ready Workers sort first, the rest are busy or dead
+                return None
+            info = self.workers[worker[2], worker[3]]
+            if info["suspect"] or (
+                    not use_blacklisted and
+                    failures.blacklisted((worker[2], worker[3]))):
                 continue
-            if self.register_order[0][0] == 0:
-                LOGGER.info("Current task id %s", task_id)
-                LOGGER.info("Current workers %s", self.register_order)
-                host = self.register_order[0][2]
-                port = self.register_order[0][3]
-                LOGGER.info("SEND TASK TO worker %s", port)
-                message_dict = {
-                    "message_type": "new_reduce_task",
-                    "task_id": task_id,
-                    "executable": job["reducer_executable"],
-                    "input_paths": tasks[task_id],
-                    "output_directory": str(output_dir),
-                    "worker_host": host,
-                    "worker_port": port
-                }
-                if not utils.send_tcp_message(
-                        host, port, message_dict):
-                    self.worker_die(host, port)
-                    continue
-                self.workers[host, port]["state"] = 1
-                self.workers[host, port]["task_id"] = task_id
-                self.register_order[0][0] = 1  # ready -> busy
-                heapq.heapify(self.register_order)  # reorder
-                task_id += 1
-        LOGGER.info("Task Allocation Done")
-        # check job done
-        while not self.signals["shutdown"] and \
-                len(self.signals["finished_task"]) != len(tasks):
-            time.sleep(0.1)  # wait for all tasks to be finished
-            if self.dead_task and self.register_order[0][0] == 0:
-                task_id = self.dead_task.popleft()
-                LOGGER.info("Current dead task id %s", task_id)
-                LOGGER.info("Current workers %s", self.register_order)
-                host = self.register_order[0][2]
-                port = self.register_order[0][3]
-                LOGGER.info("SEND DEAD TASK TO worker %s", port)
-                message_dict = {
-                    "message_type": "new_reduce_task",
-                    "task_id": task_id,
-                    "executable": job["reducer_executable"],
-                    "input_paths": tasks[task_id],
-                    "output_directory": str(output_dir),
-                    "worker_host": host,
-                    "worker_port": port
-                }
-                if not utils.send_tcp_message(
-                        host, port, message_dict):
-                    self.worker_die(host, port)
-                    self.dead_task.appendleft(task_id)
-                    continue
-                self.workers[host, port]["state"] = 1
-                self.workers[host, port]["task_id"] = task_id
-                self.register_order[0][0] = 1  # ready -> busy
-                heapq.heapify(self.register_order)  # reorder
+            if fits(info, job):
+                return worker
+        return None
+
+    def unplaceable(self, job):
+        """Return True if Workers are alive but none has room for a task.
+
+        That must hold for UNPLACEABLE_GRACE seconds.  Workers started on
+        demand advertise no capacity, so with autoscaling a task can always
+        be placed eventually.
+        """
+        alive = [info for info in self.workers.values() if info["state"] != 2]
+        if self.signals["autoscaler"] or not alive or \
+                any(fits(info, job) for info in alive):
+            self.signals["unplaceable_since"] = None
+            return False
+        if self.signals["unplaceable_since"] is None:
+            self.signals["unplaceable_since"] = time.monotonic()
+        return time.monotonic() - self.signals["unplaceable_since"] >= \
+            UNPLACEABLE_GRACE
 
     def check_heartbeat(self):
-        """Check heartbeat and do fault tolerance."""
+        """Check heartbeat and do fault tolerance.
+
+        A Worker whose suspicion level phi reaches PHI_SUSPECT gets no new
+        tasks until it sends a heartbeat, and at PHI_DEAD it is dead.
+        """
         LOGGER.info("Fault tolerance thread starts.")
         while not self.signals['shutdown']:
-            for host, port in self.workers:
-                # ignore dead workers
-                if self.workers[(host, port)]['state'] != 2:
-                    self.workers[(host, port)]['missed_heartbeat'] += 1
-                    if self.workers[(host, port)]['missed_heartbeat'] == 5:
+            with self.lock:
+                for (host, port), info in self.workers.items():
+                    # ignore dead workers
+                    if info['state'] == 2:
+                        continue
+                    phi = info['liveness'].phi()
+                    if phi >= utils.liveness.PHI_DEAD:
                         self.worker_die(host, port)
-            # check status every two seconds
-            time.sleep(2)
+                    elif (phi >= utils.liveness.PHI_SUSPECT) \
+                            != info['suspect']:
+                        info['suspect'] = not info['suspect']
+                        LOGGER.info("Worker %s:%d %s, phi=%.1f", host, port,
+                                    "suspected" if info['suspect']
+                                    else "trusted again", phi)
+                self.lock.notify_all()
+                self.lock.wait_for(lambda: self.signals['shutdown'],
+                                   timeout=HEARTBEAT_CHECK_INTERVAL)
+
+    def autoscale(self):
+        """Start and stop local Workers as demand changes."""
+        LOGGER.info("Autoscaling thread starts.")
+        scaler = self.signals["autoscaler"]
+        while not self.signals["shutdown"]:
+            with self.lock:
+                live = {worker: info["state"]
+                        for worker, info in self.workers.items()
+                        if info["state"] != 2}
+                demand = sum(state == 1 for state in live.values()) + \
+                    len(self.signals["pending"]) + len(self.dead_task) + \
+                    sum(job["num_mappers"] for job in self.job_queue)
+                spawn, retire = scaler.plan(live, demand)
+                for host, port in retire:
+                    # Mark it dead first, so it gets no more tasks
+                    LOGGER.info("Stopping idle Worker %s:%d", host, port)
+                    self.worker_die(host, port)
+            for host, port in retire:
+                utils.send_tcp_message(host, port,
+                                       {"message_type": "shutdown"})
+            for _ in range(spawn):
+                try:
+                    scaler.spawn()
+                except OSError as error:
+                    LOGGER.warning("Cannot start a Worker: %s", error)
+                    break
+            with self.lock:
+                self.lock.wait_for(lambda: self.signals["shutdown"],
+                                   timeout=utils.autoscale.AUTOSCALE_INTERVAL)
+        scaler.stop()
 
     def worker_die(self, host, port):
         """Handle worker die situation."""
         LOGGER.info("Worker %s:%d died", host, port)
-        prev_state = self.workers[(host, port)]['state']
-        num_workers = len(self.register_order)
-        for i in range(num_workers):
-            if self.register_order[i][2] == host \
-                    and self.register_order[i][3] == port:
-                self.workers[(host, port)]['state'] = 2
-                if prev_state == 1:
-                    self.dead_task.append(
-                        self.workers[(host, port)]['task_id'])
-                self.register_order[i][0] = 2  # Any -> dead
-                heapq.heapify(self.register_order)
-                break
+        worker = self.registered_worker(host, port)
+        if worker is None:
+            return
+        info = self.workers[(host, port)]
+        was_busy = info['state'] == 1
+        info['state'] = 2
+        worker[0] = 2  # Any -> dead
+        heapq.heapify(self.register_order)
+        # The task stays assigned, the Worker may still report its result
+        if was_busy and info["task"][0] == self.signals["stage"]:
+            self.task_failed(info["task"][1], host, port, "Worker died")
+
+    def task_failed(self, task_id, host, port, error):
+        """Retry a failed task attempt, unless the job must give up."""
+        LOGGER.warning("Task %s failed on Worker %s:%d: %s",
+                       task_id, host, port, error)
+        if task_id in self.signals["finished_task"]:
+            return  # another attempt of the task finished
+        if self.signals["failures"].record(task_id, (host, port), error):
+            self.dead_task.append(task_id)
+        if self.signals["failures"].blacklisted((host, port)):
+            LOGGER.warning("Worker %s:%d blacklisted for this job",
+                           host, port)
+
+
+def fits(info, job):
+    """Return True if a Worker has the capacity each task of job declares.
+
+    A Worker that did not advertise a capacity can run tasks of any size.
+    """
+    return all(job.get(demand) is None or info[capacity] is None or
+               info[capacity] >= job[demand]
+               for demand, capacity in TASK_DEMANDS.items())
+
+
+def write_trace(trace, job):
+    """Write the job's timeline to the file the job asked for."""
+    if not job.get("trace"):
+        return
+    try:
+        trace.write(job["trace"])
+    except OSError as error:
+        LOGGER.warning("Cannot write trace %s: %s", job["trace"], error)
+    else:
+        LOGGER.info("Wrote trace %s", job["trace"])
+
+
+def task_options(job, names):
+    """Return the job options in names that are set, for task messages."""
+    return {name: job[name] for name in names if job.get(name) is not None}
+
+
+def sample_partitions(tasks, job, failures):
+    """Set a total order job's split points, sampled from its map input.
+
+    Return False if sampling fails.  The job fails then, because hash
+    partitioned output would not be totally ordered.
+    """
+    try:
+        job["partition_splits"] = utils.sample_splits(
+            job["mapper_executable"],
+            [path for paths in tasks.values() for path in paths],
+            job["num_reducers"],
+            job.get("cache_files", []),
+        )
+    except (OSError, ValueError, subprocess.CalledProcessError) as error:
+        failures.reason = f"sampling map input failed: {error}"
+        return False
+    return True
 
 
 @click.command()
@@ -427,7 +651,14 @@ class Manager:
 @click.option("--logfile", "logfile", default=None)
 @click.option("--loglevel", "loglevel", default="info")
 @click.option("--shared_dir", "shared_dir", default=None)
-def main(host, port, logfile, loglevel, shared_dir):
+@click.option("--min-workers", "min_workers", default=0,
+              type=click.IntRange(min=0),
+              help="Live Workers kept when autoscaling, default=0")
+@click.option("--max-workers", "max_workers", default=None,
+              type=click.IntRange(min=1),
+              help="Start local Workers on demand, up to this many live "
+                   "Workers, default=no autoscaling")
+def main(host, port, logfile, loglevel, shared_dir, **options):
     """Run Manager."""
     tempfile.tempdir = shared_dir
     if logfile:
@@ -441,4 +672,6 @@ def main(host, port, logfile, loglevel, shared_dir):
     root_logger = logging.getLogger()
     root_logger.addHandler(handler)
     root_logger.setLevel(loglevel.upper())
-    Manager(host, port)
+    if logfile:
+        options["log_dir"] = os.path.dirname(os.path.abspath(logfile))
+    Manager(host, port, options=options)
@@ -13,7 +13,29 @@ $ mapreduce-submit --help
 
 import socket
 import json
+from typing import Optional, Tuple
 import click
+from mapreduce.utils import check_grouping, parse_sort_key
+
+
+def validate_sort_keys(ctx, param, value):
+    """Check --sort-key values, see mapreduce.utils.keys."""
+    # Click callbacks take the context and parameter, which we don't need
+    del ctx, param
+    for spec in value:
+        try:
+            parse_sort_key(spec)
+        except ValueError as error:
+            raise click.BadParameter(str(error)) from error
+    return value
+
+
+def validate_grouping(sort_keys, partition_fields):
+    """Check that --sort-key values start with the grouping fields."""
+    try:
+        check_grouping(sort_keys, partition_fields)
+    except ValueError as error:
+        raise click.UsageError(str(error)) from error
 
 
 # Configure command line options
@@ -56,6 +78,63 @@ import click
     "--nreducers", "num_reducers", default=2, type=int,
     help="Number of reducers, default=2",
 )
+@click.option(
+    "--task-memory-mb", "task_memory_mb", default=None, type=int,
+    help="Memory limit per task in MB, default=unlimited",
+)
+@click.option(
+    "--task-cpus", "task_cpus", default=None, type=click.IntRange(min=1),
+    help="CPUs a Worker needs to run a task, default=any Worker",
+)
+@click.option(
+    "--file", "-f", "cache_files", multiple=True,
+    help="File cached on each Worker and placed in the task's working "
+         "directory, may be repeated",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False,
+                    resolve_path=True),
+)
+@click.option(
+    "--memo-dir", "memo_dir", default=None,
+    help="Reuse map task outputs cached in this directory, default=off",
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+)
+@click.option(
+    "--memo-max-bytes", "memo_max_bytes", default=None, type=int,
+    help="Evict least recently used map outputs beyond this size, "
+         "default=unlimited",
+)
+@click.option(
+    "--total-order", "total_order", is_flag=True, default=False,
+    help="Range partition by sampled keys so that the output files "
+         "concatenate in sorted order",
+)
+@click.option(
+    "--partition-fields", "partition_fields", default=None,
+    type=click.IntRange(min=1),
+    help="Number of leading fields that partition and group map output, "
+         "default=1",
+)
+@click.option(
+    "--sort-key", "-k", "sort_keys", multiple=True,
+    callback=validate_sort_keys,
+    help="Field that orders map output, e.g. 2nr for the second field, "
+         "numeric, reversed, may be repeated, default=whole line",
+)
+@click.option(
+    "--max-task-attempts", "max_task_attempts", default=None,
+    type=click.IntRange(min=1),
+    help="Attempts per task before the job fails, default=4",
+)
+@click.option(
+    "--max-job-failures", "max_job_failures", default=None,
+    type=click.IntRange(min=1),
+    help="Failed task attempts before the job fails, default=10",
+)
+@click.option(
+    "--trace", "trace", default=None, type=click.Path(dir_okay=False),
+    help="Write a timeline of the job's tasks to this Chrome trace JSON "
+         "file, default=no timeline",
+)
 def main(host: str,
          port: int,
          input_directory: str,
@@ -63,10 +142,26 @@ def main(host: str,
          mapper_executable: str,
          reducer_executable: str,
          num_mappers: int,
-         num_reducers: int) -> None:
+         num_reducers: int,
+         task_memory_mb: Optional[int],
+         task_cpus: Optional[int],
+         cache_files: Tuple[str, ...],
+         memo_dir: Optional[str],
+         memo_max_bytes: Optional[int],
+         total_order: bool,
+         partition_fields: Optional[int],
+         sort_keys: Tuple[str, ...],
+         max_task_attempts: Optional[int],
+         max_job_failures: Optional[int],
+         trace: Optional[str]) -> None:
     """Top level command line interface."""
     # We want a bunch of arguments, this is the top level CLI.
-    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-arguments,too-many-locals
+    if total_order and sort_keys:
+        raise click.UsageError(
+            "--total-order partitions by text order, use it without --sort-key"
+        )
+    validate_grouping(sort_keys, partition_fields)
     job_dict = {
         "message_type": "new_manager_job",
         "input_directory": input_directory,
@@ -74,7 +169,18 @@ def main(host: str,
         "mapper_executable": mapper_executable,
         "reducer_executable": reducer_executable,
         "num_mappers": num_mappers,
-        "num_reducers": num_reducers
+        "num_reducers": num_reducers,
+        "task_memory_mb": task_memory_mb,
+        "task_cpus": task_cpus,
+        "cache_files": list(cache_files),
+        "memo_dir": memo_dir,
+        "memo_max_bytes": memo_max_bytes,
+        "total_order": total_order,
+        "partition_fields": partition_fields,
+        "sort_keys": list(sort_keys) or None,
+        "max_task_attempts": max_task_attempts,
+        "max_job_failures": max_job_failures,
+        "trace": trace,
     }
 
     # Send the data to the port that Manager is on
@@ -96,6 +202,20 @@ def main(host: str,
     print("reducer executable  ", reducer_executable)
     print("num mappers         ", num_mappers)
     print("num reducers        ", num_reducers)
+    if task_memory_mb is not None:
+        print("task memory (MB)    ", task_memory_mb)
+    if task_cpus is not None:
+        print("task CPUs           ", task_cpus)
+    for cache_file in cache_files:
+        print("cached file         ", cache_file)
+    if memo_dir is not None:
+        print("map output cache    ", memo_dir)
+    if total_order:
+        print("total order          yes")
+    if sort_keys:
+        print("sort keys           ", " ".join(sort_keys))
+    if trace is not None:
+        print("trace               ", trace)
 
 
 if __name__ == "__main__":
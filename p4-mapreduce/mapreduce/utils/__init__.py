@@ -5,3 +5,26 @@ This package is for code shared by the Manager and the Worker.
 
 from mapreduce.utils.common_usage import send_tcp_message
 from mapreduce.utils.common_usage import recv_tcp_message
+from mapreduce.utils.common_usage import task_command
+from mapreduce.utils.common_usage import map_tasks
+from mapreduce.utils.common_usage import reduce_tasks
+from mapreduce.utils.merge import merge_sorted_files
+from mapreduce.utils.cache import FileCache
+from mapreduce.utils.memo import MapOutputCache
+from mapreduce.utils.partition import partition_number
+from mapreduce.utils.partition import sample_splits
+from mapreduce.utils.keys import check_grouping
+from mapreduce.utils.keys import line_sort_key
+from mapreduce.utils.keys import parse_sort_key
+from mapreduce.utils.keys import partition_key
+from mapreduce.utils.liveness import PhiAccrualDetector
+from mapreduce.utils.failures import FailureTracker
+from mapreduce.utils.formats import is_plain
+from mapreduce.utils.formats import open_input
+from mapreduce.utils.formats import write_block_gzip
+from mapreduce.utils.output import stage_output
+from mapreduce.utils.output import restore_output
+from mapreduce.utils.output import commit_job
+from mapreduce.utils.trace import TaskTrace
+from mapreduce.utils.trace import JobTrace
+from mapreduce.utils.autoscale import Autoscaler
@@ -0,0 +1,129 @@
+"""Scale the number of local Workers with demand.
+
+The Manager may start Worker processes on its own machine when tasks are
+waiting and stop them when they have been idle for a while, keeping the
+number of live Workers between a minimum and a maximum.  Demand is the
+number of Workers that could be busy right now: busy Workers plus tasks
+waiting to be assigned, including the map tasks of queued jobs.
+
+Only Workers the Manager started are ever stopped.  Workers started by hand
+or by bin/mapreduce count towards the minimum and maximum.
+"""
+import logging
+import pathlib
+import socket
+import subprocess
+import time
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+# Seconds between scaling decisions
+AUTOSCALE_INTERVAL = 1
+
+# A started Worker counts as live for this many seconds before it registers
+REGISTER_TIMEOUT = 10
+
+# An idle started Worker is stopped after this many seconds
+IDLE_TIMEOUT = 10
+
+
+def free_port(host):
+    """Return a TCP port on host that is not in use right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_process(command):
+    """Start a process that runs in the background, return its Popen."""
+    return subprocess.Popen(command, stdin=subprocess.DEVNULL)
+
+
+class Autoscaler:
+    """Worker processes started by the Manager.
+
+    EXAMPLE
+    >>> scaler = Autoscaler(("localhost", 6000), 1, 8)
+    >>> spawn, retire = scaler.plan({("localhost", 6001): 1}, demand=5)
+    >>> for _ in range(spawn):
+    >>>     scaler.spawn()
+    """
+
+    def __init__(self, manager, min_workers, max_workers, log_dir=None):
+        """Configure bounds, Workers register with manager (host, port).
+
+        Started Workers log to log_dir if set.
+        """
+        self.manager = manager
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.log_dir = log_dir
+        self.children = {}  # (host, port) -> Popen
+        self.starting = {}  # (host, port) -> time started, until registered
+        self.idle_since = {}  # (host, port) -> time it became idle
+
+    def plan(self, live, demand, now=None):
+        """Return how many Workers to start and which Workers to stop.
+
+        live maps the (host, port) of each live Worker to its state, ready=0
+        or busy=1.
+        """
+        now = time.monotonic() if now is None else now
+        self.reap()
+        for worker, started in list(self.starting.items()):
+            if worker in live or now - started >= REGISTER_TIMEOUT:
+                del self.starting[worker]
+        for worker in self.children:
+            if live.get(worker) == 0:
+                self.idle_since.setdefault(worker, now)
+            else:
+                self.idle_since.pop(worker, None)
+
+        target = max(self.min_workers, min(self.max_workers, demand))
+        total = len(live) + len(self.starting)
+        idle = sorted((since, worker)
+                      for worker, since in self.idle_since.items()
+                      if now - since >= IDLE_TIMEOUT)
+        retire = [worker for _, worker in idle[:max(0, total - target)]]
+        for worker in retire:
+            del self.idle_since[worker]
+        return max(0, target - total), retire
+
+    def spawn(self):
+        """Start a Worker process, return its (host, port)."""
+        host = self.manager[0]
+        port = free_port(host)
+        command = ["mapreduce-worker", "--host", host, "--port", str(port),
+                   "--manager-host", host,
+                   "--manager-port", str(self.manager[1])]
+        if self.log_dir is not None:
+            command += ["--logfile", str(pathlib.Path(
+                self.log_dir, f"mapreduce-worker-{port}.log"))]
+        # Scaling is best effort, a Worker that fails to start never
+        # registers and is forgotten after REGISTER_TIMEOUT
+        self.children[host, port] = start_process(command)
+        self.starting[host, port] = time.monotonic()
+        LOGGER.info("Started Worker %s:%d", host, port)
+        return host, port
+
+    def reap(self):
+        """Forget started Workers that have exited."""
+        for worker, process in list(self.children.items()):
+            if process.poll() is not None:
+                LOGGER.info("Worker %s:%d exited with status %s",
+                            worker[0], worker[1], process.returncode)
+                del self.children[worker]
+                self.starting.pop(worker, None)
+                self.idle_since.pop(worker, None)
+
+    def stop(self, timeout=5):
+        """Wait for started Workers to exit, kill those that do not."""
+        for process in self.children.values():
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.children.clear()
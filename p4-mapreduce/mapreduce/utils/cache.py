@@ -0,0 +1,89 @@
+"""Worker-side file cache.
+
+Files a job declares at submit time are copied once into a local cache
+directory, keyed by content hash, and reused by every task that needs them.
+"""
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import threading
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+# Read files in chunks of this many bytes while hashing
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileCache:
+    """Stage files into a local directory keyed by content hash.
+
+    Cached files live at <cache_dir>/files/<digest>/<name>.  A file that has
+    not changed since it was last staged (same size and mtime) is neither
+    re-read nor re-copied.  Tasks run in a directory of symlinks to the cached
+    files, so executables can open side files by name from their cwd.
+
+    EXAMPLE
+    >>> cache = FileCache("/tmp/mapreduce-cache-6001")
+    >>> executable, cwd = cache.stage_task("map1.py", ["stopwords.txt"])
+    """
+
+    def __init__(self, cache_dir):
+        """Store cache directory, it is created on first use."""
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.digests = {}  # (path, size, mtime_ns) -> digest
+        self.lock = threading.Lock()
+
+    def stage(self, path):
+        """Return the path of the cached copy of path, copying if needed."""
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if key not in self.digests:
+                self.digests[key] = file_digest(path)
+            cached = self.cache_dir/"files"/self.digests[key]/path.name
+            if not cached.exists():
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                # Copy next to the destination, then rename atomically so a
+                # concurrent reader never sees a partial file
+                partial = cached.with_name(f".{path.name}.partial")
+                shutil.copy2(path, partial)
+                os.replace(partial, cached)
+                LOGGER.info("Cached %s as %s", path, cached)
+        return cached
+
+    def stage_task(self, executable, paths):
+        """Stage a task's executable and side files.
+
+        Return the cached executable and a working directory that contains
+        every side file under its original name.
+        """
+        executable = self.stage(executable)
+        cached = sorted((self.stage(path) for path in paths),
+                        key=lambda p: p.name)
+        digest = hashlib.sha256(
+            "\n".join(str(p) for p in cached).encode("utf-8")
+        ).hexdigest()
+        cwd = self.cache_dir/"tasks"/digest
+        with self.lock:
+            if not cwd.exists():
+                partial = cwd.with_name(f".{digest}.partial")
+                shutil.rmtree(partial, ignore_errors=True)
+                partial.mkdir(parents=True)
+                for path in cached:
+                    (partial/path.name).symlink_to(path)
+                os.replace(partial, cwd)
+        return executable, cwd
@@ -3,7 +3,11 @@
 This file is for code shared by the Manager and the Worker.
 """
 import json
+import pathlib
 import socket
+import zlib
+
+from mapreduce.utils.formats import input_splits
 
 
 def send_tcp_message(host, port, message_dict):
@@ -47,3 +51,49 @@ def recv_tcp_message(clientsocket):
     message_str = message_bytes.decode("utf-8")
 
     return json.loads(message_str)
+
+
+def task_command(executable, memory_mb=None):
+    """Return the command line that runs executable for a task.
+
+    When memory_mb is set, the executable runs under a shell that caps its
+    virtual memory with ulimit, so a runaway task fails instead of the node.
+    """
+    if memory_mb is None:
+        return [executable]
+    return ["/bin/sh", "-c", 'ulimit -v "$1" && exec "$0"',
+            str(executable), str(int(memory_mb) * 1024)]
+
+
+def map_tasks(input_directory, num_mappers, stable=False):
+    """Return {task_id: [input paths]} for a job's map stage.
+
+    Input files are sorted by name, large block gzip files are split, and
+    the inputs are assigned round-robin to tasks.  With stable set, each
+    input is assigned by a hash of its name instead, so adding or removing
+    an input changes the inputs of its own task only.
+    """
+    tasks = {}
+    files = [split for path in sorted(pathlib.Path(input_directory).iterdir())
+             for split in input_splits(path)]
+    for i, filename in enumerate(files):
+        if stable:
+            name = pathlib.PurePath(filename).name
+            task_id = zlib.crc32(name.encode("utf-8")) % num_mappers
+        else:
+            task_id = i % num_mappers
+        tasks.setdefault(task_id, []).append(filename)
+    return tasks
+
+
+def reduce_tasks(map_output_directory):
+    """Return {task_id: [map output paths]} for a job's reduce stage.
+
+    Map output files end in the partition number, which is the reduce task id.
+    """
+    tasks = {}
+    files = sorted(str(path)
+                   for path in pathlib.Path(map_output_directory).iterdir())
+    for filename in files:
+        tasks.setdefault(int(filename[-5:]), []).append(filename)
+    return tasks
@@ -0,0 +1,76 @@
+"""Track failed task attempts within a job.
+
+A task attempt fails when its executable exits with an error or its Worker
+dies while running it.  Failed tasks are retried on another Worker, up to a
+limit.  A task that keeps failing is poison: it would fail anywhere, so the
+job fails instead of retrying it forever.  A Worker that keeps failing tasks
+other Workers can run is blacklisted for the rest of the job.
+"""
+import collections
+
+
+# Attempts per task before the job fails
+MAX_TASK_ATTEMPTS = 4
+
+# Failed attempts per job, across all tasks, before the job fails
+MAX_JOB_FAILURES = 10
+
+# Failed attempts per Worker before it gets no more tasks of the job
+BLACKLIST_FAILURES = 3
+
+
+class FailureTracker:
+    """Failed attempts of one job's tasks.
+
+    EXAMPLE
+    >>> failures = FailureTracker()
+    >>> failures.stage = "map"
+    >>> if not failures.record(0, ("localhost", 6001), "exit status 1"):
+    >>>     ...  # give up on the job, see failures.diagnostics()
+    """
+
+    def __init__(self, max_attempts=None, max_failures=None):
+        """Start with no failures, limits default to the module constants."""
+        self.max_attempts = max_attempts or MAX_TASK_ATTEMPTS
+        self.max_failures = max_failures or MAX_JOB_FAILURES
+        self.stage = None
+        self.attempts = collections.defaultdict(list)  # (stage, task) -> []
+        self.worker_failures = collections.Counter()
+        self.reason = None
+
+    def record(self, task_id, worker, error):
+        """Record a failed attempt, return True if the task may be retried."""
+        self.attempts[self.stage, task_id].append(
+            {"worker": f"{worker[0]}:{worker[1]}", "error": error}
+        )
+        self.worker_failures[worker] += 1
+        num_failures = sum(len(errors) for errors in self.attempts.values())
+        if len(self.attempts[self.stage, task_id]) >= self.max_attempts:
+            self.reason = (f"{self.stage} task {task_id} failed "
+                           f"{self.max_attempts} times")
+        elif num_failures >= self.max_failures:
+            self.reason = f"job had {num_failures} failed task attempts"
+        return self.reason is None
+
+    def blacklisted(self, worker):
+        """Return True if worker has failed too many of this job's tasks."""
+        return self.worker_failures[worker] >= BLACKLIST_FAILURES
+
+    @property
+    def failed(self):
+        """Return True once the job has given up."""
+        return self.reason is not None
+
+    def diagnostics(self):
+        """Return a JSON serializable summary of the failures."""
+        return {
+            "reason": self.reason,
+            "failed_attempts": [
+                {"stage": stage, "task_id": task_id, "attempts": errors}
+                for (stage, task_id), errors in sorted(self.attempts.items())
+            ],
+            "blacklisted_workers": sorted(
+                f"{host}:{port}" for host, port in self.worker_failures
+                if self.blacklisted((host, port))
+            ),
+        }
@@ -0,0 +1,229 @@
+"""Input formats for map tasks.
+
+Map inputs may be plain text or compressed with gzip (.gz), bzip2 (.bz2) or
+xz (.xz, .lzma), and are decompressed on the fly by the Worker.
+
+Block gzip (BGZF, as written by bgzip or mapreduce-compress) is a gzip file
+made of independently compressed blocks of at most 64 KiB, each recording
+its own compressed size.  Large block gzip files are split into several map
+inputs written path#start-end, the blocks at compressed offsets [start, end).
+Lines may cross block boundaries.  A split owns the lines that start in its
+blocks, so it finishes its last line by reading on into the next split,
+which in turn skips its partial first line.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import re
+import struct
+import zlib
+
+
+# Decompressing openers by file name suffix
+OPENERS = {
+    ".gz": gzip.open,
+    ".bgz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+    ".lzma": lzma.open,
+}
+
+# Block gzip files bigger than this many bytes are split across map tasks
+SPLIT_BYTES = 32 << 20
+
+# Uncompressed bytes per block, the BGZF maximum
+BLOCK_BYTES = 0xff00
+
+# BGZF block header: gzip magic with the FEXTRA flag, then XLEN = 6 and a
+# "BC" subfield holding the total block size minus one
+BGZF_HEADER = struct.Struct("<4sI2sH2sHH")
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+
+# The last block of a BGZF file is empty
+BGZF_EOF = bytes.fromhex(
+    "1f8b08040000000000ff0600424302001b0003000000000000000000"
+)
+
+SPLIT_RE = re.compile(r"(?P<path>.*)#(?P<start>[0-9]+)-(?P<end>[0-9]+)")
+
+
+def parse_split(path):
+    """Return (file path, start, end) of a split, or None for a whole file."""
+    match = SPLIT_RE.fullmatch(str(path))
+    if match is None or os.path.exists(path):
+        return None
+    return match.group("path"), int(match.group("start")), \
+        int(match.group("end"))
+
+
+def input_file(path):
+    """Return the file a map input is read from."""
+    split = parse_split(path)
+    return split[0] if split else str(path)
+
+
+def is_plain(path):
+    """Return True if a map input is an uncompressed whole file."""
+    return parse_split(path) is None and \
+        os.path.splitext(str(path))[1] not in OPENERS
+
+
+def open_input(path):
+    """Open a map input for reading decompressed lines as bytes."""
+    split = parse_split(path)
+    if split:
+        return BlockSplitReader(*split)
+    opener = OPENERS.get(os.path.splitext(str(path))[1], open)
+    return opener(path, "rb")
+
+
+def read_block(infile):
+    """Return the compressed size and data of the block at infile's offset.
+
+    Return (0, b"") at end of file.  Raise ValueError if the file is not
+    block gzip.
+    """
+    header = infile.read(BGZF_HEADER.size)
+    if not header:
+        return 0, b""
+    try:
+        magic, _, _, xlen, subfield, _, bsize = BGZF_HEADER.unpack(header)
+    except struct.error as error:
+        raise ValueError("Truncated block gzip header") from error
+    if magic != BGZF_MAGIC or xlen != 6 or subfield != b"BC":
+        raise ValueError("Not a block gzip file")
+    rest = infile.read(bsize + 1 - BGZF_HEADER.size)
+    return bsize + 1, zlib.decompress(header + rest, wbits=31)
+
+
+def is_block_gzip(path):
+    """Return True if path is a block gzip file."""
+    with open(path, "rb") as infile:
+        header = infile.read(BGZF_HEADER.size)
+    try:
+        magic, _, _, xlen, subfield, _, _ = BGZF_HEADER.unpack(header)
+    except struct.error:
+        return False
+    return magic == BGZF_MAGIC and xlen == 6 and subfield == b"BC"
+
+
+def input_splits(path, split_bytes=None):
+    """Return the map inputs for a file, several splits if it is large.
+
+    Block boundaries are found from block headers, without decompressing.
+    """
+    split_bytes = split_bytes or SPLIT_BYTES
+    size = os.path.getsize(path)
+    if os.path.splitext(str(path))[1] not in (".gz", ".bgz") or \
+            size <= split_bytes or not is_block_gzip(path):
+        return [str(path)]
+    boundaries = [0]
+    offset = 0
+    with open(path, "rb") as infile:
+        while offset < size:
+            header = infile.read(BGZF_HEADER.size)
+            bsize = BGZF_HEADER.unpack(header)[-1]
+            offset += bsize + 1
+            infile.seek(offset)
+            if offset - boundaries[-1] >= split_bytes and offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return [f"{path}#{start}-{end}"
+            for start, end in zip(boundaries, boundaries[1:])]
+
+
+class BlockRawReader(io.RawIOBase):
+    """Decompressed bytes of a block gzip file from one block onwards.
+
+    region_end is the number of bytes produced from the blocks before end,
+    None until the reader gets there.
+    """
+
+    def __init__(self, path, start, end):
+        """Open path at compressed offset start."""
+        super().__init__()
+        self.infile = io.FileIO(path, "rb")
+        self.infile.seek(start)
+        self.offset, self.end = start, end
+        self.produced = 0
+        self.region_end = None
+        self.pending = b""
+
+    def readable(self):
+        """Return True, this is a readable stream."""
+        return True
+
+    def readinto(self, buffer):
+        """Fill buffer with decompressed bytes, return the number filled."""
+        while not self.pending:
+            if self.offset >= self.end and self.region_end is None:
+                self.region_end = self.produced
+            size, self.pending = read_block(self.infile)
+            if not size:
+                if self.region_end is None:
+                    self.region_end = self.produced
+                return 0
+            self.offset += size
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        self.produced += count
+        return count
+
+    def close(self):
+        """Close the underlying file."""
+        self.infile.close()
+        super().close()
+
+
+class BlockSplitReader:
+    """Iterate over the lines owned by one split of a block gzip file.
+
+    EXAMPLE
+    >>> with BlockSplitReader("crawl.gz", 0, 33554432) as reader:
+    >>>     for line in reader:
+    >>>         print(line)
+    """
+
+    def __init__(self, path, start, end):
+        """Open the split."""
+        self.raw = BlockRawReader(path, start, end)
+        self.stream = io.BufferedReader(self.raw)
+        self.start = start
+
+    def __enter__(self):
+        """Return self."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the split."""
+        self.stream.close()
+
+    def __iter__(self):
+        """Yield lines that start in this split's blocks."""
+        position = 0
+        if self.start:
+            # The previous split reads the line that crosses into this one
+            position += len(self.stream.readline())
+        while self.raw.region_end is None or position <= self.raw.region_end:
+            line = self.stream.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def write_block_gzip(infile, outfile, level=6):
+    """Compress binary file infile into block gzip file outfile."""
+    for block in iter(lambda: infile.read(BLOCK_BYTES), b""):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(block) + compressor.flush()
+        outfile.write(BGZF_HEADER.pack(
+            BGZF_MAGIC, 0, b"\x00\xff", 6, b"BC", 2,
+            BGZF_HEADER.size + len(data) + 8 - 1,
+        ))
+        outfile.write(data)
+        outfile.write(struct.pack("<II", zlib.crc32(block), len(block)))
+    outfile.write(BGZF_EOF)
@@ -0,0 +1,92 @@
+"""Order map output lines by key fields.
+
+Map output lines are tab separated fields.  By default lines are sorted as
+whole strings and partitioned by their first field.  A job may instead
+partition by its first few fields and sort by a list of fields, so that
+reducers see each group's values in a chosen order, e.g. sort keys
+["1", "2n"] order lines by term, then numerically by doc id.
+
+A sort key is a 1-based field number followed by flags: "n" compares the
+field as a number and "r" reverses the order.  Sort keys start with the
+grouping fields, see check_grouping(), so each group's lines stay together.
+"""
+import math
+import re
+
+
+# Sort key syntax, a field number followed by flags
+SORT_KEY_RE = re.compile(r"([1-9][0-9]*)([nr]*)")
+
+
+def parse_sort_key(spec):
+    """Return (field index, numeric, reverse) for a sort key like "2nr"."""
+    match = SORT_KEY_RE.fullmatch(spec)
+    if not match:
+        raise ValueError(f"Invalid sort key {spec!r}, expected e.g. 2nr")
+    return int(match.group(1)) - 1, "n" in match.group(2), \
+        "r" in match.group(2)
+
+
+def field_order(value, numeric, reverse):
+    """Return a value that orders one field as requested.
+
+    Numeric fields that do not parse as numbers sort after all numbers, and
+    equal numbers written differently, like 1 and 1.0, are ordered by text.
+    Reversed text compares negated code points, with a sentinel so that a
+    string sorts after the strings it is a prefix of.
+    """
+    if numeric:
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        if number is not None and not math.isnan(number):
+            return (0, -number if reverse else number, value)
+        return (1, field_order(value, False, reverse))
+    if reverse:
+        return (*(-ord(char) for char in value), 1)
+    return value
+
+
+def check_grouping(sort_keys, partition_fields=None):
+    """Raise ValueError unless sort_keys start with the grouping fields.
+
+    The first partition_fields fields group lines for a reducer.  Sorting by
+    another field first would split a group into runs the reducer sees as
+    separate groups.
+    """
+    num_fields = partition_fields or 1
+    leading = [parse_sort_key(spec)[0] for spec in sort_keys[:num_fields]]
+    if sort_keys and leading != list(range(num_fields)):
+        expected = " ".join(f"-k {field}"
+                            for field in range(1, num_fields + 1))
+        raise ValueError(f"Sort keys must start with the {num_fields} "
+                         f"grouping field(s), e.g. {expected}")
+
+
+def line_sort_key(sort_keys):
+    """Return a key function for sorted() and heapq.merge().
+
+    Return None, meaning whole-line order, when sort_keys is empty.  Ties are
+    broken by the whole line, so sort order does not depend on input order.
+    """
+    if not sort_keys:
+        return None
+    specs = [parse_sort_key(spec) for spec in sort_keys]
+
+    def key(line):
+        fields = line.rstrip("\n").split("\t")
+        return (*(field_order(fields[i] if i < len(fields) else "",
+                              numeric, reverse)
+                  for i, numeric, reverse in specs), line)
+    return key
+
+
+def partition_key(line, partition_fields=None):
+    """Return the part of a line that decides its partition.
+
+    This is the first field, or the first partition_fields fields.
+    """
+    if not partition_fields or partition_fields == 1:
+        return line.split("\t")[0]
+    return "\t".join(line.rstrip("\n").split("\t")[:partition_fields])
@@ -0,0 +1,76 @@
+"""Detect failed Workers from their heartbeats.
+
+Instead of declaring a Worker dead after a fixed number of missed
+heartbeats, the Manager keeps the recent intervals between each Worker's
+heartbeats and computes phi, the suspicion that the Worker has failed given
+how long it has been silent.  phi = -log10(P), where P is the probability
+that a heartbeat arrives this late from a live Worker, so phi = 3 means a
+1 in 1000 chance of a false alarm.  See Hayashibara et al., "The phi accrual
+failure detector".
+
+Workers that send heartbeats like clockwork are declared dead sooner, and
+Workers with jittery heartbeats get more slack.
+"""
+import collections
+import math
+import statistics
+import time
+
+
+# Workers send a heartbeat every this many seconds
+HEARTBEAT_INTERVAL = 2
+
+# Number of recent heartbeat intervals kept per Worker
+WINDOW = 100
+
+# Lower bound on the standard deviation of intervals in s, so a Worker with
+# perfectly regular heartbeats is not declared dead on the slightest delay
+MIN_STD = 0.5
+
+# Until this many intervals have been seen, assume heartbeats are jittery
+# with a standard deviation of PRIOR_STD s
+MIN_SAMPLES = 5
+PRIOR_STD = HEARTBEAT_INTERVAL / 2
+
+# Extra silence in s tolerated on top of the mean interval, e.g. one lost
+# UDP datagram
+ACCEPTABLE_PAUSE = HEARTBEAT_INTERVAL
+
+# A suspected Worker gets no new tasks, a dead Worker loses its task
+PHI_SUSPECT = 3
+PHI_DEAD = 8
+
+
+class PhiAccrualDetector:
+    """Suspicion level of one Worker, based on its heartbeat history.
+
+    EXAMPLE
+    >>> detector = PhiAccrualDetector()
+    >>> detector.heartbeat()
+    >>> if detector.phi() >= PHI_DEAD:
+    >>>     ...  # Worker is dead
+    """
+
+    def __init__(self, now=None):
+        """Start with one nominal interval, as if a heartbeat arrived now."""
+        self.intervals = collections.deque([HEARTBEAT_INTERVAL],
+                                           maxlen=WINDOW)
+        self.last = time.monotonic() if now is None else now
+
+    def heartbeat(self, now=None):
+        """Record a heartbeat."""
+        now = time.monotonic() if now is None else now
+        self.intervals.append(now - self.last)
+        self.last = now
+
+    def phi(self, now=None):
+        """Return the current suspicion level, from 0 up to infinity."""
+        now = time.monotonic() if now is None else now
+        mean = statistics.fmean(self.intervals) + ACCEPTABLE_PAUSE
+        std = max(MIN_STD, statistics.pstdev(self.intervals))
+        if len(self.intervals) < MIN_SAMPLES:
+            std = max(std, PRIOR_STD)
+        # Probability that a live Worker's next heartbeat is this late,
+        # assuming normally distributed intervals
+        p_later = 0.5 * math.erfc((now - self.last - mean) / (std * 2**0.5))
+        return -math.log10(p_later) if p_later > 0 else math.inf
@@ -0,0 +1,132 @@
+"""Memoize map task outputs.
+
+A map task's output depends only on its input files, its executable, the
+job's cache files and the number of partitions.  The Manager fingerprints
+each task from those and, when a previous job produced output for the same
+fingerprint, reuses it instead of running the task again.
+
+Inputs are assigned to tasks by a hash of their name, see utils.map_tasks,
+so adding a document to a job's input changes the inputs of one task only,
+and the other tasks keep their fingerprints.
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+
+from mapreduce.utils.cache import file_digest
+from mapreduce.utils.formats import input_file
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+
+def link_or_copy(src, dst):
+    """Hard link src to dst, copy when they are on different file systems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class MapOutputCache:
+    """Map task outputs stored by fingerprint with LRU eviction.
+
+    Each entry is a directory <cache_dir>/<fingerprint> holding one file per
+    partition.  Entries are touched when reused, and the least recently used
+    ones are evicted once the cache holds more than max_bytes.
+
+    EXAMPLE
+    >>> cache = MapOutputCache("var/memo", max_bytes=1 << 30)
+    >>> key = cache.fingerprint(input_paths, "map1.py", 3)
+    >>> if not cache.restore(key, tmpdir, 0, 3):
+    >>>     ...  # run map task 0, then
+    >>>     cache.store(key, tmpdir, 0, 3)
+    """
+
+    def __init__(self, cache_dir, max_bytes=None):
+        """Store parameters, create cache directory."""
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def fingerprint(input_paths, executable, num_partitions, options=None,
+                    cache_files=()):
+        """Return a key identifying the output of a map task.
+
+        Input files are identified by path, size and modification time, so
+        unchanged inputs are not re-read.  The executable and cache files
+        are hashed by content.  options holds task options that change the
+        output, like split points or sort keys.
+        """
+        key = hashlib.sha256()
+        for path in input_paths:
+            stat = os.stat(input_file(path))
+            key.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n"
+                       .encode("utf-8"))
+        key.update(file_digest(executable).encode("utf-8"))
+        for path in sorted(cache_files):
+            key.update(f"\n{path}\0{file_digest(path)}".encode("utf-8"))
+        key.update(f"\n{num_partitions}".encode("utf-8"))
+        if options:
+            key.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        return key.hexdigest()
+
+    @staticmethod
+    def output_names(task_id, num_partitions):
+        """Return the names of the partition files written by a map task."""
+        return [f"maptask{task_id:05d}-part{partition:05d}"
+                for partition in range(num_partitions)]
+
+    def restore(self, key, output_dir, task_id, num_partitions):
+        """Place cached output for key in output_dir, return True on a hit."""
+        entry = self.cache_dir/key
+        if not entry.is_dir():
+            return False
+        names = self.output_names(task_id, num_partitions)
+        for partition, name in enumerate(names):
+            link_or_copy(entry/f"part{partition:05d}",
+                         pathlib.Path(output_dir, name))
+        os.utime(entry)  # mark as recently used
+        return True
+
+    def store(self, key, output_dir, task_id, num_partitions):
+        """Add the output of a finished map task to the cache."""
+        entry = self.cache_dir/key
+        partial = self.cache_dir/f".{key}.partial"
+        names = self.output_names(task_id, num_partitions)
+        if entry.exists() or \
+                not all(pathlib.Path(output_dir, n).exists() for n in names):
+            return
+        shutil.rmtree(partial, ignore_errors=True)
+        partial.mkdir()
+        for partition, name in enumerate(names):
+            link_or_copy(pathlib.Path(output_dir, name),
+                         partial/f"part{partition:05d}")
+        try:
+            partial.rename(entry)
+        except OSError:
+            # Another job stored the same output first
+            shutil.rmtree(partial)
+
+    def evict(self):
+        """Remove least recently used entries until within max_bytes."""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith("."):
+                continue
+            size = sum(path.stat().st_size for path in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry)
+            total -= size
+            LOGGER.info("Evicted cached map output %s", entry.name)
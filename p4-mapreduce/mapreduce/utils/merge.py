@@ -0,0 +1,136 @@
+"""Merge sorted runs.
+
+This file is for code shared by the Manager and the Worker.
+"""
+import contextlib
+import functools
+import heapq
+import logging
+import pathlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+# Maximum number of sorted runs merged at once.  Reduce tasks with more inputs
+# merge them in tiers through intermediate runs, which bounds open files.
+MAX_FAN_IN = 32
+
+# Number of intermediate runs merged concurrently within one tier
+MERGE_THREADS = 4
+
+# Approximate number of bytes read ahead per chunk, and number of chunks each
+# prefetch thread may buffer before it waits for the merge to catch up
+PREFETCH_CHUNK_BYTES = 1 << 16
+PREFETCH_CHUNKS = 4
+
+
+class PrefetchReader:
+    """Read lines from a file in a separate read-ahead thread.
+
+    EXAMPLE
+    >>> with PrefetchReader("maptask00000-part00000") as reader:
+    >>>     for line in reader:
+    >>>         print(line)
+    """
+
+    def __init__(self, path):
+        """Store path, the thread is started on context manager enter."""
+        self.path = path
+        self.chunks = queue.Queue(maxsize=PREFETCH_CHUNKS)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.read_ahead)
+        self.error = None
+
+    def __enter__(self):
+        """Start read-ahead thread."""
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop read-ahead thread, even if lines were left unread."""
+        self.stop.set()
+        while self.thread.is_alive():
+            try:
+                self.chunks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        self.thread.join()
+
+    def __iter__(self):
+        """Yield lines in file order."""
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            yield from chunk
+        if self.error:
+            raise self.error
+
+    def read_ahead(self):
+        """Fill the chunk queue until EOF or until asked to stop.
+
+        This function runs in a separate thread.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as infile:
+                chunk = infile.readlines(PREFETCH_CHUNK_BYTES)
+                while chunk and not self.stop.is_set():
+                    self.put(chunk)
+                    chunk = infile.readlines(PREFETCH_CHUNK_BYTES)
+        except OSError as error:
+            self.error = error
+        self.put(None)
+
+    def put(self, chunk):
+        """Add chunk to the queue without blocking past a stop request."""
+        while not self.stop.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+            except queue.Full:
+                continue
+            return
+
+
+def merge_runs(paths, output_path, key=None):
+    """Merge sorted files in paths into one sorted file at output_path."""
+    with contextlib.ExitStack() as stack:
+        readers = [stack.enter_context(PrefetchReader(path))
+                   for path in paths]
+        with open(output_path, "w", encoding="utf-8") as outfile:
+            outfile.writelines(heapq.merge(*readers, key=key))
+    return output_path
+
+
+def merge_sorted_files(paths, tmpdir, stack, fan_in=None, key=None):
+    """Return an iterator over the sorted lines of all sorted files in paths.
+
+    When there are more than fan_in paths, groups of fan_in runs are merged
+    into intermediate runs in tmpdir until at most fan_in remain.  Files that
+    back the returned iterator stay open until stack is closed.  Files must be
+    sorted by key, a key function as for sorted().
+    """
+    fan_in = fan_in or MAX_FAN_IN
+    paths = [pathlib.Path(path) for path in paths]
+    intermediate = []
+    tier = 0
+    while len(paths) > fan_in:
+        groups = [paths[i:i + fan_in] for i in range(0, len(paths), fan_in)]
+        outputs = [pathlib.Path(tmpdir, f"merge{tier:02d}-run{i:05d}")
+                   for i in range(len(groups))]
+        with ThreadPoolExecutor(max_workers=MERGE_THREADS) as executor:
+            paths = list(executor.map(functools.partial(merge_runs, key=key),
+                                      groups, outputs))
+        LOGGER.info("Merged tier %s into %s runs", tier, len(paths))
+
+        # Runs from the previous tier have been consumed
+        for path in intermediate:
+            path.unlink()
+        intermediate = paths
+        tier += 1
+
+    readers = [stack.enter_context(PrefetchReader(path)) for path in paths]
+    return heapq.merge(*readers, key=key)
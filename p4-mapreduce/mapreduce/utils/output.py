@@ -0,0 +1,56 @@
+"""Commit a job's output directory.
+
+Reduce tasks place their part files directly in the job's output directory,
+see worker_reduce.  A previous job's output there is set aside first, in
+output/_temporary/previous, rather than deleted.  When the job succeeds its
+output is committed: the previous output is deleted and an empty _SUCCESS
+file is written.  When it fails the previous output is put back, so a
+failed job never destroys output that a _SUCCESS file vouches for.
+"""
+import os
+import pathlib
+import shutil
+
+
+def job_files(output_dir):
+    """Return the files a job wrote to output_dir."""
+    return [path for path in pathlib.Path(output_dir).iterdir()
+            if path.name in ("_SUCCESS", "_FAILED") or
+            path.name.startswith("part-")]
+
+
+def stage_output(output_dir):
+    """Create output_dir for a job, setting aside a previous job's output."""
+    output_dir = pathlib.Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    previous = output_dir/"_temporary"/"previous"
+    if previous.exists():
+        # An earlier job stopped before it ended, so the files in output_dir
+        # are incomplete and the output before it is still set aside
+        for path in job_files(output_dir):
+            path.unlink()
+        return
+    previous.mkdir(parents=True)
+    for path in job_files(output_dir):
+        os.replace(path, previous/path.name)
+
+
+def restore_output(output_dir):
+    """Replace a failed job's partial output with the previous output."""
+    previous = pathlib.Path(output_dir, "_temporary", "previous")
+    for path in job_files(output_dir):
+        path.unlink()
+    if previous.exists():
+        for path in previous.iterdir():
+            os.replace(path, pathlib.Path(output_dir, path.name))
+    shutil.rmtree(pathlib.Path(output_dir, "_temporary"), ignore_errors=True)
+
+
+def commit_job(output_dir):
+    """Mark a job's output complete with an empty _SUCCESS file.
+
+    The previous output and files left by reduce attempts that never
+    committed are removed first.
+    """
+    shutil.rmtree(pathlib.Path(output_dir, "_temporary"), ignore_errors=True)
+    pathlib.Path(output_dir, "_SUCCESS").touch()
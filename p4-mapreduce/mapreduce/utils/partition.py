@@ -0,0 +1,95 @@
+"""Partition map output.
+
+By default a key's partition is a hash of the key, which spreads keys evenly
+but leaves each reducer with an unrelated slice of the key space.  Jobs that
+want globally sorted output sample keys up front and partition by range
+instead, so that part-00000, part-00001, ... concatenate in sorted order.
+"""
+import bisect
+import hashlib
+import itertools
+import logging
+import os
+import pathlib
+import subprocess
+import tempfile
+
+from mapreduce.utils.common_usage import task_command
+from mapreduce.utils.formats import is_plain, open_input
+
+
+# Configure logging
+LOGGER = logging.getLogger(__name__)
+
+# Number of input lines fed to the mapper when sampling keys
+SAMPLE_LINES = 1000
+
+
+def partition_number(key, num_partitions, splits=None):
+    """Return the partition of a key.
+
+    With splits, a sorted list of num_partitions - 1 keys, partition i holds
+    the keys k with splits[i-1] <= k < splits[i].
+    """
+    if splits is not None:
+        return bisect.bisect_right(splits, key)
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest(),
+               base=16) % num_partitions
+
+
+def sample_lines(input_paths, num_lines=SAMPLE_LINES):
+    """Return up to num_lines lines spread evenly through the input files.
+
+    Lines of plain files are read at evenly spaced offsets, so files are not
+    read in full.  Compressed inputs contribute their first lines.
+    """
+    lines = []
+    per_file = max(1, num_lines // max(1, len(input_paths)))
+    for path in input_paths:
+        if not is_plain(path):
+            with open_input(path) as infile:
+                lines.extend(itertools.islice(infile, per_file))
+            continue
+        size = os.path.getsize(path)
+        seen = set()
+        with open(path, "rb") as infile:
+            for i in range(per_file):
+                offset = size * i // per_file
+                infile.seek(offset)
+                if offset:
+                    infile.readline()  # skip to the start of the next line
+                if infile.tell() in seen:
+                    continue
+                seen.add(infile.tell())
+                line = infile.readline()
+                if line:
+                    lines.append(line if line.endswith(b"\n")
+                                 else line + b"\n")
+    return lines
+
+
+def sample_splits(executable, input_paths, num_partitions, side_files=()):
+    """Return split points that range partition a job's map output.
+
+    Run the mapper on a sample of the input and pick num_partitions - 1 keys
+    that divide the sampled output keys evenly.  side_files are linked into
+    the mapper's working directory, as on a Worker.
+    """
+    with tempfile.TemporaryDirectory(prefix="mapreduce-sample-") as cwd:
+        for path in side_files:
+            pathlib.Path(cwd, pathlib.Path(path).name).symlink_to(path)
+        completed = subprocess.run(
+            task_command(pathlib.Path(executable).resolve()),
+            input=b"".join(sample_lines(input_paths)),
+            stdout=subprocess.PIPE,
+            cwd=cwd,
+            check=True,
+        )
+    keys = sorted(line.split("\t")[0] for line in
+                  completed.stdout.decode("utf-8").splitlines())
+    if not keys:
+        return []
+    splits = [keys[len(keys) * i // num_partitions]
+              for i in range(1, num_partitions)]
+    LOGGER.info("Sampled %s keys, split points %s", len(keys), splits)
+    return splits
@@ -0,0 +1,147 @@
+"""Trace where a job's time goes.
+
+A Worker records events while it runs a task: points in time like
+"received" and "finished", and spans like "sort" that have a duration.
+Timestamps come from time.monotonic(), which is unaffected by clock changes
+but only comparable within one machine.  A traced task's finished message
+carries its events and the Worker's monotonic time when it was sent, and
+the Manager shifts the events onto its own clock by the difference to the
+time it received the message.  Network latency is ignored.
+
+The Manager collects the events of a job into a timeline with one row per
+Worker, written in the Chrome trace event format.  Open it in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+import contextlib
+import json
+import time
+
+
+class TaskTrace:
+    """Events of one task attempt, recorded by the Worker.
+
+    EXAMPLE
+    >>> trace = TaskTrace()
+    >>> trace.mark("received")
+    >>> with trace.span("sort", file="part-00000"):
+    >>>     ...
+    >>> message_dict["trace"] = trace.message()
+    """
+
+    def __init__(self):
+        """Start with no events."""
+        self.events = []
+
+    def mark(self, name, **args):
+        """Record that something happened now."""
+        self.events.append({"name": name, "ts": time.monotonic(),
+                            "args": args})
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Record how long the body of a with statement takes."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.events.append({"name": name, "ts": start,
+                                "dur": time.monotonic() - start,
+                                "args": args})
+
+    def message(self):
+        """Return the events for a finished or failed message."""
+        return {"events": self.events, "sent": time.monotonic()}
+
+
+class JobTrace:
+    """Timeline of one job, collected by the Manager.
+
+    EXAMPLE
+    >>> trace = JobTrace(job_id=0)
+    >>> with trace.span("map stage"):
+    >>>     ...  # add() each traced task as it finishes
+    >>> trace.write("trace.json")
+    """
+
+    def __init__(self, job_id):
+        """Start the timeline now."""
+        self.job_id = job_id
+        self.start = time.monotonic()
+        self.workers = {}  # "host:port" -> pid, the Manager is pid 0
+        self.events = []
+
+    def chrome_ts(self, timestamp):
+        """Return microseconds since the job started."""
+        return round((timestamp - self.start) * 1e6)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Record how long a part of the job takes on the Manager."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.events.append({
+                "name": name, "cat": "manager", "ph": "X", "pid": 0,
+                "tid": 0, "ts": self.chrome_ts(start),
+                "dur": self.chrome_ts(time.monotonic()) -
+                self.chrome_ts(start),
+            })
+
+    def add(self, message_dict, stage):
+        """Add the events of a traced finished or failed message."""
+        trace = message_dict["trace"]
+        worker = f"{message_dict['worker_host']}:{message_dict['worker_port']}"
+        pid = self.workers.setdefault(worker, len(self.workers) + 1)
+        offset = time.monotonic() - trace["sent"]
+        events = trace["events"]
+        args = {"task_id": message_dict["task_id"],
+                "status": message_dict["message_type"]}
+        if "error" in message_dict:
+            args["error"] = message_dict["error"]
+        start = min(event["ts"] for event in events)
+        end = max(event["ts"] + event.get("dur", 0) for event in events)
+        self.events.append({
+            "name": f"{stage} task {message_dict['task_id']}",
+            "cat": stage, "ph": "X", "pid": pid, "tid": 0,
+            "ts": self.chrome_ts(start + offset),
+            "dur": self.chrome_ts(end + offset) -
+            self.chrome_ts(start + offset),
+            "args": args,
+        })
+        for event in events:
+            chrome_event = {
+                "name": event["name"], "cat": stage, "pid": pid, "tid": 0,
+                "ts": self.chrome_ts(event["ts"] + offset),
+                "args": {"task_id": message_dict["task_id"],
+                         **event["args"]},
+            }
+            if "dur" in event:
+                chrome_event["ph"] = "X"
+                chrome_event["dur"] = self.chrome_ts(
+                    event["ts"] + event["dur"] + offset
+                ) - chrome_event["ts"]
+            else:
+                chrome_event["ph"] = "i"
+                chrome_event["s"] = "t"
+            self.events.append(chrome_event)
+
+    def chrome_trace(self):
+        """Return the timeline as a Chrome trace JSON object."""
+        names = {0: "manager", **{
+            pid: f"worker {worker}" for worker, pid in self.workers.items()
+        }}
+        return {
+            "traceEvents": [
+                {"name": "process_name", "ph": "M", "pid": pid,
+                 "args": {"name": name}}
+                for pid, name in names.items()
+            ] + sorted(self.events, key=lambda event: event["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"job_id": self.job_id},
+        }
+
+    def write(self, path):
+        """Write the timeline to a Chrome trace JSON file."""
+        with open(path, "w", encoding="utf-8") as outfile:
+            json.dump(self.chrome_trace(), outfile)
@@ -1,8 +1,8 @@
 """MapReduce framework Worker node."""
-import heapq
-import hashlib
+import concurrent.futures
 import os
 import logging
+import lzma
 import json
 import pathlib
 import shutil
@@ -11,8 +11,9 @@ import subprocess
 import tempfile
 import threading
 import time
+import zlib
 from threading import Lock
-from contextlib import ExitStack
+from contextlib import ExitStack, suppress
 import click
 from mapreduce import utils
 
@@ -22,9 +23,88 @@ LOGGER = logging.getLogger(__name__)
 L = Lock()
 
 
+def start_task_process(executable, settings, **kwargs):
+    """Start a task executable, return the subprocess.Popen object.
+
+    settings may set "memory_mb" to cap the memory of the executable and
+    "cwd" for the directory it runs in.
+    """
+    settings = settings or {}
+    return subprocess.Popen(
+        utils.task_command(executable, settings.get("memory_mb")),
+        cwd=settings.get("cwd"),
+        **kwargs,
+    )
+
+
+def check_exit(process, executable):
+    """Raise CalledProcessError if a finished task process failed."""
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            str(executable))
+
+
+def task_errors(target, *args):
+    """Run target in a separate thread, return the errors it raised.
+
+    Any exception fails the task, because a task that ends early has
+    missing output.  The errors are reported to the Manager.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        error = executor.submit(target, *args).exception()
+    if error is None:
+        return []
+    LOGGER.error("Task failed: %s", error, exc_info=error)
+    return [f"{type(error).__name__}: {error}"]
+
+
+class InputFeeder(threading.Thread):
+    """Write a decompressed map input to a task's stdin.
+
+    The mapper's output is read at the same time, so this runs in a
+    separate thread.  It does nothing if stdin is None, because the input
+    file itself is the task's stdin.
+    """
+
+    def __init__(self, filename, infile, stdin):
+        """Store the input and the task's stdin, start with start()."""
+        super().__init__()
+        self.filename = filename
+        self.infile = infile
+        self.stdin = stdin
+        self.error = None
+
+    def run(self):
+        """Copy lines to stdin, then close it."""
+        if self.stdin is None:
+            return
+        try:
+            with self.stdin:
+                self.stdin.buffer.writelines(self.infile)
+        except BrokenPipeError:
+            pass  # the mapper exited early, its exit status tells why
+        except (OSError, EOFError, ValueError, zlib.error,
+                lzma.LZMAError) as error:
+            self.error = ValueError(f"Bad input {self.filename}: {error}")
+
+    def finish(self):
+        """Wait until all input is written, raise any error reading it."""
+        self.join()
+        if self.error:
+            raise self.error
+
+
 def worker_map(executable, input_path, num_partitions,
-               output, task_id):
-    """Map job."""
+               output, task_id, *, settings=None):
+    """Map job, settings are passed to start_task_process.
+
+    settings may set "splits" to range partition the output by key, see
+    utils.partition_number, and "partition_fields" and "sort_keys" to
+    partition and sort by key fields, see utils.keys.  Events are recorded
+    in settings["trace"], a utils.TaskTrace.
+    """
+    settings = settings or {}
+    trace = settings.get("trace") or utils.TaskTrace()
     with tempfile.TemporaryDirectory(
             prefix=f"mapreduce-local-task{task_id:05d}-") as tmpdir:
         LOGGER.info("Created tmpdir %s", tmpdir)
@@ -37,71 +117,144 @@ def worker_map(executable, input_path, num_partitions,
             files = [stack.enter_context(open(filename, 'a', encoding="utf-8"))
                      for filename in output_files]
             for filename in input_path:
-                with open(filename, encoding="utf-8") as infile:
-                    with subprocess.Popen(
-                            [executable],
-                            stdin=infile,
+                # Plain files are the mapper's stdin, other formats are
+                # decompressed into a pipe
+                with utils.open_input(filename) as infile, \
+                        start_task_process(
+                            executable, settings,
+                            stdin=(infile if utils.is_plain(filename)
+                                   else subprocess.PIPE),
                             stdout=subprocess.PIPE,
                             text=True,
-                    ) as map_process:
-                        LOGGER.info("Executed %s", executable)
-                        for line in map_process.stdout:
-                            # Add line to correct partition output file
-                            files[(int(hashlib.
-                                       md5(line.split("\t")[0].
-                                           encode("utf-8")).
-                                       hexdigest(),
-                                       base=16) % num_partitions)].write(line)
+                        ) as map_process:
+                    LOGGER.info("Executed %s", executable)
+                    trace.mark("subprocess start", input=str(filename))
+                    feeder = InputFeeder(filename, infile, map_process.stdin)
+                    feeder.start()
+                    write_partitions(map_process.stdout, files, settings)
+                    feeder.finish()
+                check_exit(map_process, executable)
+            # Partition files are flushed to disk as they are closed
+            with trace.span("spill"):
+                stack.close()
         # sort lines and
         # move files to managers tmp folder
-        for filename in os.listdir(pathlib.Path(tmpdir)):
+        sort_and_move(tmpdir, output,
+                      utils.line_sort_key(settings.get("sort_keys")), trace)
+
+
+def write_partitions(lines, files, settings):
+    """Write each map output line to its partition's file."""
+    for number, line in enumerate(lines):
+        if not number and settings.get("trace"):
+            settings["trace"].mark("first output line")
+        # Add line to correct partition output file
+        files[utils.partition_number(
+            utils.partition_key(line, settings.get("partition_fields")),
+            len(files), settings.get("splits"),
+        )].write(line)
+
+
+def sort_and_move(tmpdir, output, key=None, trace=None):
+    """Sort each file in tmpdir by key, then move it to output directory."""
+    trace = trace or utils.TaskTrace()
+    for filename in os.listdir(pathlib.Path(tmpdir)):
+        with trace.span("sort", file=filename):
             with open(pathlib.Path(tmpdir, filename), 'r',
                       encoding="utf-8") as file:
-                lines = sorted(file)
+                lines = sorted(file, key=key)
             with open(pathlib.Path(tmpdir, filename), 'w',
                       encoding="utf-8") as file:
                 for line in lines:
                     file.write(line)
-            LOGGER.info("Sorted %s", filename)
+        LOGGER.info("Sorted %s", filename)
+        with trace.span("move", file=filename):
             shutil.move(pathlib.Path(tmpdir, filename),
                         pathlib.Path(output, filename))
-            LOGGER.info("Moved %s", filename)
+        LOGGER.info("Moved %s", filename)
+
+
+def worker_reduce(executable, input_path, output, task_id, *,
+                  settings=None):
+    """Reduce job, settings are passed to start_task_process.
 
+    settings may set "sort_keys" when inputs are sorted by key fields, and
+    "trace" to a utils.TaskTrace recording events.
 
-def worker_reduce(executable, input_path, output, task_id):
-    """Reduce job."""
+    The reducer writes to a directory of its own under output/_temporary,
+    and the result is committed to output/part-XXXXX only if no other
+    attempt of the same task committed first.
+    """
+    settings = settings or {}
+    trace = settings.get("trace") or utils.TaskTrace()
+    attempts_dir = pathlib.Path(output, "_temporary")
+    attempts_dir.mkdir(exist_ok=True)
     with tempfile.TemporaryDirectory(
             prefix=f"mapreduce-local-task{task_id:05d}-") as tmpdir:
         LOGGER.info("Created tmpdir %s", tmpdir)
+        # Intermediate merge runs stay in this tmpdir, only the reducer's
+        # output is written to the attempt dir under output/_temporary
+        merge_dir = pathlib.Path(tmpdir, "merge")
+        merge_dir.mkdir()
         with ExitStack() as stack:
-            files = [stack.enter_context(open(fname, encoding="utf-8"))
-                     for fname in input_path]
-            instream = heapq.merge(*files)
-            filename = pathlib.PurePath(tmpdir, f"part-{task_id:05d}")
+            attempt_dir = tempfile.mkdtemp(prefix=f"task{task_id:05d}-",
+                                           dir=attempts_dir)
+            stack.callback(shutil.rmtree, attempt_dir, ignore_errors=True)
+            filename = pathlib.PurePath(attempt_dir, f"part-{task_id:05d}")
+            # Merging more runs than fit in one pass spills merged runs
+            with trace.span("spill", inputs=len(input_path)):
+                instream = utils.merge_sorted_files(
+                    input_path, merge_dir, stack,
+                    key=utils.line_sort_key(settings.get("sort_keys")),
+                )
             with open(filename, 'a', encoding="utf-8") as outfile:
-                with subprocess.Popen(
-                    [executable],
+                with start_task_process(
+                    executable, settings,
                     text=True,
                     stdin=subprocess.PIPE,
                     stdout=outfile,
                 ) as reduce_process:
                     LOGGER.info("Executed %s", executable)
+                    trace.mark("subprocess start")
                     # Pipe input to reduce_process
-                    for line in instream:
-                        reduce_process.stdin.write(line)
+                    reduce_process.stdin.writelines(instream)
+                check_exit(reduce_process, executable)
+            with trace.span("move", file=filename.name):
+                commit_output(filename, pathlib.Path(output, filename.name))
+    with suppress(OSError):
+        attempts_dir.rmdir()  # unless another attempt is still running
 
-        # move file to output folder
-        for filename in os.listdir(pathlib.Path(tmpdir)):
-            shutil.move(pathlib.Path(tmpdir, filename),
-                        pathlib.Path(output, filename))
-            LOGGER.info("Moved %s", filename)
+
+def commit_output(path, final_path):
+    """Atomically place path at final_path, unless final_path exists.
+
+    A hard link cannot replace an existing file, so of several attempts of
+    one task exactly one commits its output and readers never see a partial
+    file.  Return False if another attempt won.
+    """
+    try:
+        os.link(path, final_path)
+    except FileExistsError:
+        LOGGER.info("Discarded duplicate output %s", final_path.name)
+        return False
+    except OSError:
+        # File system without hard links, last attempt wins
+        os.replace(path, final_path)
+    LOGGER.info("Committed %s", final_path.name)
+    return True
 
 
 class Worker:
     """A class representing a Worker node in a MapReduce cluster."""
 
-    def __init__(self, host, port, manager_host, manager_port):
-        """Construct a Worker instance and start listening for messages."""
+    def __init__(self, host, port, manager_host, manager_port, *,
+                 options=None):
+        """Construct a Worker instance and start listening for messages.
+
+        options may advertise the Worker's capacity to the Manager with
+        "memory_mb" and "cpus".  Tasks are never allowed more than memory_mb.
+        Files a job declares for caching are staged in options["cache_dir"].
+        """
         LOGGER.info(
             "Starting worker host=%s port=%s pwd=%s",
             host, port, os.getcwd(),
@@ -114,9 +267,12 @@ class Worker:
         self.manager_host = manager_host
         self.manager_port = manager_port
         self.signals = {"shutdown": False}
-
-        self.udp_thread = threading.Thread(
-            target=self.worker_udp)
+        self.options = {"memory_mb": None, "cpus": None, "cache_dir": None,
+                        **(options or {})}
+        self.cache = utils.FileCache(
+            self.options["cache_dir"] or
+            pathlib.Path(tempfile.gettempdir(), f"mapreduce-cache-{port}")
+        )
         self.worker_tcp()
 
     def worker_tcp(self):
@@ -124,6 +280,7 @@ class Worker:
         LOGGER.info("Start TCP server thread")
         registered = False
         udp_running = False
+        udp_thread = threading.Thread(target=self.worker_udp)
 
         # Create an INET, STREAMing socket, this is TCP
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -159,53 +316,88 @@ class Worker:
                              json.dumps(message_dict, indent=2), )
 
                 if message_dict.get('message_type', "") == "register_ack":
-                    self.udp_thread.start()
+                    udp_thread.start()
                     udp_running = True
                 elif message_dict.get('message_type', "") == "shutdown":
                     self.signals['shutdown'] = True
-                elif message_dict.get('message_type', "") == "new_map_task":
-                    task_id = message_dict["task_id"]
-                    # do mapping here
-                    map_thread = threading.Thread(
-                        target=worker_map,
-                        args=(message_dict["executable"],
-                              message_dict["input_paths"],
-                              message_dict["num_partitions"],
-                              message_dict["output_directory"],
-                              task_id))
-                    map_thread.start()
-
-                    map_thread.join()
-                    utils.send_tcp_message(self.manager_host,
-                                           self.manager_port,
-                                           {"message_type": "finished",
-                                            "task_id": message_dict["task_id"],
-                                            "worker_host": self.host,
-                                            "worker_port": self.port})
-                elif message_dict.get('message_type', "") == "new_reduce_task":
-                    task_id = message_dict["task_id"]
-                    # do reducing here
-                    reduce_thread = threading.Thread(
-                        target=worker_reduce,
-                        args=(message_dict["executable"],
-                              message_dict["input_paths"],
-                              message_dict["output_directory"],
-                              task_id))
-                    reduce_thread.start()
-
-                    reduce_thread.join()
-                    utils.send_tcp_message(self.manager_host,
-                                           self.manager_port,
-                                           {"message_type": "finished",
-                                            "task_id": message_dict["task_id"],
-                                            "worker_host": self.host,
-                                            "worker_port": self.port})
+                elif message_dict.get('message_type', "") in (
+                        "new_map_task", "new_reduce_task"):
+                    self.run_task(message_dict)
 
         if udp_running:
-            self.udp_thread.join()
+            udp_thread.join()
 
         LOGGER.info("worker TCP shutting down")
 
+    def run_task(self, message_dict):
+        """Run a map or reduce task to completion and report it."""
+        trace = utils.TaskTrace()
+        trace.mark("received")
+        # Staging runs in the task thread too, so a missing cache file is
+        # reported as a failed task
+        errors = task_errors(self.execute_task, message_dict, trace)
+        self.task_done(message_dict["task_id"], errors,
+                       trace if message_dict.get("trace") else None)
+
+    def execute_task(self, message_dict, trace):
+        """Stage a task's files, then run its map or reduce function."""
+        task_id = message_dict["task_id"]
+        executable, cwd = self.stage_task(message_dict)
+        settings = {
+            "memory_mb": self.task_memory(message_dict),
+            "cwd": cwd,
+            "sort_keys": message_dict.get("sort_keys"),
+            "trace": trace,
+        }
+        if message_dict["message_type"] == "new_map_task":
+            settings["splits"] = message_dict.get("partition_splits")
+            settings["partition_fields"] = \
+                message_dict.get("partition_fields")
+            worker_map(executable, message_dict["input_paths"],
+                       message_dict["num_partitions"],
+                       message_dict["output_directory"], task_id,
+                       settings=settings)
+        else:
+            worker_reduce(executable, message_dict["input_paths"],
+                          message_dict["output_directory"], task_id,
+                          settings=settings)
+
+    def task_done(self, task_id, errors, trace=None):
+        """Tell the Manager a task finished, or why it failed.
+
+        The events of a traced task are sent along with it.
+        """
+        message_dict = {"message_type": "finished" if not errors
+                        else "failed",
+                        "task_id": task_id,
+                        "worker_host": self.host,
+                        "worker_port": self.port}
+        if errors:
+            message_dict["error"] = "; ".join(errors)
+        if trace is not None:
+            trace.mark("finished")
+            message_dict["trace"] = trace.message()
+        utils.send_tcp_message(self.manager_host, self.manager_port,
+                               message_dict)
+
+    def stage_task(self, message_dict):
+        """Return the executable and working directory for a task.
+
+        Tasks of jobs that declared cache files run a cached copy of the
+        executable in a directory holding the cached files.
+        """
+        if not message_dict.get("cache_files"):
+            return message_dict["executable"], None
+        return self.cache.stage_task(message_dict["executable"],
+                                     message_dict["cache_files"])
+
+    def task_memory(self, message_dict):
+        """Return the memory limit in MB for a task, None if unlimited."""
+        limits = [limit for limit in (message_dict.get("memory_mb"),
+                                      self.options["memory_mb"])
+                  if limit is not None]
+        return min(limits) if limits else None
+
     def registration(self):
         """Send registration message to Manager."""
         message_dict = {
@@ -213,6 +405,10 @@ class Worker:
             "worker_host": self.host,
             "worker_port": self.port,
         }
+        # Advertise capacity only when configured
+        for key in ("memory_mb", "cpus"):
+            if self.options[key] is not None:
+                message_dict[key] = self.options[key]
         utils.send_tcp_message(self.manager_host,
                                self.manager_port, message_dict)
         LOGGER.debug("TCP send to %s:%s \n%s",
@@ -224,21 +420,28 @@ class Worker:
         )
 
     def worker_udp(self):
-        """Send heartbeat every 2 sec or wait for a shutdown signal."""
-        while not self.signals["shutdown"]:
-            # Create an INET, DGRAM socket, this is UDP
-            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-                # Connect to the UDP socket on server
-                sock.connect((self.manager_host, self.manager_port))
+        """Send heartbeat every 2 sec or wait for a shutdown signal.
 
+        Heartbeats follow a fixed schedule, so time spent sending does not
+        stretch the interval the Manager sees.
+        """
+        interval = utils.liveness.HEARTBEAT_INTERVAL
+        next_beat = time.monotonic()
+        # Create an INET, DGRAM socket, this is UDP
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # Connect to the UDP socket on server
+            sock.connect((self.manager_host, self.manager_port))
+            message = json.dumps({"message_type": "heartbeat",
+                                  "worker_host": self.host,
+                                  "worker_port": self.port})
+            while not self.signals["shutdown"]:
                 # Send a message
-                message = json.dumps({"message_type": "heartbeat",
-                                      "worker_host": self.host,
-                                      "worker_port": self.port})
                 sock.sendall(message.encode('utf-8'))
                 LOGGER.debug("UDP send heartbeat to %s:%s",
                              self.manager_host, self.manager_port, )
-                time.sleep(2)
+                # Skip beats missed while stalled rather than bursting
+                next_beat = max(next_beat + interval, time.monotonic())
+                time.sleep(max(0, next_beat - time.monotonic()))
 
         LOGGER.info("worker UDP shutting down")
 
@@ -250,7 +453,14 @@ class Worker:
 @click.option("--manager-port", "manager_port", default=6000)
 @click.option("--logfile", "logfile", default=None)
 @click.option("--loglevel", "loglevel", default="info")
-def main(host, port, manager_host, manager_port, logfile, loglevel):
+@click.option("--memory-mb", "memory_mb", default=None, type=int,
+              help="Memory available to tasks in MB, default=unlimited")
+@click.option("--cpus", "cpus", default=None, type=int,
+              help="CPUs available to tasks, default=not advertised")
+@click.option("--cache-dir", "cache_dir", default=None,
+              help="Directory for cached job files, default=a temp dir")
+def main(host, port, manager_host, manager_port, logfile, loglevel,
+         **options):
     """Run Worker."""
     if logfile:
         handler = logging.FileHandler(logfile)
@@ -261,4 +471,4 @@ def main(host, port, manager_host, manager_port, logfile, loglevel):
     root_logger = logging.getLogger()
     root_logger.addHandler(handler)
     root_logger.setLevel(loglevel.upper())
-    Worker(host, port, manager_host, manager_port)
+    Worker(host, port, manager_host, manager_port, options=options)
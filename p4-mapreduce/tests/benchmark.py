@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+MapReduce framework benchmark.
+
+Start a Manager and Workers on localhost, run word count and grep jobs on
+synthetic input and report throughput, time per stage, peak memory and
+shuffle size.  Run from the project root directory.
+$ python3 tests/benchmark.py --size-mb 50 --skew 1.1
+
+Save results, then compare a later run against them.
+$ python3 tests/benchmark.py --save baseline.json
+$ python3 tests/benchmark.py --baseline baseline.json
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+import click
+from utils import benchmark
+
+
+@click.command()
+@click.option("--workers", "num_workers", default=3,
+              help="Number of Workers, default=3")
+@click.option("--job", "jobs", multiple=True,
+              type=click.Choice(sorted(benchmark.JOBS)),
+              help="Job to run, may be repeated, default=all jobs")
+@click.option("--size-mb", "size_mb", default=10.0,
+              help="Total input size in MB, default=10")
+@click.option("--files", "num_files", default=8,
+              help="Number of input files, default=8")
+@click.option("--skew", "skew", default=1.0,
+              help="Zipf exponent of key frequencies, 0=uniform, default=1")
+@click.option("--vocab", "vocab_size", default=10000,
+              help="Number of distinct keys, default=10000")
+@click.option("--seed", "seed", default=485, help="Random seed, default=485")
+@click.option("--nmappers", "num_mappers", default=4,
+              help="Number of mappers, default=4")
+@click.option("--nreducers", "num_reducers", default=2,
+              help="Number of reducers, default=2")
+@click.option("--save", "save", default=None, type=click.Path(),
+              help="Write results as JSON")
+@click.option("--baseline", "baseline", default=None,
+              type=click.Path(exists=True),
+              help="Fail if throughput regresses relative to saved results")
+@click.option("--tolerance", "tolerance", default=0.2,
+              help="Allowed throughput drop relative to baseline, default=0.2")
+def main(num_workers, jobs, size_mb, num_files, skew, vocab_size, seed,
+         num_mappers, num_reducers, save, baseline, tolerance):
+    """Run benchmark jobs and print one line of metrics per job."""
+    # We want a bunch of arguments, this is the top level CLI.
+    # pylint: disable=too-many-arguments,too-many-locals
+    jobs = jobs or sorted(benchmark.JOBS)
+    with tempfile.TemporaryDirectory(prefix="mapreduce-bench-") as tmpdir:
+        input_dir = Path(tmpdir)/"input"
+        benchmark.generate_input(input_dir, num_files,
+                                 int(size_mb * (1 << 20)), skew, vocab_size,
+                                 seed)
+        results = []
+        with benchmark.LocalCluster(tmpdir, num_workers) as cluster:
+            for job in jobs:
+                results.append(cluster.run_job(job, input_dir,
+                                               num_mappers, num_reducers))
+            peak_rss = cluster.peak_rss()
+    for result in results:
+        result.update(peak_rss)
+        print(json.dumps(result))
+
+    if save:
+        Path(save).write_text(json.dumps(results, indent=2), "utf-8")
+    if baseline:
+        regressions = benchmark.compare(
+            results, benchmark.load_results(baseline), tolerance,
+        )
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Click will provide the arguments, disable this pylint check.
+    # pylint: disable=no-value-for-parameter
+    main()
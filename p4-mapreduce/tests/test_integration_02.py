@@ -27,14 +27,15 @@ def test_many_mappers(mapreduce_client, tmp_path):
         "num_reducers": 2
     }, port=mapreduce_client.manager_port)
 
-    # Wait for output to be created
+    # Wait for output to be created and the job to be committed
     utils.wait_for_exists(
         f"{tmp_path}/part-00000",
         f"{tmp_path}/part-00001",
+        f"{tmp_path}/_SUCCESS",
     )
 
-    # Verify number of files
-    assert len(list(tmp_path.iterdir())) == 2
+    # Verify number of files, temporary attempt files are cleaned up
+    assert len(list(tmp_path.iterdir())) == 3
 
     # Verify final output file contents
     outfile00 = Path(f"{tmp_path}/part-00000")
@@ -0,0 +1,44 @@
+"""See unit test function docstring."""
+
+from pathlib import Path
+from click.testing import CliRunner
+import mapreduce.local
+from utils import TESTDATA_DIR
+
+
+def test_wordcount_local(tmp_path):
+    """Run a word count MapReduce job with the local runner.
+
+    Output is split across reducers exactly as on a cluster, so every key is
+    in exactly one partition and each partition is sorted.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    result = CliRunner().invoke(mapreduce.local.main, [
+        "--input", str(TESTDATA_DIR/"input"),
+        "--output", str(tmp_path/"output"),
+        "--mapper", str(TESTDATA_DIR/"exec/wc_map.sh"),
+        "--reducer", str(TESTDATA_DIR/"exec/wc_reduce.sh"),
+        "--nmappers", "3",
+        "--nreducers", "2",
+        "--processes", "2",
+    ])
+    assert result.exit_code == 0, result.output
+
+    assert sorted(path.name for path in (tmp_path/"output").iterdir()) == \
+        ["_SUCCESS", "part-00000", "part-00001"]
+    outfiles = sorted((tmp_path/"output").glob("part-*"))
+    actual = []
+    for outfile in outfiles:
+        with outfile.open(encoding="utf-8") as infile:
+            lines = infile.readlines()
+        assert lines == sorted(lines)
+        actual.extend(lines)
+
+    word_count_correct = Path(TESTDATA_DIR/"correct/word_count_correct.txt")
+    with word_count_correct.open(encoding="utf-8") as infile:
+        correct = sorted(infile.readlines())
+    assert sorted(actual) == correct
@@ -0,0 +1,42 @@
+"""See unit test function docstring."""
+
+from pathlib import Path
+from click.testing import CliRunner
+import mapreduce.local
+from utils import TESTDATA_DIR
+
+
+def test_wordcount_total_order(tmp_path):
+    """Run a word count job with sampled range partitioning.
+
+    Concatenating the output files in order gives globally sorted output.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    result = CliRunner().invoke(mapreduce.local.main, [
+        "--input", str(TESTDATA_DIR/"input"),
+        "--output", str(tmp_path/"output"),
+        "--mapper", str(TESTDATA_DIR/"exec/wc_map.sh"),
+        "--reducer", str(TESTDATA_DIR/"exec/wc_reduce.sh"),
+        "--nmappers", "2",
+        "--nreducers", "3",
+        "--total-order",
+    ])
+    assert result.exit_code == 0, result.output
+
+    outfiles = sorted((tmp_path/"output").glob("part-*"))
+    assert len(outfiles) == 3
+    actual = []
+    for outfile in outfiles:
+        with outfile.open(encoding="utf-8") as infile:
+            lines = infile.readlines()
+        assert lines, f"{outfile.name} is empty"
+        actual.extend(lines)
+
+    word_count_correct = Path(TESTDATA_DIR/"correct/word_count_correct.txt")
+    with word_count_correct.open(encoding="utf-8") as infile:
+        correct = sorted(infile.readlines())
+    assert actual == correct
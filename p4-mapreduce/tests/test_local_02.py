@@ -0,0 +1,70 @@
+"""See unit test function docstring."""
+
+from click.testing import CliRunner
+import mapreduce.local
+
+
+def test_secondary_sort(tmp_path):
+    """Run a job that sorts values numerically within each key.
+
+    The mapper emits "word<TAB>doc id" and the job sorts by word, then by doc
+    id as a number, so doc 10 comes after doc 9 at the reducer.  The reducer
+    passes its input through unchanged.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    (tmp_path/"input").mkdir()
+    for i in range(12):
+        (tmp_path/"input"/f"file{i:02d}").write_text(
+            f"{i} apple\n{i} banana\n", encoding="utf-8",
+        )
+    mapper = tmp_path/"map.sh"
+    mapper.write_text("#!/bin/sh\nawk '{print $2 \"\\t\" $1}'\n", "utf-8")
+    reducer = tmp_path/"reduce.sh"
+    reducer.write_text("#!/bin/sh\ncat\n", "utf-8")
+    mapper.chmod(0o755)
+    reducer.chmod(0o755)
+
+    result = CliRunner().invoke(mapreduce.local.main, [
+        "--input", str(tmp_path/"input"),
+        "--output", str(tmp_path/"output"),
+        "--mapper", str(mapper),
+        "--reducer", str(reducer),
+        "--nmappers", "3",
+        "--nreducers", "1",
+        "--sort-key", "1",
+        "--sort-key", "2n",
+    ])
+    assert result.exit_code == 0, result.output
+
+    outfile = tmp_path/"output"/"part-00000"
+    with outfile.open(encoding="utf-8") as infile:
+        actual = infile.readlines()
+    assert actual == [f"apple\t{i}\n" for i in range(12)] + \
+        [f"banana\t{i}\n" for i in range(12)]
+
+
+def test_sort_key_splits_groups(tmp_path):
+    """Reject sort keys that do not start with the grouping field.
+
+    Sorting by doc id first would interleave the lines of different words,
+    so the reducer would see each word several times.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    (tmp_path/"input").mkdir()
+    result = CliRunner().invoke(mapreduce.local.main, [
+        "--input", str(tmp_path/"input"),
+        "--output", str(tmp_path/"output"),
+        "--sort-key", "2n",
+    ])
+    assert result.exit_code == 2
+    assert "Sort keys must start with the 1 grouping field(s), e.g. -k 1" \
+        in result.output
+    assert not (tmp_path/"output").exists()
@@ -0,0 +1,74 @@
+"""See unit test function docstring."""
+
+import bz2
+import lzma
+from pathlib import Path
+from click.testing import CliRunner
+import mapreduce.compress
+import mapreduce.local
+from mapreduce import utils
+from utils import TESTDATA_DIR
+
+
+def test_compressed_input(mocker, tmp_path):
+    """Run a word count job on compressed and split input files.
+
+    Input files are compressed with block gzip, bzip2 and xz.  Blocks and
+    splits are made tiny, so block gzip files are split across map tasks
+    with lines crossing block and split boundaries.  Every line must be
+    mapped exactly once.
+
+    Note: 'mocker' is a fixture function provided by the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    mocker.patch("mapreduce.utils.formats.BLOCK_BYTES", 16)
+    mocker.patch("mapreduce.utils.formats.SPLIT_BYTES", 64)
+    inputs = sorted((TESTDATA_DIR/"input").iterdir())
+    input_dir = tmp_path/"input"
+    input_dir.mkdir()
+    for i, path in enumerate(inputs):
+        if i % 3 == 0:
+            result = CliRunner().invoke(mapreduce.compress.main, [
+                str(path), "--output", str(input_dir/f"{path.name}.gz"),
+            ])
+            assert result.exit_code == 0, result.output
+        else:
+            opener = bz2.open if i % 3 == 1 else lzma.open
+            suffix = ".bz2" if i % 3 == 1 else ".xz"
+            with opener(input_dir/f"{path.name}{suffix}", "wb") as outfile:
+                outfile.write(path.read_bytes())
+
+    # Large block gzip files are split
+    splits = utils.formats.input_splits(input_dir/f"{inputs[6].name}.gz")
+    assert len(splits) > 1
+    content = b""
+    for split in splits:
+        with utils.open_input(split) as infile:
+            content += b"".join(infile)
+    assert content == inputs[6].read_bytes()
+
+    result = CliRunner().invoke(mapreduce.local.main, [
+        "--input", str(input_dir),
+        "--output", str(tmp_path/"output"),
+        "--mapper", str(TESTDATA_DIR/"exec/wc_map.sh"),
+        "--reducer", str(TESTDATA_DIR/"exec/wc_reduce.sh"),
+        "--nmappers", "2",
+        "--nreducers", "2",
+        "--processes", "1",
+    ])
+    assert result.exit_code == 0, result.output
+
+    actual = []
+    for outfile in sorted((tmp_path/"output").glob("part-*")):
+        with outfile.open(encoding="utf-8") as infile:
+            actual.extend(infile.readlines())
+    word_count_correct = Path(TESTDATA_DIR/"correct/word_count_correct.txt")
+    with word_count_correct.open(encoding="utf-8") as infile:
+        correct = sorted(infile.readlines())
+    assert sorted(actual) == correct
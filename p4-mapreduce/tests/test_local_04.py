@@ -0,0 +1,46 @@
+"""See unit test function docstring."""
+
+from click.testing import CliRunner
+import mapreduce.local
+from utils import TESTDATA_DIR
+
+
+def test_failed_job_keeps_output(tmp_path):
+    """Run a job, then a failing job and a good job on the same output.
+
+    The failing job must leave the first job's output and its _SUCCESS
+    marker in place.  The next good job replaces them.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.  This
+    fixture creates a temporary directory for use within this test.  See
+    https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+
+    """
+    crash = tmp_path/"crash.sh"
+    crash.write_text("#!/bin/sh\ncat > /dev/null\nexit 3\n", "utf-8")
+    crash.chmod(0o755)
+
+    def run(reducer, num_reducers):
+        return CliRunner().invoke(mapreduce.local.main, [
+            "--input", str(TESTDATA_DIR/"input"),
+            "--output", str(tmp_path/"output"),
+            "--reducer", str(reducer),
+            "--nmappers", "2",
+            "--nreducers", str(num_reducers),
+        ])
+
+    result = run(TESTDATA_DIR/"exec/wc_reduce.sh", 2)
+    assert result.exit_code == 0, result.output
+    expected = {path.name: path.read_text("utf-8")
+                for path in (tmp_path/"output").iterdir()}
+    assert sorted(expected) == ["_SUCCESS", "part-00000", "part-00001"]
+
+    result = run(crash, 3)
+    assert result.exit_code != 0
+    assert {path.name: path.read_text("utf-8")
+            for path in (tmp_path/"output").iterdir()} == expected
+
+    result = run(TESTDATA_DIR/"exec/wc_reduce.sh", 1)
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in (tmp_path/"output").iterdir()) == \
+        ["_SUCCESS", "part-00000"]
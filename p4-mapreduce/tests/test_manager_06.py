@@ -0,0 +1,148 @@
+"""See unit test function docstring."""
+
+import json
+import tempfile
+import threading
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # Two Workers register, only the second one has room for the job's tasks
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+        "memory_mb": 100,
+        "cpus": 1,
+    }).encode("utf-8")
+    yield None
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3002,
+        "memory_mb": 1000,
+        "cpus": 4,
+    }).encode("utf-8")
+    yield None
+
+    # User submits new job declaring 500 MB per task
+    yield json.dumps({
+        "message_type": "new_manager_job",
+        "input_directory": TESTDATA_DIR/"input",
+        "output_directory": tmp_path,
+        "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+        "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "num_mappers": 2,
+        "num_reducers": 1,
+        "task_memory_mb": 500,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Wait for Manager to create temporary directory for the first job
+    #
+    # Transfer control back to solution under test in between each check for
+    # tmpdir to simulate the Manager calling recv() when there's nothing
+    # to receive.
+    tmpdir_job0 = None
+    for tmpdir_job0 in (
+        utils.wait_for_exists_glob(f"{tmp_path}/mapreduce-shared-job00000-*")
+    ):
+        yield None
+
+    # Simulate files created by Worker.  The files are empty because the
+    # Manager does not read the contents, just the filenames.
+    (tmpdir_job0/"maptask00000-part00000").touch()
+    (tmpdir_job0/"maptask00001-part00000").touch()
+
+    # Both map tasks run one after the other on Worker 3002, even though
+    # Worker 3001 is ready
+    for task_id in range(2):
+        for _ in utils.wait_for_map_messages(mock_sendall, num=task_id + 1):
+            yield None
+        yield json.dumps({
+            "message_type": "finished",
+            "task_id": task_id,
+            "worker_host": "localhost",
+            "worker_port": 3002,
+        }).encode("utf-8")
+        yield None
+
+    # Wait for Manager to send reduce job message
+    #
+    # Transfer control back to solution under test in between each check for
+    # reduce messages to simulate the Manager calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_reduce_messages(mock_sendall, num=1):
+        yield None
+
+    # Reduce job status finished
+    yield json.dumps({
+        "message_type": "finished",
+        "task_id": 0,
+        "worker_host": "localhost",
+        "worker_port": 3002,
+    }).encode("utf-8")
+    yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_memory_aware_scheduling(mocker, tmp_path):
+    """Verify Manager only assigns tasks to Workers with enough memory.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001, 3002)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify every task went to the Worker with enough memory, carrying the
+    # job's memory limit
+    messages = utils.get_messages(mock_sendall)
+    tasks = [m for m in messages
+             if utils.is_map_message(m) or utils.is_reduce_message(m)]
+    assert [(m["task_id"], m["worker_port"], m["memory_mb"])
+            for m in tasks] == [(0, 3002, 500), (1, 3002, 500), (0, 3002, 500)]
@@ -0,0 +1,136 @@
+"""See unit test function docstring."""
+
+import json
+import tempfile
+import threading
+from pathlib import Path
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # Worker register
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+    }).encode("utf-8")
+    yield None
+
+    # User submits the same job twice with a map output cache
+    for job_id in range(2):
+        yield json.dumps({
+            "message_type": "new_manager_job",
+            "input_directory": TESTDATA_DIR/"input",
+            "output_directory": tmp_path/f"output{job_id}",
+            "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+            "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+            "num_mappers": 2,
+            "num_reducers": 1,
+            "memo_dir": tmp_path/"memo",
+        }, cls=utils.PathJSONEncoder).encode("utf-8")
+        yield None
+
+    # Wait for Manager to create temporary directory for the first job
+    #
+    # Transfer control back to solution under test in between each check for
+    # tmpdir to simulate the Manager calling recv() when there's nothing
+    # to receive.
+    tmpdir_job0 = None
+    for tmpdir_job0 in (
+        utils.wait_for_exists_glob(f"{tmp_path}/mapreduce-shared-job00000-*")
+    ):
+        yield None
+
+    # Simulate files created by Worker
+    (tmpdir_job0/"maptask00000-part00000").write_text("a\t1\n", "utf-8")
+    (tmpdir_job0/"maptask00001-part00000").write_text("b\t1\n", "utf-8")
+
+    # First job runs both map tasks
+    for task_id in range(2):
+        for _ in utils.wait_for_map_messages(mock_sendall, num=task_id + 1):
+            yield None
+        yield json.dumps({
+            "message_type": "finished",
+            "task_id": task_id,
+            "worker_host": "localhost",
+            "worker_port": 3001,
+        }).encode("utf-8")
+        yield None
+
+    # Both jobs run their reduce task
+    for job_id in range(2):
+        for _ in utils.wait_for_reduce_messages(mock_sendall, num=job_id + 1):
+            yield None
+        yield json.dumps({
+            "message_type": "finished",
+            "task_id": 0,
+            "worker_host": "localhost",
+            "worker_port": 3001,
+        }).encode("utf-8")
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_map_output_memo(mocker, tmp_path):
+    """Verify Manager reuses cached map output for an identical job.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify the second job sent no map tasks, its reduce task read the
+    # cached map output
+    messages = utils.get_messages(mock_sendall)
+    assert len([m for m in messages if utils.is_map_message(m)]) == 2
+    reduce_tasks = [m for m in messages if utils.is_reduce_message(m)]
+    assert len(reduce_tasks) == 2
+    assert [Path(p).name for p in reduce_tasks[1]["input_paths"]] == [
+        "maptask00000-part00000", "maptask00001-part00000",
+    ]
+    assert len(list((tmp_path/"memo").iterdir())) == 2
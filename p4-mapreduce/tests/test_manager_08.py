@@ -0,0 +1,38 @@
+"""See unit test function docstring."""
+
+from mapreduce.utils.liveness import PhiAccrualDetector, PHI_DEAD, \
+    PHI_SUSPECT
+
+
+def test_phi_accrual_detector():
+    """Verify Worker suspicion adapts to each Worker's heartbeat history.
+
+    A Worker with regular heartbeats is suspected, then declared dead, sooner
+    than after five missed heartbeats.  A Worker whose heartbeats are just as
+    frequent on average, but jittery, is given more slack.
+    """
+    regular = PhiAccrualDetector(now=0)
+    jittery = PhiAccrualDetector(now=0)
+    now = 0
+    for i in range(50):
+        now += 2
+        regular.heartbeat(now=now)
+        jittery.heartbeat(now=now + (1.5 if i % 2 else -1.5))
+    jittery.heartbeat(now=now + 2)
+    now += 2
+
+    # Both are trusted within a normal interval
+    assert regular.phi(now=now + 2) < PHI_SUSPECT
+    assert jittery.phi(now=now + 2) < PHI_SUSPECT
+
+    # The regular Worker is suspected after two missed heartbeats and dead
+    # well before the ten seconds of a fixed five-miss timeout
+    assert regular.phi(now=now + 5.5) >= PHI_SUSPECT
+    assert regular.phi(now=now + 7) >= PHI_DEAD
+
+    # The jittery Worker is not declared dead for the same silence
+    assert jittery.phi(now=now + 7) < PHI_DEAD
+
+    # A heartbeat clears suspicion
+    regular.heartbeat(now=now + 7)
+    assert regular.phi(now=now + 7) < PHI_SUSPECT
@@ -0,0 +1,135 @@
+"""See unit test function docstring."""
+
+import json
+import tempfile
+import threading
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # Worker register
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+    }).encode("utf-8")
+    yield None
+
+    # User submits new job allowing two attempts per task
+    yield json.dumps({
+        "message_type": "new_manager_job",
+        "input_directory": TESTDATA_DIR/"input",
+        "output_directory": tmp_path/"output",
+        "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+        "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "num_mappers": 2,
+        "num_reducers": 1,
+        "max_task_attempts": 2,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Map task 0 fails every time, map task 1 succeeds
+    for num, task_id, status in [(1, 0, "failed"), (2, 1, "finished"),
+                                 (3, 0, "failed")]:
+        for _ in utils.wait_for_map_messages(mock_sendall, num=num):
+            yield None
+        yield json.dumps({
+            "message_type": status,
+            "task_id": task_id,
+            "worker_host": "localhost",
+            "worker_port": 3001,
+            **({"error": "CalledProcessError: exit status 1"}
+               if status == "failed" else {}),
+        }).encode("utf-8")
+        yield None
+
+    # Wait for Manager to give up on the job
+    #
+    # Transfer control back to solution under test in between each check for
+    # the diagnostics to simulate the Manager calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_exists_glob(f"{tmp_path}/output/_FAILED"):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_poison_task(mocker, tmp_path):
+    """Verify Manager fails a job whose task keeps failing.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    # Output of an earlier job that succeeded
+    (tmp_path/"output").mkdir()
+    (tmp_path/"output"/"part-00000").write_text("old\t1\n", "utf-8")
+    (tmp_path/"output"/"_SUCCESS").touch()
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify the failing task was tried twice, then the job failed without
+    # running the reduce stage
+    messages = utils.get_messages(mock_sendall)
+    assert [m["task_id"] for m in messages if utils.is_map_message(m)] == \
+        [0, 1, 0]
+    assert not [m for m in messages if utils.is_reduce_message(m)]
+    with (tmp_path/"output"/"_FAILED").open(encoding="utf-8") as infile:
+        diagnostics = json.load(infile)
+    assert diagnostics["reason"] == "map task 0 failed 2 times"
+    assert diagnostics["failed_attempts"] == [{
+        "stage": "map",
+        "task_id": 0,
+        "attempts": [{
+            "worker": "localhost:3001",
+            "error": "CalledProcessError: exit status 1",
+        }] * 2,
+    }]
+
+    # Verify the earlier job's output was kept
+    assert sorted(p.name for p in (tmp_path/"output").iterdir()) == \
+        ["_FAILED", "_SUCCESS", "part-00000"]
+    assert (tmp_path/"output"/"part-00000").read_text("utf-8") == "old\t1\n"
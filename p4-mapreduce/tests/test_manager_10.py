@@ -0,0 +1,51 @@
+"""See unit test function docstring."""
+
+import time
+from mapreduce.utils.autoscale import Autoscaler, IDLE_TIMEOUT
+
+
+def test_autoscaler(mocker):
+    """Verify local Workers are started and stopped with demand.
+
+    Workers are started up to the maximum while tasks wait, counting Workers
+    that have not registered yet.  Started Workers are stopped once idle for
+    IDLE_TIMEOUT, down to the minimum.  Other Workers are never stopped.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+    """
+    mock_start = mocker.patch("mapreduce.utils.autoscale.start_process")
+    mock_start.return_value.poll.return_value = None
+    scaler = Autoscaler(("localhost", 6000), 1, 3)
+    static = ("localhost", 6001)
+
+    # Start the minimum, even with nothing to do
+    now = time.monotonic()
+    assert scaler.plan({}, demand=0, now=now) == (1, [])
+    first = scaler.spawn()
+    command = mock_start.call_args.args[0]
+    assert command[:2] == ["mapreduce-worker", "--host"]
+    assert command[-4:] == ["--manager-host", "localhost",
+                            "--manager-port", "6000"]
+
+    # A Worker that has not registered yet counts as live
+    assert scaler.plan({}, demand=1, now=now) == (0, [])
+
+    # Start Workers while tasks wait, up to the maximum
+    assert scaler.plan({first: 1}, demand=4, now=now) == (2, [])
+    started = [first, scaler.spawn(), scaler.spawn()]
+    live = {worker: 1 for worker in started}
+    live[static] = 1
+    assert scaler.plan(live, demand=6, now=now) == (0, [])
+
+    # Idle Workers are kept for a while
+    live = {worker: 0 for worker in live}
+    assert scaler.plan(live, demand=0, now=now + 1) == (0, [])
+
+    # Then started Workers are stopped down to the minimum
+    spawn, retire = scaler.plan(live, demand=0, now=now + 1 + IDLE_TIMEOUT)
+    assert spawn == 0
+    assert sorted(retire) == sorted(started)
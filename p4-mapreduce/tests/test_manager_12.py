@@ -0,0 +1,146 @@
+"""See unit test function docstring."""
+
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # Worker register
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+    }).encode("utf-8")
+    yield None
+
+    # The same job runs three times.  Before the second run a document is
+    # added, which belongs to map task 1.  Before the third run the job's
+    # cache file changes, which changes the output of every map task.
+    changes = [
+        (None, [0, 1]),
+        (lambda: (tmp_path/"input/file09").write_text("new doc\n", "utf-8"),
+         [1]),
+        (lambda: (tmp_path/"stopwords.txt").write_text("a\nthe\n", "utf-8"),
+         [0, 1]),
+    ]
+    num_maps = 0
+    for job_id, (change, task_ids) in enumerate(changes):
+        if change:
+            change()
+        yield json.dumps({
+            "message_type": "new_manager_job",
+            "input_directory": tmp_path/"input",
+            "output_directory": tmp_path/f"output{job_id}",
+            "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+            "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+            "num_mappers": 2,
+            "num_reducers": 1,
+            "cache_files": [tmp_path/"stopwords.txt"],
+            "memo_dir": tmp_path/"memo",
+        }, cls=utils.PathJSONEncoder).encode("utf-8")
+        yield None
+
+        # Wait for Manager to create temporary directory for the job
+        #
+        # Transfer control back to solution under test in between each check
+        # for tmpdir to simulate the Manager calling recv() when there's
+        # nothing to receive.
+        tmpdir = None
+        for tmpdir in utils.wait_for_exists_glob(
+                f"{tmp_path}/mapreduce-shared-job{job_id:05d}-*"):
+            yield None
+
+        # Only map tasks without cached output run
+        for task_id in task_ids:
+            (tmpdir/f"maptask{task_id:05d}-part00000").write_text(
+                f"a\t{job_id}\n", "utf-8")
+            num_maps += 1
+            for _ in utils.wait_for_map_messages(mock_sendall, num=num_maps):
+                yield None
+            yield json.dumps({
+                "message_type": "finished",
+                "task_id": task_id,
+                "worker_host": "localhost",
+                "worker_port": 3001,
+            }).encode("utf-8")
+            yield None
+
+        for _ in utils.wait_for_reduce_messages(mock_sendall, num=job_id + 1):
+            yield None
+        yield json.dumps({
+            "message_type": "finished",
+            "task_id": 0,
+            "worker_host": "localhost",
+            "worker_port": 3001,
+        }).encode("utf-8")
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_map_output_memo_changes(mocker, tmp_path):
+    """Verify Manager reruns only the map tasks whose inputs changed.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    shutil.copytree(TESTDATA_DIR/"input", tmp_path/"input")
+    (tmp_path/"stopwords.txt").write_text("the\n", "utf-8")
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify the added document reran its own task only, and the changed
+    # cache file reran every task
+    messages = utils.get_messages(mock_sendall)
+    map_tasks = [m for m in messages if utils.is_map_message(m)]
+    assert [m["task_id"] for m in map_tasks] == [0, 1, 1, 0, 1]
+    assert "file09" in [Path(p).name for p in map_tasks[2]["input_paths"]]
+    assert len(list((tmp_path/"memo").iterdir())) == 5
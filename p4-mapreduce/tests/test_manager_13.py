@@ -0,0 +1,106 @@
+"""See unit test function docstring."""
+
+import json
+import tempfile
+import threading
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # Worker register
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+    }).encode("utf-8")
+    yield None
+
+    # User submits new total order job whose mapper writes bytes that are
+    # not UTF-8, so its output cannot be sampled
+    yield json.dumps({
+        "message_type": "new_manager_job",
+        "input_directory": TESTDATA_DIR/"input",
+        "output_directory": tmp_path/"output",
+        "mapper_executable": tmp_path/"binary_map.sh",
+        "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "num_mappers": 2,
+        "num_reducers": 1,
+        "total_order": True,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Wait for Manager to give up on the job
+    #
+    # Transfer control back to solution under test in between each check for
+    # the diagnostics to simulate the Manager calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_exists_glob(f"{tmp_path}/output/_FAILED"):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_sampling_failed(mocker, tmp_path):
+    """Verify Manager fails a total order job whose input cannot be sampled.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    mapper = tmp_path/"binary_map.sh"
+    mapper.write_text("#!/bin/sh\ncat > /dev/null\nprintf '\\377\\n'\n",
+                      "utf-8")
+    mapper.chmod(0o755)
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify no task was sent and the job failed
+    messages = utils.get_messages(mock_sendall)
+    assert not [m for m in messages
+                if utils.is_map_message(m) or utils.is_reduce_message(m)]
+    with (tmp_path/"output"/"_FAILED").open(encoding="utf-8") as infile:
+        diagnostics = json.load(infile)
+    assert diagnostics["reason"].startswith("sampling map input failed: ")
@@ -0,0 +1,216 @@
+"""See unit test function docstring."""
+
+import json
+import time
+import tempfile
+import threading
+import utils
+from utils import TESTDATA_DIR
+import mapreduce
+
+
+def register_messages(*ports):
+    """Fake Worker registration messages."""
+    for port in ports:
+        yield json.dumps({
+            "message_type": "register",
+            "worker_host": "localhost",
+            "worker_port": port,
+        }).encode("utf-8")
+        yield None
+
+
+def job_messages(tmp_path):
+    """Fake a job submission, then simulate its map output files."""
+    yield json.dumps({
+        "message_type": "new_manager_job",
+        "input_directory": TESTDATA_DIR/"input",
+        "output_directory": tmp_path/"output",
+        "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+        "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "num_mappers": 2,
+        "num_reducers": 1
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Simulate files created by Workers.  The files are empty because the
+    # Manager does not read the contents, just the filenames.
+    tmpdir_job0 = None
+    for tmpdir_job0 in (
+        utils.wait_for_exists_glob(f"{tmp_path}/mapreduce-shared-job00000-*")
+    ):
+        yield None
+    (tmpdir_job0/"maptask00000-part00000").touch()
+    (tmpdir_job0/"maptask00001-part00000").touch()
+
+
+def finished_message(task_id, port):
+    """Return a status finished message."""
+    return json.dumps({
+        "message_type": "finished",
+        "task_id": task_id,
+        "worker_host": "localhost",
+        "worker_port": port,
+    }).encode("utf-8")
+
+
+def wait_for_worker_death(worker_die):
+    """Yield every 1s, return once the Manager declared a Worker dead."""
+    for _ in range(utils.TIMEOUT_LONG):
+        if worker_die.call_count:
+            return
+        yield
+        time.sleep(1)
+    raise AssertionError("No Worker was declared dead")
+
+
+def late_map_generator(mock_sendall, tmp_path, worker_die):
+    """Fake a Worker that finishes its map task after it is declared dead.
+
+    Worker 3001 sends no heartbeats, so it is declared dead while running
+    map task 1, and no other Worker is ready to run the task again.
+    """
+    yield from register_messages(3002, 3001)
+    yield from job_messages(tmp_path)
+    for _ in utils.wait_for_map_messages(mock_sendall, num=2):
+        yield None
+    for _ in wait_for_worker_death(worker_die):
+        yield None
+
+    # The first attempt finishes after all, so it is not run again
+    yield finished_message(1, 3001)
+    yield None
+    yield finished_message(0, 3002)
+    yield None
+
+    for _ in utils.wait_for_reduce_messages(mock_sendall, num=1):
+        yield None
+    yield finished_message(0, 3002)
+    yield None
+    for _ in utils.wait_for_exists_glob(f"{tmp_path}/output/_SUCCESS"):
+        yield None
+
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def late_stage_generator(mock_sendall, tmp_path, worker_die, committed):
+    """Fake a Worker that finishes its map task during the reduce stage.
+
+    Worker 3001 sends no heartbeats, so it is declared dead while running
+    map task 0, and Worker 3002 runs the task again.
+    """
+    yield from register_messages(3001, 3002)
+    yield from job_messages(tmp_path)
+    for _ in utils.wait_for_map_messages(mock_sendall, num=2):
+        yield None
+    for _ in wait_for_worker_death(worker_die):
+        yield None
+    yield finished_message(1, 3002)
+    yield None
+    for _ in utils.wait_for_map_messages(mock_sendall, num=3):
+        yield None
+    yield finished_message(0, 3002)
+    yield None
+    for _ in utils.wait_for_reduce_messages(mock_sendall, num=1):
+        yield None
+
+    # The first attempt of map task 0 finishes while reduce task 0 runs
+    yield finished_message(0, 3001)
+    yield None
+    time.sleep(1)
+    committed.append((tmp_path/"output"/"_SUCCESS").exists())
+
+    yield finished_message(0, 3002)
+    yield None
+    for _ in utils.wait_for_exists_glob(f"{tmp_path}/output/_SUCCESS"):
+        yield None
+
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def worker_heartbeat_generator():
+    """Fake heartbeat messages from Worker 3002 only."""
+    while True:
+        yield json.dumps({
+            "message_type": "heartbeat",
+            "worker_host": "localhost",
+            "worker_port": 3002,
+        }).encode("utf-8")
+        time.sleep(utils.TIME_BETWEEN_HEARTBEATS)
+
+
+def run_manager(mocker, tmp_path, messages):
+    """Run a Manager receiving messages, return the messages it sent.
+
+    messages(mock_sendall, worker_die) returns the Worker message generator,
+    worker_die spies on the Manager declaring Workers dead.
+    """
+    mock_socket = mocker.patch("socket.socket")
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+    worker_die = mocker.spy(mapreduce.manager.Manager, "worker_die")
+    mock_clientsocket.recv.side_effect = messages(mock_sendall, worker_die)
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = worker_heartbeat_generator()
+    tempfile.tempdir = tmp_path
+
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+    return utils.get_messages(mock_sendall)
+
+
+def test_dead_worker_finishes(mocker, tmp_path):
+    """Verify a task a dead Worker finishes is neither rerun nor reduced.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    messages = run_manager(
+        mocker, tmp_path,
+        lambda mock_sendall, worker_die: late_map_generator(
+            mock_sendall, tmp_path, worker_die),
+    )
+    assert [m["task_id"] for m in messages if utils.is_map_message(m)] == \
+        [0, 1]
+    assert [m["task_id"] for m in messages if utils.is_reduce_message(m)] == \
+        [0]
+    assert (tmp_path/"output"/"_SUCCESS").exists()
+
+
+def test_dead_worker_finishes_late(mocker, tmp_path):
+    """Verify a map result arriving during the reduce stage is ignored.
+
+    Map task 0 and reduce task 0 share a task id, so the late map result
+    must not count as the reduce task, or the job commits too early.
+    """
+    committed = []
+    messages = run_manager(
+        mocker, tmp_path,
+        lambda mock_sendall, worker_die: late_stage_generator(
+            mock_sendall, tmp_path, worker_die, committed),
+    )
+    assert [m["task_id"] for m in messages if utils.is_map_message(m)] == \
+        [0, 1, 0]
+    assert [m["task_id"] for m in messages if utils.is_reduce_message(m)] == \
+        [0]
+    assert committed == [False]
+    assert (tmp_path/"output"/"_SUCCESS").exists()
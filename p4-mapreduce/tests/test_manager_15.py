@@ -0,0 +1,133 @@
+"""See unit test function docstring."""
+
+import json
+import tempfile
+import threading
+import time
+import mapreduce
+import utils
+from utils import TESTDATA_DIR
+
+
+def worker_message_generator(mock_sendall, tmp_path):
+    """Fake Worker messages."""
+    # A Worker without the memory a task needs registers first
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3001,
+        "memory_mb": 100,
+    }).encode("utf-8")
+    yield None
+
+    # User submits new job declaring 500 MB per task
+    yield json.dumps({
+        "message_type": "new_manager_job",
+        "input_directory": TESTDATA_DIR/"input",
+        "output_directory": tmp_path/"output",
+        "mapper_executable": TESTDATA_DIR/"exec/wc_map.sh",
+        "reducer_executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "num_mappers": 1,
+        "num_reducers": 1,
+        "task_memory_mb": 500,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+    tmpdir_job0 = None
+    for tmpdir_job0 in (
+        utils.wait_for_exists_glob(f"{tmp_path}/mapreduce-shared-job00000-*")
+    ):
+        yield None
+
+    # A Worker with enough memory registers within the grace period
+    time.sleep(mapreduce.manager.__main__.UNPLACEABLE_GRACE / 2)
+    yield json.dumps({
+        "message_type": "register",
+        "worker_host": "localhost",
+        "worker_port": 3002,
+        "memory_mb": 1000,
+    }).encode("utf-8")
+    yield None
+
+    # Simulate files created by Worker.  The files are empty because the
+    # Manager does not read the contents, just the filenames.
+    for _ in utils.wait_for_map_messages(mock_sendall, num=1):
+        yield None
+    (tmpdir_job0/"maptask00000-part00000").touch()
+    yield json.dumps({
+        "message_type": "finished",
+        "task_id": 0,
+        "worker_host": "localhost",
+        "worker_port": 3002,
+    }).encode("utf-8")
+    yield None
+
+    for _ in utils.wait_for_reduce_messages(mock_sendall, num=1):
+        yield None
+    yield json.dumps({
+        "message_type": "finished",
+        "task_id": 0,
+        "worker_host": "localhost",
+        "worker_port": 3002,
+    }).encode("utf-8")
+    yield None
+    for _ in utils.wait_for_exists_glob(f"{tmp_path}/output/_SUCCESS"):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_task_fits_late_worker(mocker, tmp_path):
+    """Verify Manager waits for a Worker with room that registers late.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # TCP recv() returns values generated by worker_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = worker_message_generator(mock_sendall, tmp_path)
+
+    # UDP recv() returns heartbeat messages
+    mock_udp_recv = mock_socket.return_value.__enter__.return_value.recv
+    mock_udp_recv.side_effect = utils.worker_heartbeat_generator(3001, 3002)
+
+    # Set the location where the Manager's temporary directory
+    # will be created.
+    tempfile.tempdir = tmp_path
+
+    # Run student Manager code.  When student Manager calls recv(), it will
+    # return the faked responses configured above.
+    try:
+        mapreduce.manager.Manager("localhost", 6000)
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify every task ran on the Worker with enough memory
+    messages = utils.get_messages(mock_sendall)
+    tasks = [m for m in messages
+             if utils.is_map_message(m) or utils.is_reduce_message(m)]
+    assert [m["worker_port"] for m in tasks] == [3002, 3002]
+    assert not (tmp_path/"output"/"_FAILED").exists()
@@ -0,0 +1,123 @@
+"""See unit test function docstring."""
+
+import json
+import threading
+from pathlib import Path
+import utils
+import mapreduce
+from utils import TESTDATA_DIR
+
+
+# Number of map outputs fed to the single reduce task
+NUM_INPUTS = 10
+
+
+def manager_message_generator(mock_sendall, tmp_path):
+    """Fake Manager messages."""
+    # Worker register
+    #
+    # Transfer control back to solution under test in between each check for
+    # the register message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_register_messages(mock_sendall):
+        yield None
+
+    yield json.dumps({
+        "message_type": "register_ack",
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }).encode("utf-8")
+    yield None
+
+    # Reduce task with more inputs than the merge fan-in
+    yield json.dumps({
+        "message_type": "new_reduce_task",
+        "task_id": 0,
+        "executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "input_paths": [
+            f"{tmp_path}/maptask{i:05d}-part00000" for i in range(NUM_INPUTS)
+        ],
+        "output_directory": tmp_path,
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Wait for Worker to finish reduce job
+    #
+    # Transfer control back to solution under test in between each check for
+    # the finished message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_status_finished_messages(mock_sendall):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_reduce_tiered_merge(mocker, tmp_path):
+    """Verify Worker merges reduce inputs in tiers when fan-in is exceeded.
+
+    The merge fan-in is lowered to 3 so that ten map outputs go through two
+    tiers of intermediate runs before reaching the reducer.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    for i in range(NUM_INPUTS):
+        words = sorted(["hello", "bye", f"word{i:02d}"] * (i + 1))
+        Path(f"{tmp_path}/maptask{i:05d}-part00000").write_text(
+            "".join(f"{word}\t1\n" for word in words), encoding="utf-8",
+        )
+    mocker.patch("mapreduce.utils.merge.MAX_FAN_IN", 3)
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # recv() returns values generated by manager_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = manager_message_generator(mock_sendall, tmp_path)
+
+    # Run student Worker code.  When student Worker calls recv(), it will
+    # return the faked responses configured above.  When the student code calls
+    # sys.exit(0), it triggers a SystemExit exception, which we'll catch.
+    try:
+        mapreduce.worker.Worker(
+            host="localhost",
+            port=6001,
+            manager_host="localhost",
+            manager_port=6000,
+        )
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify Reduce Stage output, intermediate runs must not be moved
+    with Path(f"{tmp_path}/part-00000").open(encoding="utf-8") as infile:
+        reduceout = infile.readlines()
+    total = NUM_INPUTS * (NUM_INPUTS + 1) // 2
+    assert reduceout == [
+        f"bye\t{total}\n",
+        f"hello\t{total}\n",
+        *[f"word{i:02d}\t{i + 1}\n" for i in range(NUM_INPUTS)],
+    ]
+    assert not list(tmp_path.glob("merge*"))
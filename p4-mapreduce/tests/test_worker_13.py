@@ -0,0 +1,134 @@
+"""See unit test function docstring."""
+
+import json
+import threading
+from pathlib import Path
+import utils
+import mapreduce
+
+
+def manager_message_generator(mock_sendall, tmp_path):
+    """Fake Manager messages."""
+    # Worker register
+    #
+    # Transfer control back to solution under test in between each check for
+    # the register message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_register_messages(mock_sendall):
+        yield None
+
+    yield json.dumps({
+        "message_type": "register_ack",
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }).encode("utf-8")
+    yield None
+
+    # Two map tasks of a job that declared a cached side file
+    for task_id in range(2):
+        yield json.dumps({
+            "message_type": "new_map_task",
+            "task_id": task_id,
+            "executable": tmp_path/"job/map.sh",
+            "input_paths": [tmp_path/f"input/file{task_id:02d}"],
+            "output_directory": tmp_path/"output",
+            "num_partitions": 1,
+            "cache_files": [tmp_path/"job/stopwords.txt"],
+            "worker_host": "localhost",
+            "worker_port": 6001,
+        }, cls=utils.PathJSONEncoder).encode("utf-8")
+        yield None
+
+        # Wait for Worker to finish map task
+        #
+        # Transfer control back to solution under test in between each check
+        # for the finished message to simulate the Worker calling recv() when
+        # there's nothing to receive.
+        for _ in utils.wait_for_status_finished_messages(
+                mock_sendall, num=task_id + 1):
+            yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_map_cached_files(mocker, tmp_path):
+    """Verify Worker runs tasks against cached copies of job files.
+
+    The mapper opens stopwords.txt from its working directory.  Both tasks
+    should share one cached copy of the mapper and of the side file.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    (tmp_path/"job").mkdir()
+    (tmp_path/"input").mkdir()
+    (tmp_path/"output").mkdir()
+    mapper = tmp_path/"job/map.sh"
+    mapper.write_text(
+        "#!/bin/bash\n"
+        "tr ' ' '\\n' | grep -v -x -F -f stopwords.txt | "
+        "awk '{print $1\"\\t1\"}'\n",
+        encoding="utf-8",
+    )
+    mapper.chmod(0o755)
+    (tmp_path/"job/stopwords.txt").write_text("the\na\n", encoding="utf-8")
+    (tmp_path/"input/file00").write_text("the cat\n", encoding="utf-8")
+    (tmp_path/"input/file01").write_text("a dog\n", encoding="utf-8")
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # recv() returns values generated by manager_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = manager_message_generator(mock_sendall, tmp_path)
+
+    # Count hashing of cached files
+    spy_digest = mocker.spy(mapreduce.utils.cache, "file_digest")
+
+    # Run student Worker code.  When student Worker calls recv(), it will
+    # return the faked responses configured above.  When the student code calls
+    # sys.exit(0), it triggers a SystemExit exception, which we'll catch.
+    try:
+        mapreduce.worker.Worker(
+            host="localhost",
+            port=6001,
+            manager_host="localhost",
+            manager_port=6000,
+            options={"cache_dir": tmp_path/"cache"},
+        )
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify map output, stopwords were read from the task working directory
+    assert Path(tmp_path/"output/maptask00000-part00000").read_text(
+        encoding="utf-8") == "cat\t1\n"
+    assert Path(tmp_path/"output/maptask00001-part00000").read_text(
+        encoding="utf-8") == "dog\t1\n"
+
+    # Each file was hashed and copied once, and both tasks shared a directory
+    assert spy_digest.call_count == 2
+    assert sorted(p.name for p in (tmp_path/"cache/files").glob("*/*")) == [
+        "map.sh", "stopwords.txt",
+    ]
+    assert len(list((tmp_path/"cache/tasks").iterdir())) == 1
@@ -0,0 +1,116 @@
+"""See unit test function docstring."""
+
+import json
+import threading
+from pathlib import Path
+import utils
+import mapreduce
+from utils import TESTDATA_DIR
+
+
+def manager_message_generator(mock_sendall, tmp_path):
+    """Fake Manager messages."""
+    # Worker register
+    #
+    # Transfer control back to solution under test in between each check for
+    # the register message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_register_messages(mock_sendall):
+        yield None
+
+    yield json.dumps({
+        "message_type": "register_ack",
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }).encode("utf-8")
+    yield None
+
+    # Reduce task whose output another attempt already committed
+    yield json.dumps({
+        "message_type": "new_reduce_task",
+        "task_id": 0,
+        "executable": TESTDATA_DIR/"exec/wc_reduce.sh",
+        "input_paths": [
+            f"{tmp_path}/maptask00000-part00000",
+        ],
+        "output_directory": tmp_path,
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Wait for Worker to finish reduce job
+    #
+    # Transfer control back to solution under test in between each check for
+    # the finished message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_status_finished_messages(mock_sendall):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_reduce_commit_once(mocker, tmp_path):
+    """Verify a reduce attempt does not overwrite committed output.
+
+    A re-executed reduce task finishes after an earlier attempt committed
+    part-00000.  The committed file is left as is and no attempt files are
+    left behind.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    Path(f"{tmp_path}/maptask00000-part00000").write_text(
+        "hello\t1\n", encoding="utf-8",
+    )
+    Path(f"{tmp_path}/part-00000").write_text("hello\t1\n", encoding="utf-8")
+    committed = Path(f"{tmp_path}/part-00000").stat()
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # recv() returns values generated by manager_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = manager_message_generator(mock_sendall, tmp_path)
+
+    # Run student Worker code.  When student Worker calls recv(), it will
+    # return the faked responses configured above.  When the student code calls
+    # sys.exit(0), it triggers a SystemExit exception, which we'll catch.
+    try:
+        mapreduce.worker.Worker(
+            host="localhost",
+            port=6001,
+            manager_host="localhost",
+            manager_port=6000,
+        )
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify the Worker reported the task finished, but the committed output
+    # is the original file
+    messages = utils.get_messages(mock_sendall)
+    assert [m["message_type"] for m in messages
+            if utils.is_status_finished_message(m)] == ["finished"]
+    assert Path(f"{tmp_path}/part-00000").stat().st_ino == committed.st_ino
+    assert not Path(f"{tmp_path}/_temporary").exists()
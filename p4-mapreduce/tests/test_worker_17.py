@@ -0,0 +1,131 @@
+"""See unit test function docstring."""
+
+import json
+import threading
+import utils
+import mapreduce
+from mapreduce.utils.trace import JobTrace
+from utils import TESTDATA_DIR
+
+
+def manager_message_generator(mock_sendall, tmp_path):
+    """Fake Manager messages."""
+    # Worker register
+    #
+    # Transfer control back to solution under test in between each check for
+    # the register message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_register_messages(mock_sendall):
+        yield None
+
+    yield json.dumps({
+        "message_type": "register_ack",
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }).encode("utf-8")
+    yield None
+
+    # New traced map job
+    yield json.dumps({
+        "message_type": "new_map_task",
+        "task_id": 0,
+        "executable": TESTDATA_DIR/"exec/wc_map.sh",
+        "input_paths": [TESTDATA_DIR/"input/file02"],
+        "output_directory": tmp_path,
+        "num_partitions": 2,
+        "trace": True,
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }, cls=utils.PathJSONEncoder).encode("utf-8")
+    yield None
+
+    # Wait for Worker to finish map task
+    #
+    # Transfer control back to solution under test in between each check for
+    # the finished message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_status_finished_messages(mock_sendall):
+        yield None
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_task_trace(mocker, tmp_path):
+    """Verify Worker records the events of a traced task.
+
+    The finished message carries the task's events, which the Manager turns
+    into a Chrome trace timeline.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+
+    Note: 'tmp_path' is a fixture provided by the pytest-mock package.
+    This fixture creates a temporary directory for use within this test.
+
+    See https://docs.pytest.org/en/6.2.x/tmpdir.html for more info.
+    """
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # recv() returns values generated by manager_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = manager_message_generator(mock_sendall, tmp_path)
+
+    # Run student Worker code.  When student Worker calls recv(), it will
+    # return the faked responses configured above.  When the student code calls
+    # sys.exit(0), it triggers a SystemExit exception, which we'll catch.
+    try:
+        mapreduce.worker.Worker(
+            host="localhost",
+            port=6001,
+            manager_host="localhost",
+            manager_port=6000,
+        )
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify the finished message carries the task's events in order
+    all_messages = utils.get_messages(mock_sendall)
+    messages = utils.filter_not_heartbeat_messages(all_messages)
+    finished = [message for message in messages
+                if utils.is_status_finished_message(message)]
+    assert len(finished) == 1
+    events = finished[0]["trace"]["events"]
+    assert [event["name"] for event in events] == [
+        "received", "subprocess start", "first output line", "spill",
+        "sort", "move", "sort", "move", "finished",
+    ]
+    assert all(later["ts"] >= earlier["ts"]
+               for earlier, later in zip(events, events[1:]))
+    assert all(event["dur"] >= 0 for event in events if "dur" in event)
+
+    # Verify the Manager's timeline holds the task on the Worker's row
+    job_trace = JobTrace(job_id=0)
+    job_trace.add(finished[0], "map")
+    chrome = json.loads(json.dumps(job_trace.chrome_trace()))
+    assert {"name": "process_name", "ph": "M", "pid": 1,
+            "args": {"name": "worker localhost:6001"}} \
+        in chrome["traceEvents"]
+    task_events = [event for event in chrome["traceEvents"]
+                   if event["ph"] != "M"]
+    assert task_events[0]["name"] == "map task 0"
+    assert task_events[0]["ph"] == "X"
+    assert all(event["pid"] == 1 and event["cat"] == "map"
+               for event in task_events)
+    assert len(task_events) == len(events) + 1
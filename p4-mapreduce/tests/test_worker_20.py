@@ -0,0 +1,98 @@
+"""See unit test function docstring."""
+
+import json
+import threading
+import time
+import utils
+import mapreduce
+
+
+def manager_message_generator(mock_sendall):
+    """Fake Manager messages."""
+    # Worker register
+    #
+    # Transfer control back to solution under test in between each check for
+    # the register message to simulate the Worker calling recv() when there's
+    # nothing to receive.
+    for _ in utils.wait_for_register_messages(mock_sendall):
+        yield None
+
+    yield json.dumps({
+        "message_type": "register_ack",
+        "worker_host": "localhost",
+        "worker_port": 6001,
+    }).encode("utf-8")
+    yield None
+
+    # Wait for heartbeats to continue after the stalled one
+    for _ in range(utils.TIMEOUT * 10):
+        messages = utils.get_messages(mock_sendall)
+        if sum(map(utils.is_heartbeat_message, messages)) >= 5:
+            break
+        yield None
+        time.sleep(0.1)
+
+    # Shutdown
+    yield json.dumps({
+        "message_type": "shutdown",
+    }).encode("utf-8")
+    yield None
+
+
+def test_heartbeat_stall(mocker):
+    """Verify Worker keeps sending heartbeats after a stalled one.
+
+    Heartbeats are sent every 0.1 s in this test, and sending the first one
+    takes 0.3 s, like a Worker that is overloaded.
+
+    Note: 'mocker' is a fixture function provided the the pytest-mock package.
+    This fixture lets us override a library function with a temporary fake
+    function that returns a hardcoded value while testing.
+
+    See https://github.com/pytest-dev/pytest-mock/ for more info.
+    """
+    mocker.patch.object(mapreduce.utils.liveness, "HEARTBEAT_INTERVAL", 0.1)
+
+    # Mock the socket library socket class
+    mock_socket = mocker.patch("socket.socket")
+
+    # sendall() records messages, and stalls on the first heartbeat
+    stalled = []
+
+    def stall_first_heartbeat(message_bytes):
+        """Take longer than a heartbeat interval to send one heartbeat."""
+        message = json.loads(message_bytes.decode("utf-8"))
+        if utils.is_heartbeat_message(message) and not stalled:
+            stalled.append(message)
+            time.sleep(0.3)
+
+    mock_sendall = mock_socket.return_value.__enter__.return_value.sendall
+    mock_sendall.side_effect = stall_first_heartbeat
+
+    # accept() returns a mock client socket
+    mock_clientsocket = mocker.MagicMock()
+    mock_accept = mock_socket.return_value.__enter__.return_value.accept
+    mock_accept.return_value = (mock_clientsocket, ("127.0.0.1", 10000))
+
+    # recv() returns values generated by manager_message_generator()
+    mock_recv = mock_clientsocket.recv
+    mock_recv.side_effect = manager_message_generator(mock_sendall)
+
+    # Run student Worker code.  When student Worker calls recv(), it will
+    # return the faked responses configured above.  When the student code calls
+    # sys.exit(0), it triggers a SystemExit exception, which we'll catch.
+    try:
+        mapreduce.worker.Worker(
+            host="localhost",
+            port=6001,
+            manager_host="localhost",
+            manager_port=6000,
+        )
+        assert threading.active_count() == 1, "Failed to shutdown threads"
+    except SystemExit as error:
+        assert error.code == 0
+
+    # Verify heartbeats went on after the stall
+    messages = utils.get_messages(mock_sendall)
+    assert stalled
+    assert sum(map(utils.is_heartbeat_message, messages)) >= 5
@@ -122,6 +122,14 @@ def is_status_finished_message(message):
     )
 
 
+def is_status_failed_message(message):
+    """Return True message is a status failed message."""
+    return (
+        "message_type" in message and
+        message["message_type"] == "failed"
+    )
+
+
 def is_heartbeat_message(message):
     """Return True if message is a heartbeat message."""
     return (
@@ -192,6 +200,11 @@ def wait_for_status_finished_messages(mock_sendall, num=1):
     return wait_for_messages(is_status_finished_message, mock_sendall, num)
 
 
+def wait_for_status_failed_messages(mock_sendall, num=1):
+    """Return after num status failed messages."""
+    return wait_for_messages(is_status_failed_message, mock_sendall, num)
+
+
 def wait_for_register_messages(mock_sendall, num=1):
     """Return after num register messages."""
     return wait_for_messages(is_register_message, mock_sendall, num)
@@ -0,0 +1,277 @@
+"""Benchmark the MapReduce framework on a local cluster.
+
+A benchmark starts one Manager and several Workers on localhost, runs jobs
+on synthetic input and measures throughput, time per stage, peak memory and
+the number of bytes shuffled between the map and reduce stages.
+"""
+import contextlib
+import json
+import pathlib
+import random
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from utils import get_open_port, send_message, TESTDATA_DIR
+
+
+# How long to wait for a server to start or a job to finish in s
+TIMEOUT = 5
+TIMEOUT_JOB = 600
+
+# Time between polls of the Manager log file in s
+POLL_INTERVAL = 0.05
+
+# Mapper and reducer executables for each benchmark job
+JOBS = {
+    "wc": (TESTDATA_DIR/"exec/wc_map.sh", TESTDATA_DIR/"exec/wc_reduce.sh"),
+    "grep": (TESTDATA_DIR/"exec/grep_map.py",
+             TESTDATA_DIR/"exec/grep_reduce.py"),
+}
+
+# Word the grep mapper searches for by default
+GREP_QUERY = "product"
+
+# Manager log messages marking the start and end of each stage
+STAGE_MESSAGES = {
+    "Detect new job.": "job_start",
+    "Map stage done": "map_done",
+    "Reduce stage done": "reduce_done",
+}
+
+
+def generate_input(input_dir, num_files, size_bytes, skew, vocab_size, seed):
+    """Write num_files files with size_bytes of words in total to input_dir.
+
+    Words are drawn from a Zipf distribution with exponent skew over a
+    vocabulary of vocab_size words.  skew=0 gives uniformly distributed keys.
+    The same seed always produces the same input.
+    """
+    # Generating input needs all of its parameters
+    # pylint: disable=too-many-arguments
+    rng = random.Random(seed)
+    vocab = [GREP_QUERY] + [f"w{i}" for i in range(1, vocab_size)]
+    weights = [1 / (rank ** skew) for rank in range(1, vocab_size + 1)]
+    input_dir = pathlib.Path(input_dir)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(num_files):
+        remaining = size_bytes // num_files
+        with open(input_dir/f"file{i:05d}", "w", encoding="utf-8") as outfile:
+            while remaining > 0:
+                line = " ".join(rng.choices(vocab, weights, k=12)) + "\n"
+                outfile.write(line)
+                remaining -= len(line)
+
+
+def peak_rss_bytes(pid):
+    """Return the peak resident set size of a process, None if unknown."""
+    try:
+        status = pathlib.Path(f"/proc/{pid}/status").read_text("utf-8")
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+class LogWatcher:
+    """Timestamp Manager log messages as they are written.
+
+    The Manager log has no timestamps, so a separate thread polls the log file
+    and records when each stage message first appears.  When the map stage
+    finishes, it also measures the size of the map output, which is what the
+    reduce stage shuffles.
+    """
+
+    def __init__(self, logfile, shared_dir):
+        """Store paths, start watching with start()."""
+        self.logfile = pathlib.Path(logfile)
+        self.shared_dir = pathlib.Path(shared_dir)
+        self.events = []
+        self.run = True
+        self.thread = threading.Thread(target=self.watch)
+
+    def start(self):
+        """Start watching in a separate thread."""
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching."""
+        self.run = False
+        self.thread.join()
+
+    def watch(self):
+        """Poll the log file for stage messages.
+
+        This function runs in a separate thread.
+        """
+        while not self.logfile.exists() and self.run:
+            time.sleep(POLL_INTERVAL)
+        with open(self.logfile, encoding="utf-8") as infile:
+            while self.run:
+                line = infile.readline()
+                if not line:
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                for message, event in STAGE_MESSAGES.items():
+                    if message in line:
+                        self.record(event)
+
+    def record(self, event):
+        """Store a timestamped event, measure shuffle size after map."""
+        shuffle_bytes = None
+        if event == "map_done":
+            shuffle_bytes = sum(
+                path.stat().st_size
+                for path in self.shared_dir.glob("mapreduce-shared-job*/*")
+            )
+        self.events.append((event, time.monotonic(), shuffle_bytes))
+
+    def wait_for(self, event, count):
+        """Return after event has been recorded count times."""
+        for _ in range(int(TIMEOUT_JOB / POLL_INTERVAL)):
+            if sum(e[0] == event for e in self.events) >= count:
+                return
+            time.sleep(POLL_INTERVAL)
+        raise TimeoutError(f"Timed out waiting for {event}")
+
+
+class LocalCluster:
+    """Run a Manager and Workers on localhost in separate processes.
+
+    EXAMPLE
+    >>> with LocalCluster(tmpdir, num_workers=3) as cluster:
+    >>>     metrics = cluster.run_job("wc", input_dir, 2, 2)
+    """
+
+    def __init__(self, workdir, num_workers):
+        """Store parameters, the cluster is started on enter."""
+        self.workdir = pathlib.Path(workdir)
+        self.num_workers = num_workers
+        self.manager_port = None
+        self.processes = []
+        self.watcher = LogWatcher(self.workdir/"manager.log",
+                                  self.workdir/"shared")
+        self.stack = contextlib.ExitStack()
+        self.num_jobs = 0
+
+    def __enter__(self):
+        """Start the Manager and Workers."""
+        (self.workdir/"shared").mkdir(parents=True, exist_ok=True)
+        self.manager_port, *worker_ports = \
+            get_open_port(nports=1 + self.num_workers)
+        self.start_process(self.manager_port, [
+            "mapreduce-manager",
+            "--port", str(self.manager_port),
+            "--logfile", str(self.workdir/"manager.log"),
+            "--shared_dir", str(self.workdir/"shared"),
+        ])
+        self.watcher.start()
+        for port in worker_ports:
+            self.start_process(port, [
+                "mapreduce-worker",
+                "--port", str(port),
+                "--manager-port", str(self.manager_port),
+                "--logfile", str(self.workdir/f"worker-{port}.log"),
+            ])
+        return self
+
+    def __exit__(self, *args):
+        """Shut down the cluster."""
+        try:
+            send_message({"message_type": "shutdown"}, self.manager_port)
+        except ConnectionRefusedError:
+            pass
+        self.watcher.stop()
+        for process in self.processes:
+            try:
+                process.wait(timeout=TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+        self.stack.close()
+
+    def start_process(self, port, args):
+        """Start a server process and wait for it to listen on port."""
+        process = self.stack.enter_context(
+            subprocess.Popen([shutil.which(args[0]), *args[1:]])
+        )
+        self.processes.append(process)
+        for _ in range(10*TIMEOUT):
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                if sock.connect_ex(("localhost", port)) == 0:
+                    return
+            if process.poll() is not None:
+                raise ChildProcessError(f"Premature exit: {process}")
+            time.sleep(0.1)
+        raise ChildProcessError(f"Failed to start: {process}")
+
+    def run_job(self, job, input_dir, num_mappers, num_reducers):
+        """Run one job to completion and return its metrics."""
+        mapper, reducer = JOBS[job]
+        output_dir = self.workdir/f"output-{self.num_jobs:05d}"
+        start = time.monotonic()
+        send_message({
+            "message_type": "new_manager_job",
+            "input_directory": str(input_dir),
+            "output_directory": str(output_dir),
+            "mapper_executable": str(mapper),
+            "reducer_executable": str(reducer),
+            "num_mappers": num_mappers,
+            "num_reducers": num_reducers,
+        }, self.manager_port)
+        self.num_jobs += 1
+        self.watcher.wait_for("reduce_done", self.num_jobs)
+        stop = time.monotonic()
+
+        times = {}
+        shuffle_bytes = 0
+        for event, timestamp, nbytes in self.watcher.events:
+            times[event] = timestamp
+            shuffle_bytes = nbytes if nbytes is not None else shuffle_bytes
+        input_bytes = sum(p.stat().st_size
+                          for p in pathlib.Path(input_dir).iterdir())
+        return {
+            "job": job,
+            "input_bytes": input_bytes,
+            "total_s": stop - start,
+            "queue_s": times["job_start"] - start,
+            "map_s": times["map_done"] - times["job_start"],
+            "reduce_s": times["reduce_done"] - times["map_done"],
+            "throughput_mb_s": input_bytes / (1 << 20) / (stop - start),
+            "shuffle_bytes": shuffle_bytes,
+        }
+
+    def peak_rss(self):
+        """Return peak RSS in bytes of the Manager and of any one Worker."""
+        rss = [peak_rss_bytes(p.pid) for p in self.processes]
+        if None in rss:
+            return {"manager_rss_bytes": None, "worker_rss_bytes": None}
+        return {"manager_rss_bytes": rss[0], "worker_rss_bytes": max(rss[1:])}
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions in results relative to baseline.
+
+    A job regresses when its throughput drops by more than tolerance, a
+    fraction of the baseline throughput.
+    """
+    regressions = []
+    expected = {result["job"]: result for result in baseline}
+    for result in results:
+        if result["job"] not in expected:
+            continue
+        before = expected[result["job"]]["throughput_mb_s"]
+        if result["throughput_mb_s"] < before * (1 - tolerance):
+            regressions.append(
+                f"{result['job']}: {result['throughput_mb_s']:.2f} MB/s, "
+                f"baseline {before:.2f} MB/s"
+            )
+    return regressions
+
+
+def load_results(path):
+    """Load benchmark results previously written as JSON."""
+    with open(path, encoding="utf-8") as infile:
+        return json.load(infile)
@@ -12,6 +12,12 @@ app = flask.Flask(__name__)
 app.config["INDEX_PATH"] = os.getenv("INDEX_PATH", "inverted_index_1.txt")
 app.config["PATH"] = str(Path(__file__).resolve().parent)
 
+# Score with NumPy when it is installed, INDEX_SCORING=python to disable
+app.config["INDEX_SCORING"] = os.getenv("INDEX_SCORING", "numpy")
+
+# Number of query results cached, 0 disables the cache
+app.config["INDEX_CACHE_SIZE"] = int(os.getenv("INDEX_CACHE_SIZE", "1024"))
+
 # Tell our app about views and model.  This is dangerously close to a
 # circular import, which is naughty, but Flask was designed that way.
 # (Reference http://flask.pocoo.org/docs/patterns/packages/)  We're
@@ -1,21 +1,36 @@
 """REST API for resources urls."""
+import heapq
 import math
+import os
 import re
+import signal
+import threading
 import flask
 import index
+import index.cache
+import index.maxscore
+import index.metrics
+import index.segment
+import index.vector
 
 
 # inverted_index = { term_global : [idf, { doc : [tf, norm] }] }
-inverted_index = {}
-with open(index.app.config["PATH"] + '/inverted_index/' +
-          index.app.config["INDEX_PATH"], 'r', encoding="utf-8") as file_ii:
-    for line in file_ii:
-        term_global, idf, *docs_list = line.strip().split()
-        inverted_index[term_global] = [float(idf), {}]
-        for i in range(0, len(docs_list), 3):
-            doc, term_freq, norm = docs_list[i:i+3]
-            inverted_index[term_global][1][int(doc)] = [float(term_freq),
-                                                        float(norm)]
+# A binary segment is memory mapped instead of parsed, see index.segment.
+# serving["segment"] is replaced as a whole by reload_segment(), and each
+# query reads it once, so a query never mixes two segments.
+serving = {
+    "segment": {
+        "index_path": index.app.config["INDEX_PATH"],
+        "generation": 0,
+        "inverted_index": index.segment.load_index(
+            index.app.config["PATH"] + '/inverted_index/' +
+            index.app.config["INDEX_PATH"]
+        ),
+    },
+    "loading": None,
+    "error": None,
+}
+serving_lock = threading.Lock()
 
 # stopwords = set(stopword)
 stopwords = set()
@@ -31,12 +46,21 @@ with open(index.app.config["PATH"] + '/pagerank.out',
         doc, rank = line.strip().split(',')
         pagerank[int(doc)] = float(rank)
 
+# Recent results, cleared when the segment is replaced
+query_cache = index.cache.QueryCache(index.app.config["INDEX_CACHE_SIZE"])
+
+# Latency of each query phase and posting list lengths, see index.metrics
+metrics = index.metrics.Metrics()
+
 
 @index.app.route('/api/v1/')
 def get_api():
     """Return a list of services available."""
     context = {
+        "cache": "/api/v1/cache/",
         "hits": "/api/v1/hits/",
+        "metrics": "/api/v1/metrics/",
+        "reload": "/api/v1/reload/",
         "url": "/api/v1/"
     }
     return flask.jsonify(**context), 200
@@ -44,59 +68,245 @@ def get_api():
 
 @index.app.route('/api/v1/hits/')
 def get_api_hits():
-    """Return a list of hits with doc ID and score."""
+    """Return a list of hits with doc ID and score.
+
+    The optional parameter k limits the response to the k best hits.  With
+    mode=or, documents containing any query term are hits, not only those
+    containing every term.
+    """
     query = flask.request.args.get('q')
     weight = flask.request.args.get('w', default=0.5, type=float)
-    hits = get_hits(query, weight)
+    k = flask.request.args.get('k', type=int)
+    mode = flask.request.args.get('mode', default="and")
+    if k is not None and k < 1:
+        flask.abort(400)
+    if mode not in ("and", "or"):
+        flask.abort(400)
+    with metrics.timer("total"):
+        hits = get_hits(query, weight, k, mode)
+        context = {
+            "hits": hits
+        }
+        with metrics.timer("serialize"):
+            response = flask.jsonify(**context)
+    return response, 200
+
+
+@index.app.route('/api/v1/cache/')
+def get_api_cache():
+    """Return query cache hit and miss counters."""
+    return flask.jsonify(**query_cache.stats()), 200
+
+
+@index.app.route('/api/v1/metrics/')
+def get_api_metrics():
+    """Return query phase latency, posting list and cache metrics.
+
+    Histograms cover every worker of index-serve, cache statistics only
+    the worker with process ID pid.
+    """
     context = {
-        "hits": hits
+        **metrics.snapshot(),
+        "cache": query_cache.stats(),
+        "pid": os.getpid(),
     }
     return flask.jsonify(**context), 200
 
 
-def get_hits(query, weight):
-    """Return a list of hits given query and weight."""
+@index.app.route('/api/v1/reload/', methods=['GET', 'POST'])
+def get_api_reload():
+    """Return the serving segment, or start loading a new one on POST.
+
+    The optional parameter index_path names a segment file in the
+    inverted_index directory, by default the serving segment is reloaded.
+    """
+    accepted = False
+    if flask.request.method == 'POST':
+        index_path = flask.request.args.get(
+            'index_path', default=serving["segment"]["index_path"])
+        if '/' in index_path or index_path.startswith('.'):
+            flask.abort(400)
+        if not reload_segment(index_path):
+            flask.abort(409)
+        accepted = True
+    context = {
+        "index_path": serving["segment"]["index_path"],
+        "generation": serving["segment"]["generation"],
+        "loading": serving["loading"],
+        "error": serving["error"],
+    }
+    return flask.jsonify(**context), \
+        (202 if accepted or serving["loading"] else 200)
+
+
+def reload_segment(index_path):
+    """Load a segment in a background thread and swap it in when ready.
+
+    The old segment serves queries until the new one is loaded, and keeps
+    serving if loading fails.  Return False if a segment is already loading.
+    Workers of index-serve replace this function so that their parent
+    process reloads every worker, see index.prefork.
+    """
+    with serving_lock:
+        if serving["loading"] is not None:
+            return False
+        serving["loading"] = index_path
+    threading.Thread(target=swap_segment, args=(index_path,),
+                     daemon=True).start()
+    return True
+
+
+def swap_segment(index_path):
+    """Load a segment and make it the serving segment.
+
+    Loading is over when this returns, even if it raised, so later reloads
+    are not refused.
+    """
+    try:
+        try:
+            inverted_index = index.segment.load_index(
+                index.app.config["PATH"] + '/inverted_index/' + index_path
+            )
+        except (OSError, ValueError) as error:
+            index.app.logger.error("Failed to load %s: %s", index_path,
+                                   error)
+            with serving_lock:
+                serving["error"] = f"{index_path}: {error}"
+            return
+        with serving_lock:
+            serving["segment"] = {
+                "index_path": index_path,
+                "generation": serving["segment"]["generation"] + 1,
+                "inverted_index": inverted_index,
+            }
+            serving["error"] = None
+    finally:
+        with serving_lock:
+            serving["loading"] = None
+    # Cache keys include the generation, so results of queries that were
+    # scored on the old segment are never returned
+    query_cache.clear()
+    index.app.logger.info("Serving %s", index_path)
+
+
+def handle_sighup(_signum, _frame):
+    """Reload the serving segment file, e.g. kill -HUP after rebuilding it."""
+    reload_segment(serving["segment"]["index_path"])
+
+
+# Signal handlers can only be set in the main thread, and not on Windows
+if hasattr(signal, "SIGHUP") and \
+        threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGHUP, handle_sighup)
+
+
+def get_hits(query, weight, k=None, mode="and"):
+    """Return a list of hits given query and weight.
+
+    Hits are ordered by score, ties by increasing doc ID.  If k is set, only
+    the k best hits are kept, in a heap of size k rather than a full sort.
+    In "or" mode hits are ranked by index.maxscore.  Results are cached by
+    the cleaned query, see index.cache.
+    """
     # Query processing
-    word_count = {}
-    query = query.casefold()
-    query = list(query.split(' '))
-    for word in query:
-        word = re.sub(r"[^a-zA-Z0-9 ]+", "", word)
-        if word in stopwords:
-            continue
-        if word not in word_count:
-            word_count[word] = 0
-        word_count[word] += 1
-    terms = list(word_count.keys())
+    with metrics.timer("parse"):
+        word_count = {}
+        query = query.casefold()
+        query = list(query.split(' '))
+        for word in query:
+            word = re.sub(r"[^a-zA-Z0-9 ]+", "", word)
+            if word in stopwords:
+                continue
+            if word not in word_count:
+                word_count[word] = 0
+            word_count[word] += 1
+        # Score terms in sorted order, so that every ordering of a query
+        # gets exactly the same hits and they can share a cache entry
+        word_count = dict(sorted(word_count.items()))
     # Return empty hits if there are no valid terms
-    if not terms:
+    if not word_count:
         return []
 
-    # Select documents that contain every word in the cleaned query
-    try:
-        doc_ids = set(inverted_index[terms[0]][1].keys())
-        for term in terms:
-            doc_ids = doc_ids.intersection(set(inverted_index[term][1].keys()))
-    except KeyError:
+    segment = serving["segment"]
+    key = (segment["generation"], mode,
+           query_cache.key(word_count, weight, k))
+    hits = query_cache.get(key)
+    if hits is None:
+        inverted_index = index.segment.as_index(segment["inverted_index"])
+        if mode == "or":
+            metrics.record_postings(len(inverted_index[term][1])
+                                    for term in word_count
+                                    if term in inverted_index)
+            with metrics.timer("score"):
+                hits = index.maxscore.top_hits(inverted_index, pagerank,
+                                               word_count, weight, k)
+        else:
+            hits = score_hits(inverted_index, word_count, weight, k)
+        query_cache.put(key, hits)
+    return hits
+
+
+def score_hits(inverted_index, word_count, weight, k=None):
+    """Return hits for cleaned query terms, see get_hits.
+
+    Documents are scored by number with the per-document sqrt(norm) and
+    PageRank arrays of the segment.  When NumPy is installed, hits are
+    scored by index.vector instead.
+    """
+    terms = list(word_count.keys())
+    if not all(term in inverted_index for term in terms):
+        return []
+    postings = [inverted_index[term][1] for term in terms]
+    metrics.record_postings(map(len, postings))
+    query_vector = [(word_count[term] * inverted_index[term][0])
+                    for term in terms]
+    # Terms in every document have idf 0 and tell no documents apart,
+    # such queries have no hits, like in index.maxscore
+    if not any(query_vector):
         return []
+    if index.vector.numpy is not None and \
+            index.app.config["INDEX_SCORING"] == "numpy":
+        return score_vector(inverted_index, word_count, weight, k)
+
+    # Select documents that contain every word in the cleaned query
+    with metrics.timer("intersect"):
+        numbers, positions = index.segment.intersect(postings)
+    metrics.record_candidates(len(numbers))
     # Return empty hits if there are no such documents
-    if not doc_ids:
+    if not numbers:
         return []
+    documents = inverted_index.documents
+    ranks = documents.ranks(pagerank)
 
     # Calculate pagerank scores
-    hits = []
-    query_vector = [(word_count[term] * inverted_index[term][0])
-                    for term in terms]
     query_norm = math.sqrt(sum(x**2 for x in query_vector))
-    for doc_id in doc_ids:
-        document_vector = [(inverted_index[term][1][doc_id][0] *
+
+    def ranked(j):
+        number = numbers[j]
+        document_vector = [(postings[i].term_freqs[positions[i][j]] *
                             inverted_index[term][0])
-                           for term in terms]
+                           for i, term in enumerate(terms)]
         dot_prod = sum(query_vector[i] * document_vector[i]
                        for i in range(len(query_vector)))
-        tf_idf = dot_prod / (query_norm *
-                             math.sqrt(inverted_index[terms[0]][1][doc_id][1]))
-        score = weight * pagerank[doc_id] + (1 - weight) * tf_idf
-        hits.append({"docid": doc_id, "score": score})
-    hits.sort(key=lambda hit: (hit['score'], -1 * hit['docid']), reverse=True)
-    return hits
+        tf_idf = dot_prod / (query_norm * documents.sqrt_norms[number])
+        score = weight * ranks[number] + (1 - weight) * tf_idf
+        return score, -1 * documents.doc_ids[number]
+
+    # Build hit dicts for the returned hits only
+    with metrics.timer("score"):
+        if k is None:
+            top = sorted(map(ranked, range(len(numbers))), reverse=True)
+        else:
+            top = heapq.nlargest(k, map(ranked, range(len(numbers))))
+    return [{"docid": -1 * neg_doc_id, "score": score}
+            for score, neg_doc_id in top]
+
+
+def score_vector(inverted_index, word_count, weight, k=None):
+    """Return hits scored by index.vector, for terms that all exist."""
+    scorer = index.vector.scorer_for(inverted_index, pagerank)
+    with metrics.timer("intersect"):
+        candidates = scorer.intersect(list(word_count))
+    metrics.record_candidates(len(candidates[0]))
+    with metrics.timer("score"):
+        return scorer.top_hits(word_count, weight, k, candidates)
@@ -0,0 +1,70 @@
+"""Cache query results.
+
+Query traffic is heavily skewed towards a few popular queries.  Results are
+cached by the cleaned query, so queries differing only in case, punctuation,
+stopwords or word order share an entry.  The least recently used entry is
+evicted when the cache is full.
+
+Cached results belong to the loaded segment and must be dropped with
+clear() when it is replaced.
+"""
+import collections
+import threading
+
+
+class QueryCache:
+    """A thread safe LRU cache of hits with hit and miss counters.
+
+    EXAMPLE
+    >>> cache = QueryCache(max_size=1024)
+    >>> key = cache.key({"smelting": 1, "steel": 2}, weight=0.5, k=10)
+    >>> hits = cache.get(key)
+    >>> if hits is None:
+    >>>     hits = ...
+    >>>     cache.put(key, hits)
+    """
+
+    def __init__(self, max_size):
+        """Create an empty cache of at most max_size results, 0 disables."""
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(word_count, weight, k):
+        """Return the cache key of a cleaned query."""
+        return tuple(sorted(word_count.items())), weight, k
+
+    def get(self, key):
+        """Return cached hits, or None if key is not cached."""
+        with self.lock:
+            hits = self.entries.get(key)
+            if hits is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return hits
+
+    def put(self, key, hits):
+        """Cache hits, evicting the least recently used result if full."""
+        if not self.max_size:
+            return
+        with self.lock:
+            self.entries[key] = hits
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        """Drop all cached results, counters are kept."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return the counters and the size of the cache."""
+        with self.lock:
+            return {**self.counters, "size": len(self.entries),
+                    "max_size": self.max_size}
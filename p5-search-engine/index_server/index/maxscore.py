@@ -0,0 +1,182 @@
+"""Rank documents containing any query term with MaxScore.
+
+In OR mode a document may contain only some of the query terms, and terms
+it lacks add nothing to its score.  Scoring every posting of every term is
+slow for long queries with common terms, but only the k best hits are
+returned.  A term's share of a document's score is at most
+
+(1 - weight) * query_weight * idf * max_weight / query_norm
+
+where max_weight is precomputed per term, see index.segment.  Once k hits
+are found, the k-th best score is a threshold.  Terms are sorted by their
+bound, and the terms with the smallest bounds whose bounds plus the largest
+PageRank share cannot reach the threshold are non-essential: a document
+containing only those cannot enter the top k, so candidates come from the
+essential terms' posting lists only.  A candidate's non-essential terms are
+galloped to, largest bound first, and it is dropped as soon as its score
+plus the remaining bounds falls below the threshold.
+
+Hits are exactly those of scoring every document, see top_hits(k=None).
+"""
+import heapq
+import math
+import index.segment
+
+
+# Bounds are sums of floats, slack for rounding so no hit is ever dropped
+EPSILON = 1e-9
+
+
+class Cursor:
+    """A position in one query term's posting list."""
+
+    def __init__(self, postings, query_weight, idf):
+        """Start at the first posting."""
+        self.postings = postings
+        self.query_weight = query_weight
+        self.idf = idf
+        self.bound = None  # largest share of a score, see MaxScore
+        self.position = 0
+
+    def number(self):
+        """Return the current doc number, or None past the last posting."""
+        if self.position == len(self.postings.numbers):
+            return None
+        return self.postings.numbers[self.position]
+
+    def seek(self, number):
+        """Move to the first posting with doc number >= number."""
+        self.position = index.segment.gallop(self.postings.numbers, number,
+                                             self.position)
+        return self.number()
+
+    def term_freq(self):
+        """Return the tf at the current position."""
+        return self.postings.term_freqs[self.position]
+
+
+def top_hits(inverted_index, pagerank, word_count, weight, k=None):
+    """Return hits for documents containing any of the cleaned terms.
+
+    inverted_index is a loaded index, see index.segment.as_index().  Hits are
+    ordered by score, ties by increasing doc ID, like get_hits.  Terms that
+    are not in the index are ignored.
+    """
+    terms = [term for term in word_count if term in inverted_index]
+    query_vector = [word_count[term] * inverted_index[term][0]
+                    for term in terms]
+    if not any(query_vector):
+        return []
+    documents = inverted_index.documents
+    ranking = MaxScore([
+        Cursor(inverted_index[term][1], query_weight, inverted_index[term][0])
+        for term, query_weight in zip(terms, query_vector)
+    ], (documents.sqrt_norms, documents.ranks(pagerank),
+        documents.max_rank(pagerank)), weight)
+    # Pruning relies on every share being at most its bound
+    if k is None or not 0 <= weight <= 1:
+        k = math.inf
+    return [{"docid": documents.doc_ids[number], "score": score}
+            for number, score in ranking.hits(k)]
+
+
+class MaxScore:
+    """Top k documents of a query's posting lists.
+
+    EXAMPLE
+    >>> MaxScore(cursors, (sqrt_norms, ranks, max_rank), 0.5).hits(k=10)
+    """
+
+    def __init__(self, cursors, documents, weight):
+        """Rank documents by their terms' postings and PageRank.
+
+        documents is (sqrt_norms, ranks, max_rank).  sqrt_norms and ranks
+        are indexed by doc number, max_rank is the largest rank.
+        """
+        self.cursors = cursors
+        self.documents = documents
+        self.weight = weight
+        self.query_norm = math.sqrt(sum(cursor.query_weight**2
+                                        for cursor in cursors))
+        for cursor in cursors:
+            cursor.bound = self.share(cursor, cursor.postings.max_weight, 1)
+        self.ranked = sorted(cursors, key=lambda cursor: cursor.bound)
+        # bound_sums[i] bounds the tf-idf share of terms ranked[:i + 1]
+        self.bound_sums = []
+        for cursor in self.ranked:
+            self.bound_sums.append(
+                (self.bound_sums[-1] if self.bound_sums else 0) +
+                cursor.bound
+            )
+        self.rank_bound = weight * documents[2]
+
+    def hits(self, k):
+        """Return the k best (doc number, score), k may be math.inf."""
+        essential = 0  # ranked[essential:] are essential
+        heap = []  # (score, -number) of the best hits, at most k
+        while essential < len(self.ranked):
+            number = min((cursor.number()
+                          for cursor in self.ranked[essential:]
+                          if cursor.number() is not None), default=None)
+            if number is None:
+                break
+            found = {}  # cursor -> tf
+            for cursor in self.ranked[essential:]:
+                if cursor.number() == number:
+                    found[cursor] = cursor.term_freq()
+                    cursor.position += 1
+            threshold = heap[0][0] if len(heap) == k else -math.inf
+            if not self.look_up(number, found, essential, threshold):
+                continue
+
+            # Doc numbers are in doc ID order, so ties are broken by doc ID
+            hit = (self.score(number, found), -1 * number)
+            if len(heap) < k:
+                heapq.heappush(heap, hit)
+            elif hit > heap[0]:
+                heapq.heapreplace(heap, hit)
+            while len(heap) == k and essential < len(self.ranked) and \
+                    below(self.rank_bound + self.bound_sums[essential],
+                          heap[0][0]):
+                essential += 1
+        return [(-1 * neg_number, score)
+                for score, neg_number in sorted(heap, reverse=True)]
+
+    def look_up(self, number, found, essential, threshold):
+        """Add a candidate's non-essential postings to found.
+
+        Terms are looked up from the largest bound down.  Return False as
+        soon as the candidate cannot reach threshold.
+        """
+        sqrt_norms, ranks, _ = self.documents
+        sqrt_norm = sqrt_norms[number]
+        partial = self.weight * ranks[number] + sum(
+            self.share(cursor, term_freq, sqrt_norm)
+            for cursor, term_freq in found.items()
+        )
+        for i in range(essential - 1, -1, -1):
+            if below(partial + self.bound_sums[i], threshold):
+                return False
+            cursor = self.ranked[i]
+            if cursor.seek(number) == number:
+                found[cursor] = cursor.term_freq()
+                partial += self.share(cursor, found[cursor], sqrt_norm)
+        return not below(partial, threshold)
+
+    def share(self, cursor, term_freq, sqrt_norm):
+        """Return the share of a score a term's posting adds."""
+        return (1 - self.weight) * cursor.query_weight * \
+            (term_freq * cursor.idf) / (self.query_norm * sqrt_norm)
+
+    def score(self, number, found):
+        """Return a document's score, computed exactly like get_hits."""
+        dot_prod = sum(cursor.query_weight * (found[cursor] * cursor.idf)
+                       for cursor in self.cursors if cursor in found)
+        sqrt_norms, ranks, _ = self.documents
+        tf_idf = dot_prod / (self.query_norm * sqrt_norms[number])
+        return self.weight * ranks[number] + (1 - self.weight) * tf_idf
+
+
+def below(score_bound, threshold):
+    """Return True if a score of at most score_bound is below threshold."""
+    return score_bound * (1 + EPSILON) < threshold
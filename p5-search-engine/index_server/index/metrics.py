@@ -0,0 +1,153 @@
+"""Measure where the Index Server spends its time.
+
+A query goes through phases: parsing and cleaning the query, intersecting
+the terms' posting lists to find candidate documents, scoring candidates,
+and serializing hits to JSON.  Each phase's latency is recorded in a
+histogram with fixed buckets, so tail latency can be traced to a phase.
+The lengths of the posting lists a query reads and the number of candidates
+it scores are recorded too, because they drive intersection and scoring
+time.
+
+Cached queries skip intersection and scoring.  OR queries merge posting
+lists while scoring, so all of their ranking time counts as scoring.
+Histograms are kept in shared memory with one slot per process.  The
+workers index-serve forks each record into their own slot, without a lock
+shared between processes, and any worker reports the sum of all slots, see
+index.prefork.  Query cache statistics are per worker, see index.api.main.
+"""
+import bisect
+import contextlib
+import multiprocessing
+import threading
+import time
+
+
+# Bucket upper bounds of latency histograms, in milliseconds
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                   1000, 2500]
+
+# Bucket upper bounds of posting list length and candidate histograms
+COUNT_BUCKETS = [0, 10, 100, 1000, 10**4, 10**5, 10**6]
+
+# Query phases, in order
+PHASES = ["parse", "intersect", "score", "serialize", "total"]
+
+
+class Histogram:
+    """Counts of observed values in buckets, with their sum and maximum.
+
+    EXAMPLE
+    >>> histogram = Histogram([1, 10, 100])
+    >>> histogram.observe(4.2)
+    >>> histogram.snapshot()["buckets"]
+    """
+
+    def __init__(self, bounds, slots=1):
+        """Create an empty histogram with sorted bucket upper bounds.
+
+        Each slot is written by one process.  Shared memory is inherited by
+        forked processes, see the module docstring.
+        """
+        self.bounds = bounds
+        # One more bucket for values above the last bound
+        self.counts = [multiprocessing.RawArray("q", len(bounds) + 1)
+                       for _ in range(slots)]
+        self.extremes = [multiprocessing.RawArray("d", 2)  # sum, max
+                         for _ in range(slots)]
+
+    def observe(self, value, slot=0):
+        """Add a value to a slot."""
+        self.counts[slot][bisect.bisect_left(self.bounds, value)] += 1
+        extremes = self.extremes[slot]
+        extremes[0] += value
+        extremes[1] = max(extremes[1], value)
+
+    def quantile(self, fraction):
+        """Return the upper bound of the bucket holding a quantile.
+
+        Values above the last bound return the largest value seen.
+        """
+        counts = self.merged_counts()
+        rank = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(self.bounds, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return max(extremes[1] for extremes in self.extremes)
+
+    def merged_counts(self):
+        """Return the bucket counts summed over all slots."""
+        return [sum(counts) for counts in zip(*self.counts)]
+
+    def snapshot(self):
+        """Return the histogram as a JSON serializable dict.
+
+        buckets maps each upper bound to the number of values up to it that
+        are above the previous bound, "inf" is above the last bound.
+        """
+        counts = self.merged_counts()
+        count = sum(counts)
+        return {
+            "count": count,
+            "sum": sum(extremes[0] for extremes in self.extremes),
+            "max": max(extremes[1] for extremes in self.extremes),
+            "p50": self.quantile(0.5) if count else None,
+            "p90": self.quantile(0.9) if count else None,
+            "p99": self.quantile(0.99) if count else None,
+            "buckets": dict(zip([*map(str, self.bounds), "inf"], counts)),
+        }
+
+
+class Metrics:
+    """Latency and posting list histograms, with a slot for each process.
+
+    EXAMPLE
+    >>> metrics = Metrics()
+    >>> with metrics.timer("parse"):
+    >>>     ...
+    >>> metrics.snapshot()["latency_ms"]["parse"]["p99"]
+    """
+
+    def __init__(self, slots=1):
+        """Create empty histograms, this process records into slot 0."""
+        self.latency = {phase: Histogram(LATENCY_BUCKETS, slots)
+                        for phase in PHASES}
+        self.postings = Histogram(COUNT_BUCKETS, slots)
+        self.candidates = Histogram(COUNT_BUCKETS, slots)
+        self.slot = 0
+        # Guards this process's slot against its other threads.  Other
+        # slots are read without it, so a snapshot may be a query behind.
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        """Record how long the body of a with statement takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.latency[phase].observe(elapsed, self.slot)
+
+    def record_postings(self, lengths):
+        """Record the lengths of the posting lists a query reads."""
+        with self.lock:
+            for length in lengths:
+                self.postings.observe(length, self.slot)
+
+    def record_candidates(self, count):
+        """Record the number of candidate documents a query scores."""
+        with self.lock:
+            self.candidates.observe(count, self.slot)
+
+    def snapshot(self):
+        """Return all histograms, summed over all slots."""
+        with self.lock:
+            return {
+                "latency_ms": {phase: histogram.snapshot()
+                               for phase, histogram in self.latency.items()},
+                "postings": self.postings.snapshot(),
+                "candidates": self.candidates.snapshot(),
+            }
@@ -0,0 +1,193 @@
+"""Serve an Index Server from several pre-forked worker processes.
+
+flask run serves every request of a segment from one process, so a segment
+uses one core and a slow query delays the queries behind it.  index-serve
+loads the segment once, opens the listening socket, and then forks worker
+processes that all accept connections on it.  Workers share the parent's
+memory copy-on-write, and the pages of a memory mapped binary segment are
+shared by every process, see index.segment.  Each worker serves one request
+at a time, so an idle worker picks up the next connection while another is
+busy.
+
+The parent restarts workers that die and stops them on SIGTERM or SIGINT.
+On SIGHUP the parent reloads the segment itself and forks a new set of
+workers, then retires the old ones once they finish their current request.
+Workers are always forked from the parent's segment, so every worker serves
+the same one, including workers restarted later.  POST /api/v1/reload/ in a
+worker asks the parent to reload, so it reloads every worker too.  Each
+worker has its own query cache, and records metrics into its own slot of
+the shared histograms, see index.metrics.
+
+$ INDEX_PATH=inverted_index_0.seg index-serve --port 9000 --workers 4
+"""
+import os
+import signal
+import socket
+import threading
+import click
+import werkzeug.serving
+import index
+import index.api.main
+import index.metrics
+
+
+# Signals the parent waits for, see Prefork.run()
+PARENT_SIGNALS = {signal.SIGCHLD, signal.SIGHUP, signal.SIGTERM,
+                  signal.SIGINT}
+
+
+class Prefork:
+    """A listening socket and the worker processes accepting on it.
+
+    EXAMPLE
+    >>> listener = socket.create_server(("localhost", 9000))
+    >>> Prefork(index.app, listener, num_workers=4).run()
+    """
+
+    def __init__(self, app, listener, num_workers):
+        """Configure the workers, none are started yet."""
+        self.app = app
+        self.listener = listener
+        self.num_workers = num_workers
+        self.workers = {}  # pid -> metrics slot
+        self.retired = {}  # replaced by a reload, finishing a request
+        self.stopping = False
+        # Workers write the segment to reload here, then send SIGHUP
+        self.requests = os.pipe()
+        os.set_blocking(self.requests[0], False)
+        # Slots for the workers and for those a reload retires
+        index.api.main.metrics = index.metrics.Metrics(slots=2 * num_workers)
+
+    def spawn(self):
+        """Fork a worker process that serves requests until it is stopped.
+
+        The worker records metrics into a slot no running worker uses.
+        """
+        slot = min(set(range(2 * self.num_workers)) -
+                   {*self.workers.values(), *self.retired.values()})
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = slot
+            return
+        status = 1
+        try:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, PARENT_SIGNALS)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            index.api.main.reload_segment = self.request_reload
+            index.api.main.metrics.slot = slot
+            host, port = self.listener.getsockname()[:2]
+            server = werkzeug.serving.make_server(
+                host, port, self.app, fd=self.listener.fileno()
+            )
+            # Finish the current request, then exit.  shutdown() waits for
+            # serve_forever() to return, so it cannot run in this thread.
+            signal.signal(signal.SIGTERM, lambda _signum, _frame: (
+                threading.Thread(target=server.shutdown).start()
+            ))
+            server.serve_forever()
+            status = 0
+        finally:
+            # Never return into the parent's code
+            os._exit(status)
+
+    def request_reload(self, index_path):
+        """Ask the parent to reload index_path in every worker."""
+        os.write(self.requests[1], index_path.encode("utf-8") + b"\n")
+        os.kill(os.getppid(), signal.SIGHUP)
+        return True
+
+    def requested_path(self):
+        """Return the segment workers asked for last, None if none did."""
+        try:
+            names = os.read(self.requests[0], 1 << 16).decode("utf-8")
+        except BlockingIOError:
+            return None
+        return names.splitlines()[-1] if names.strip() else None
+
+    def reload(self):
+        """Load the requested segment, then replace every worker.
+
+        A SIGHUP without a request reloads the serving segment file.  If
+        loading fails, the workers keep serving the old segment.  Workers
+        retired by an earlier reload are waited for first, so their metrics
+        slots are free for the new workers.
+        """
+        serving = index.api.main.serving
+        generation = serving["segment"]["generation"]
+        index.api.main.swap_segment(self.requested_path() or
+                                    serving["segment"]["index_path"])
+        if serving["segment"]["generation"] == generation:
+            return
+        for pid in list(self.retired):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            del self.retired[pid]
+        self.retired = self.workers
+        self.workers = {}
+        for _ in range(self.num_workers):
+            self.spawn()
+        self.signal(self.retired, signal.SIGTERM)
+
+    def stop(self):
+        """Stop every worker once it finishes its current request."""
+        self.stopping = True
+        self.signal([*self.workers, *self.retired], signal.SIGTERM)
+
+    def reap(self):
+        """Wait for workers that exited, restart those still needed."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.retired.pop(pid, None)
+            if pid not in self.workers:
+                continue
+            del self.workers[pid]
+            if not self.stopping:
+                self.app.logger.warning("Worker %d exited with wait status "
+                                        "%d, restarting it", pid, status)
+                self.spawn()
+
+    @staticmethod
+    def signal(pids, signum):
+        """Send a signal to worker processes."""
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start the workers and serve until stopped.
+
+        Signals are blocked and waited for one at a time, so reloading and
+        restarting workers never run inside a signal handler.
+        """
+        signal.pthread_sigmask(signal.SIG_BLOCK, PARENT_SIGNALS)
+        for _ in range(self.num_workers):
+            self.spawn()
+        while self.workers or self.retired:
+            signum = signal.sigwaitinfo(PARENT_SIGNALS).si_signo
+            if signum == signal.SIGCHLD:
+                self.reap()
+            elif signum == signal.SIGHUP and not self.stopping:
+                self.reload()
+            elif signum in (signal.SIGTERM, signal.SIGINT):
+                self.stop()
+
+
+@click.command()
+@click.option("--host", "host", default="127.0.0.1")
+@click.option("--port", "port", default=9000)
+@click.option("--workers", "num_workers", default=os.cpu_count() or 1,
+              help="Number of worker processes, default one per CPU.")
+def main(host, port, num_workers):
+    """Serve the Index Server segment in INDEX_PATH from worker processes."""
+    with socket.create_server((host, port), backlog=128) as listener:
+        Prefork(index.app, listener, num_workers).run()
@@ -0,0 +1,452 @@
+"""Inverted index segment files.
+
+A text segment has one line per term:
+term idf doc_id tf norm doc_id tf norm ...
+
+A document's norm is repeated in every one of its postings.  Segments are
+loaded with a per-document table instead: documents are numbered 0, 1, ...
+in doc ID order, and each document's sqrt(norm) is stored once, indexed by
+its number.  Postings hold doc numbers and tf only.  Because numbers follow
+doc ID order, posting lists sorted by number are sorted by doc ID too.
+
+Parsing a text segment reads every posting into memory, which is slow.  A
+binary segment holds the same data in packed arrays and is opened with
+mmap, so the operating system reads pages on demand and processes serving
+the same segment share them.  All numbers are little endian, and binary
+segments are read on little endian machines only.
+
+header       magic, number of terms T, postings P and documents D
+term_ends    T x uint64, end of each term in term_bytes
+post_ends    T x uint64, end of each term's postings in the posting arrays
+idf          T x float64
+max_weight   T x float64, largest tf / sqrt(norm) of each term's postings
+tf           P x float64
+sqrt_norm    D x float64, by doc number
+numbers      P x uint32, doc number of each posting
+doc_ids      D x uint32, by doc number
+term_bytes   UTF-8 terms, sorted by bytes
+
+Each term's postings are sorted by doc number.  Text segments are loaded
+into the same sorted arrays, so queries intersect posting lists the same
+way for both formats, see intersect().  Each term's max_weight bounds its
+share of any document's score, see index.maxscore.
+
+Convert a text segment with
+$ index-segment inverted_index_0.txt inverted_index_0.seg
+"""
+import array
+import bisect
+import collections.abc
+import math
+import mmap
+import struct
+import sys
+import tempfile
+import click
+
+
+MAGIC = b"IDXSEG03"
+HEADER = struct.Struct("<8sQQQ")
+
+
+def load_index(path):
+    """Return the inverted index in path, a binary or text segment.
+
+    The result maps term -> [idf, {doc_id: [tf, norm]}], and its documents
+    attribute is the per-document table.
+    """
+    with open(path, "rb") as file:
+        # Older binary segments are refused by Segment
+        binary = file.read(len(MAGIC))[:6] == MAGIC[:6]
+    if binary:
+        return Segment(path)
+    return build_index(parse_text_segment(path))
+
+
+def build_index(terms):
+    """Return a TextSegment of (term, idf, [(doc_id, tf, norm)]) tuples."""
+    terms = list(terms)
+    norms = {}
+    for _, _, postings in terms:
+        for doc_id, _, norm in postings:
+            norms[doc_id] = norm
+    doc_ids = sorted(norms)
+    numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+    documents = Documents(array.array("q", doc_ids),
+                          array.array("d", (math.sqrt(norms[doc_id])
+                                            for doc_id in doc_ids)))
+    # inverted_index = { term_global : [idf, Postings] }
+    inverted_index = TextSegment(documents)
+    for term, idf, postings in terms:
+        postings.sort()
+        inverted_index[term] = [idf, Postings(
+            array.array("q", (numbers[posting[0]] for posting in postings)),
+            array.array("d", (posting[1] for posting in postings)),
+            documents,
+        )]
+    return inverted_index
+
+
+def as_index(inverted_index):
+    """Return a loaded index, converting a dict of {doc_id: [tf, norm]}.
+
+    A dict is converted on every call, so changes to it are always seen.
+    Loaded indexes are returned as they are.
+    """
+    if hasattr(inverted_index, "documents"):
+        return inverted_index
+    return build_index(
+        (term, idf, [(doc_id, *posting)
+                     for doc_id, posting in postings.items()])
+        for term, (idf, postings) in inverted_index.items()
+    )
+
+
+def gallop(numbers, target, start):
+    """Return the first position at or after start with number >= target.
+
+    Probe start + 1, 2, 4, ... until passing target, then binary search the
+    last gap, so skipping n postings costs O(log n) comparisons.
+    """
+    bound = 1
+    while start + bound < len(numbers) and numbers[start + bound] < target:
+        bound *= 2
+    return bisect.bisect_left(numbers, target, start + bound // 2,
+                              min(start + bound + 1, len(numbers)))
+
+
+def intersect(postings_lists):
+    """Return the doc numbers in every posting list and their positions.
+
+    Returns (doc numbers, [positions in each posting list]).  Candidates
+    come from the shortest list, and each longer list is galloped through
+    once, so the cost is proportional to the shortest list, not the longest.
+    """
+    order = sorted(range(len(postings_lists)),
+                   key=lambda i: len(postings_lists[i]))
+    candidates = list(postings_lists[order[0]].numbers)
+    positions = {order[0]: list(range(len(candidates)))}
+    for i in order[1:]:
+        numbers = postings_lists[i].numbers
+        kept, found, position = [], [], 0
+        for j, number in enumerate(candidates):
+            position = gallop(numbers, number, position)
+            if position == len(numbers):
+                break
+            if numbers[position] == number:
+                kept.append(j)
+                found.append(position)
+        candidates = [candidates[j] for j in kept]
+        positions = {i: [list_positions[j] for j in kept]
+                     for i, list_positions in positions.items()}
+        positions[i] = found
+    return candidates, [positions[i] for i in range(len(postings_lists))]
+
+
+def parse_text_segment(path):
+    """Yield (term, idf, [(doc_id, tf, norm)]) for each line of a segment.
+
+    Raise ValueError on a malformed line, e.g. of a truncated segment.
+    """
+    with open(path, "r", encoding="utf-8") as file_ii:
+        for line_number, line in enumerate(file_ii, 1):
+            fields = line.split()
+            if len(fields) < 2 or (len(fields) - 2) % 3:
+                raise ValueError(f"{path}:{line_number}: expected a term, "
+                                 f"its idf and doc_id tf norm triples")
+            term_global, idf, *docs_list = fields
+            yield term_global, float(idf), [
+                (int(docs_list[i]), float(docs_list[i + 1]),
+                 float(docs_list[i + 2]))
+                for i in range(0, len(docs_list), 3)
+            ]
+
+
+def cast_sections(view, layout):
+    """Yield a typed view of each section after the header, then the rest.
+
+    layout is a list of (struct format, number of items).
+    """
+    offset = HEADER.size
+    for fmt, count in layout:
+        size = struct.calcsize(fmt) * count
+        yield view[offset:offset + size].cast(fmt)
+        offset += size
+    yield view[offset:]
+
+
+class Documents:
+    """Per-document arrays of a segment, indexed by doc number.
+
+    Structures derived from a segment, like PageRank arrays, are built on
+    first use and kept in derived, so they live and die with the segment.
+
+    EXAMPLE
+    >>> documents = segment.documents
+    >>> number = documents.number(11835570)
+    >>> documents.sqrt_norms[number], documents.ranks(pagerank)[number]
+    """
+
+    def __init__(self, doc_ids, sqrt_norms):
+        """Wrap sorted doc IDs and their sqrt(norm)."""
+        self.doc_ids = doc_ids
+        self.sqrt_norms = sqrt_norms
+        self.derived = {}
+
+    def number(self, doc_id):
+        """Return the number of doc_id, KeyError if it is not found."""
+        i = bisect.bisect_left(self.doc_ids, doc_id)
+        if i == len(self.doc_ids) or self.doc_ids[i] != doc_id:
+            raise KeyError(doc_id)
+        return i
+
+    def ranks(self, pagerank):
+        """Return the PageRank of each document by number.
+
+        Documents without a PageRank rank 0.  The array is built once per
+        pagerank dict.
+        """
+        if self.derived.get("pagerank") is not pagerank:
+            ranks = array.array("d", (pagerank.get(doc_id, 0.0)
+                                      for doc_id in self.doc_ids))
+            self.derived.update(pagerank=pagerank, ranks=ranks,
+                                max_rank=max(ranks, default=0.0))
+        return self.derived["ranks"]
+
+    def max_rank(self, pagerank):
+        """Return the largest PageRank of any document."""
+        self.ranks(pagerank)
+        return self.derived["max_rank"]
+
+    def __len__(self):
+        """Return the number of documents."""
+        return len(self.doc_ids)
+
+
+class Postings(collections.abc.Mapping):
+    """One term's postings, {doc_id: [tf, norm]}."""
+
+    def __init__(self, numbers, term_freqs, documents, weight=None):
+        """Wrap equally long views, doc numbers sorted.
+
+        weight is the largest tf / sqrt(norm), computed if not given.
+        """
+        self.numbers = numbers
+        self.term_freqs = term_freqs
+        self.documents = documents
+        if weight is None:
+            weight = max((term_freq / documents.sqrt_norms[number]
+                          for number, term_freq in zip(numbers, term_freqs)),
+                         default=0.0)
+        self.max_weight = weight
+
+    def __getitem__(self, doc_id):
+        """Return [tf, norm] of doc_id."""
+        number = self.documents.number(doc_id)
+        i = bisect.bisect_left(self.numbers, number)
+        if i == len(self.numbers) or self.numbers[i] != number:
+            raise KeyError(doc_id)
+        return [self.term_freqs[i], self.documents.sqrt_norms[number]**2]
+
+    def __iter__(self):
+        """Iterate over doc IDs in increasing order."""
+        return (self.documents.doc_ids[number] for number in self.numbers)
+
+    def __len__(self):
+        """Return the number of documents containing the term."""
+        return len(self.numbers)
+
+
+class TextSegment(dict):
+    """A parsed text segment, {term: [idf, Postings]}."""
+
+    def __init__(self, documents):
+        """Start with no terms."""
+        super().__init__()
+        self.documents = documents
+
+
+class TermList(collections.abc.Sequence):
+    """Sorted terms of a binary segment, as UTF-8 bytes."""
+
+    def __init__(self, term_ends, term_bytes):
+        """Wrap term end offsets and the concatenated terms."""
+        self.term_ends = term_ends
+        self.term_bytes = term_bytes
+
+    def __getitem__(self, i):
+        """Return term number i."""
+        start = self.term_ends[i - 1] if i else 0
+        return bytes(self.term_bytes[start:self.term_ends[i]])
+
+    def __len__(self):
+        """Return the number of terms."""
+        return len(self.term_ends)
+
+
+class Segment(collections.abc.Mapping):
+    """A memory mapped binary segment, {term: [idf, Postings]}.
+
+    EXAMPLE
+    >>> segment = Segment("inverted_index_0.seg")
+    >>> idf, postings = segment["smelting"]
+    >>> term_freq, norm = postings[11835570]
+    """
+
+    def __init__(self, path):
+        """Map the segment file into memory."""
+        if sys.byteorder != "little":
+            raise ValueError("Binary index segments need a little endian CPU")
+        with open(path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, num_terms, num_postings, num_docs = \
+            HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary index segment of "
+                             f"this version, rebuild it with index-segment")
+        layout = [
+            ("Q", num_terms), ("Q", num_terms), ("d", num_terms),
+            ("d", num_terms), ("d", num_postings), ("d", num_docs),
+            ("I", num_postings), ("I", num_docs),
+        ]
+        # term_bytes follow the arrays, term_ends holds their length
+        size = HEADER.size + sum(struct.calcsize(fmt) * count
+                                 for fmt, count in layout)
+        if len(self.mmap) < size:
+            raise ValueError(f"{path} is truncated")
+        sections = cast_sections(memoryview(self.mmap), layout)
+        term_ends = next(sections)
+        if len(self.mmap) != size + (term_ends[-1] if num_terms else 0):
+            raise ValueError(f"{path} is {len(self.mmap)} bytes, its header "
+                             f"counts need {size} plus the terms")
+        self.post_ends = next(sections)
+        self.idfs = next(sections)
+        self.max_weights = next(sections)
+        term_freqs = next(sections)
+        sqrt_norms = next(sections)
+        # Arguments of Postings, sliced to each term's postings
+        self.columns = (next(sections), term_freqs)
+        self.documents = Documents(next(sections), sqrt_norms)
+        self.terms = TermList(term_ends, next(sections))
+
+    def find(self, term):
+        """Return the number of term, or None if it is not in the segment."""
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self.terms, key)
+        if i == len(self.terms) or self.terms[i] != key:
+            return None
+        return i
+
+    def postings(self, i):
+        """Return the postings of term number i."""
+        start = self.post_ends[i - 1] if i else 0
+        end = self.post_ends[i]
+        return Postings(*(column[start:end] for column in self.columns),
+                        self.documents, self.max_weights[i])
+
+    def __getitem__(self, term):
+        """Return [idf, postings] of term."""
+        i = self.find(term) if isinstance(term, str) else None
+        if i is None:
+            raise KeyError(term)
+        return [self.idfs[i], self.postings(i)]
+
+    def __iter__(self):
+        """Iterate over terms in sorted order."""
+        return (term.decode("utf-8") for term in self.terms)
+
+    def __len__(self):
+        """Return the number of terms."""
+        return len(self.terms)
+
+
+def write_segment(text_path, segment_path):
+    """Convert a text segment to a binary segment.
+
+    The text segment is read twice, first to number the documents, then to
+    stage postings in a temporary file, so only the terms and documents are
+    held in memory.
+    """
+    norms = {}
+    for _, _, postings in parse_text_segment(text_path):
+        for doc_id, _, norm in postings:
+            if doc_id >= 2**32:
+                raise ValueError(f"Doc ID {doc_id} is too large")
+            norms[doc_id] = norm
+    doc_ids = sorted(norms)
+    numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+
+    # (term bytes, idf, first posting, number of postings, max weight)
+    terms = []
+    num_postings = 0
+    with tempfile.TemporaryFile() as staged:
+        for term, idf, postings in parse_text_segment(text_path):
+            postings.sort()
+            staged.write(struct.pack(
+                f"<{len(postings)}d{len(postings)}I",
+                *(posting[1] for posting in postings),
+                *(numbers[posting[0]] for posting in postings),
+            ))
+            terms.append((term.encode("utf-8"), idf, num_postings,
+                          len(postings), max(
+                              (posting[1] / math.sqrt(posting[2])
+                               for posting in postings), default=0.0)))
+            num_postings += len(postings)
+        terms.sort()
+        with open(segment_path, "wb") as outfile:
+            outfile.write(HEADER.pack(MAGIC, len(terms), num_postings,
+                                      len(doc_ids)))
+            write_terms(outfile, terms)
+            write_postings(outfile, staged, terms, 0)
+            write_array(outfile, array.array("d", (
+                math.sqrt(norms[doc_id]) for doc_id in doc_ids)))
+            write_postings(outfile, staged, terms, 1)
+            write_array(outfile, array.array("I", doc_ids))
+            for term in terms:
+                outfile.write(term[0])
+
+
+def write_array(outfile, section):
+    """Write an array as a little endian section."""
+    if sys.byteorder == "big":
+        section.byteswap()
+    outfile.write(section.tobytes())
+
+
+def write_terms(outfile, terms):
+    """Write the term_ends, post_ends, idf and max_weight sections."""
+    term_ends = array.array("Q")
+    post_ends = array.array("Q")
+    for term, _, _, count, _ in terms:
+        term_ends.append((term_ends[-1] if term_ends else 0) + len(term))
+        post_ends.append((post_ends[-1] if post_ends else 0) + count)
+    for section in (term_ends, post_ends,
+                    array.array("d", (term[1] for term in terms)),
+                    array.array("d", (term[4] for term in terms))):
+        write_array(outfile, section)
+
+
+def write_postings(outfile, staged, terms, column):
+    """Write the tf (column 0) or numbers (column 1) section in term order.
+
+    staged holds each term's tf and numbers arrays one after another.
+    """
+    staged.flush()
+    if not terms or not any(term[3] for term in terms):
+        return
+    with mmap.mmap(staged.fileno(), 0, access=mmap.ACCESS_READ) as postings:
+        for _, _, first, count, _ in terms:
+            # Each term's two arrays start at 12 bytes per posting
+            start = first * 12 + column * 8 * count
+            width = 4 if column else 8
+            outfile.write(postings[start:start + width * count])
+
+
+@click.command()
+@click.argument("text_segment", type=click.Path(exists=True, dir_okay=False))
+@click.argument("binary_segment", type=click.Path(dir_okay=False))
+def main(text_segment, binary_segment):
+    """Convert TEXT_SEGMENT to a memory mapped BINARY_SEGMENT."""
+    write_segment(text_segment, binary_segment)
@@ -25,7 +25,8 @@ class Search:
 
     def query_index(self, index_url, query, weight):
         """Query index server."""
-        params = {'q': query, 'w': weight}
+        # Each segment's 10 best hits include the 10 best overall
+        params = {'q': query, 'w': weight, 'k': 10}
         response = requests.get(index_url, params=params,
                                 timeout=1).json()
         for hit in response['hits']:
@@ -0,0 +1,117 @@
+"""Binary inverted index segment tests."""
+import random
+import pytest
+import index.segment
+
+
+def test_binary_segment(tmp_path):
+    """Convert a text segment and verify the binary segment matches it.
+
+    Terms and postings are deliberately out of order in the text segment.
+
+    'tmp_path' is a fixture provided by pytest.  It creates a temporary
+    directory for use within this test.
+    Docs: https://docs.pytest.org/en/latest/how-to/tmp_path.html
+
+    """
+    text_path = tmp_path/"inverted_index_0.txt"
+    text_path.write_text(
+        "smelting 1.5648920412154652 11936580 1 1170.6097826355012 "
+        "11835570 1 5434.845639455667 12488547 2 6061.615805948837\n"
+        "itselfbetteshanger 3.514282047860378 12497817 1 1111.5347389842038\n"
+        "café 0.5 7 3 12.5\n",
+        encoding="utf-8",
+    )
+    segment_path = tmp_path/"inverted_index_0.seg"
+    index.segment.write_segment(text_path, segment_path)
+
+    expected = index.segment.load_index(text_path)
+    actual = index.segment.load_index(segment_path)
+    assert isinstance(actual, index.segment.Segment)
+    assert list(actual) == sorted(expected, key=lambda t: t.encode("utf-8"))
+    for term, (idf, postings) in expected.items():
+        assert actual[term][0] == idf
+        assert list(actual[term][1]) == sorted(postings)
+        assert dict(actual[term][1]) == dict(postings)
+    assert "smelt" not in actual
+    assert "zzz" not in actual
+    assert 11835571 not in actual["smelting"][1]
+
+
+def test_truncated_segment(tmp_path):
+    """A binary segment whose size does not match its header is refused."""
+    text_path = tmp_path/"inverted_index_0.txt"
+    text_path.write_text("apple 1.0 10 1 1.0\nbanana 2.0 20 1 9.0\n",
+                         encoding="utf-8")
+    segment_path = tmp_path/"inverted_index_0.seg"
+    index.segment.write_segment(text_path, segment_path)
+    data = segment_path.read_bytes()
+    for size in [10, index.segment.HEADER.size, 40, 100, len(data) - 3,
+                 len(data) - 1]:
+        segment_path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            index.segment.load_index(segment_path)
+    segment_path.write_bytes(data + b"\0")
+    with pytest.raises(ValueError):
+        index.segment.load_index(segment_path)
+
+
+def test_as_index():
+    """A dict is converted again after it changes."""
+    inverted_index = {"apple": [1.0, {10: [1.0, 4.0]}]}
+    assert list(index.segment.as_index(inverted_index)["apple"][1]) == [10]
+    inverted_index["apple"][1][20] = [2.0, 9.0]
+    assert list(index.segment.as_index(inverted_index)["apple"][1]) == \
+        [10, 20]
+
+
+def test_intersect():
+    """Intersect sorted posting lists of very different lengths.
+
+    Every document in all lists is found, with its position in each list.
+    """
+    rand = random.Random(485)
+    for sizes in [(1, 1000), (1000, 10, 500), (50, 50), (0, 100), (3, 3, 3)]:
+        inverted_index = index.segment.as_index({
+            f"term{i}": [1.0, {
+                doc_id: [1.0, 1.0]
+                for doc_id in rand.sample(range(2000), size)
+            }]
+            for i, size in enumerate(sizes)
+        })
+        postings_lists = [inverted_index[f"term{i}"][1]
+                          for i in range(len(sizes))]
+        numbers, positions = index.segment.intersect(postings_lists)
+        expected = set(postings_lists[0])
+        for postings in postings_lists[1:]:
+            expected &= set(postings)
+        doc_ids = inverted_index.documents.doc_ids
+        assert [doc_ids[number] for number in numbers] == sorted(expected)
+        for postings, list_positions in zip(postings_lists, positions):
+            assert [postings.numbers[i] for i in list_positions] == numbers
+
+
+def test_documents(tmp_path):
+    """Norms are stored once per document, PageRank is looked up by number.
+
+    'tmp_path' is a fixture provided by pytest.  It creates a temporary
+    directory for use within this test.
+    Docs: https://docs.pytest.org/en/latest/how-to/tmp_path.html
+
+    """
+    text_path = tmp_path/"inverted_index_0.txt"
+    text_path.write_text(
+        "apple 1.0 30 1 16.0 10 2 4.0\n"
+        "banana 2.0 20 1 9.0 30 3 16.0\n",
+        encoding="utf-8",
+    )
+    index.segment.write_segment(text_path, tmp_path/"inverted_index_0.seg")
+    pagerank = {10: 0.1, 20: 0.2}
+    for path in (text_path, tmp_path/"inverted_index_0.seg"):
+        documents = index.segment.load_index(path).documents
+        assert list(documents.doc_ids) == [10, 20, 30]
+        assert list(documents.sqrt_norms) == [2.0, 3.0, 4.0]
+        assert documents.number(30) == 2
+        assert list(documents.ranks(pagerank)) == [0.1, 0.2, 0.0]
+        assert documents.ranks(pagerank) is documents.ranks(pagerank)
+        assert documents.max_rank(pagerank) == 0.2
@@ -0,0 +1,44 @@
+"""Index Server query cache tests."""
+import index.api.main
+import index.cache
+
+
+def test_query_cache(index_client, mocker):
+    """Equivalent queries share a cache entry, old entries are evicted.
+
+    'index_client' is a fixture fuction that provides a Flask test server
+    interface. It is implemented in conftest.py and reused by many tests.
+    Docs: https://docs.pytest.org/en/latest/fixture.html
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a small one for this test.
+    """
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(2))
+    mocker.patch.dict(index.api.main.serving["segment"], {"inverted_index": {
+        "apple": [1.0, {10: [1.0, 4.0], 20: [2.0, 9.0]}],
+        "banana": [2.0, {10: [3.0, 4.0], 20: [1.0, 9.0]}],
+    }})
+    mocker.patch.object(index.api.main, "pagerank", {10: 0.1, 20: 0.2})
+
+    response = index_client.get("/api/v1/hits/?q=apple+banana&w=0.3")
+    assert response.status_code == 200
+    hits = response.get_json()["hits"]
+    assert [hit["docid"] for hit in hits] == [10, 20]
+
+    # Case, punctuation and word order do not matter
+    response = index_client.get("/api/v1/hits/?q=Banana,+APPLE!&w=0.3")
+    assert response.get_json()["hits"] == hits
+    assert index_client.get("/api/v1/cache/").get_json() == {
+        "hits": 1, "misses": 1, "evictions": 0, "size": 1, "max_size": 2,
+    }
+
+    # A different weight or k is a different entry, the least recently
+    # used entry is evicted
+    index_client.get("/api/v1/hits/?q=apple+banana&w=0.5")
+    index_client.get("/api/v1/hits/?q=apple+banana&w=0.3&k=1")
+    assert index_client.get("/api/v1/cache/").get_json() == {
+        "hits": 1, "misses": 3, "evictions": 1, "size": 2, "max_size": 2,
+    }
+    index_client.get("/api/v1/hits/?q=apple+banana&w=0.5")
+    assert index_client.get("/api/v1/cache/").get_json()["hits"] == 2
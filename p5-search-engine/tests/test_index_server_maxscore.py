@@ -0,0 +1,89 @@
+"""Index Server OR mode tests."""
+import random
+import index.api.main
+import index.cache
+import index.maxscore
+import index.segment
+
+
+def test_or_mode(mocker, tmp_path):
+    """MaxScore returns exactly the best of all documents with any term.
+
+    Documents containing every query term get the same score as in AND
+    mode.  Both a parsed text segment and a binary segment are scored.
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a random one for this test.
+
+    'tmp_path' is a fixture provided by pytest.  It creates a temporary
+    directory for use within this test.
+    Docs: https://docs.pytest.org/en/latest/how-to/tmp_path.html
+    """
+    rand = random.Random(485)
+    doc_ids = rand.sample(range(1, 10**6), 300)
+    norms = {doc_id: rand.uniform(1, 100) for doc_id in doc_ids}
+    with (tmp_path/"inverted_index_0.txt").open("w", encoding="utf-8") \
+            as outfile:
+        for term, size in (("apple", 250), ("banana", 120), ("cherry", 30),
+                           ("durian", 5)):
+            outfile.write(f"{term} {rand.uniform(0.1, 3)} " + " ".join(
+                f"{doc_id} {rand.randint(1, 5)} {norms[doc_id]}"
+                for doc_id in rand.sample(doc_ids, size)
+            ) + "\n")
+    index.segment.write_segment(tmp_path/"inverted_index_0.txt",
+                                tmp_path/"inverted_index_0.seg")
+    pagerank = {doc_id: rand.choice([0.01, 0.02, 0.03]) for doc_id in doc_ids}
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(0))
+    mocker.patch.object(index.api.main, "pagerank", pagerank)
+
+    for segment in ("inverted_index_0.txt", "inverted_index_0.seg"):
+        inverted_index = index.segment.load_index(tmp_path/segment)
+        mocker.patch.dict(index.api.main.serving["segment"], {
+            "inverted_index": inverted_index,
+        })
+        for query in ("apple", "durian cherry", "apple banana cherry durian",
+                      "durian kiwi", "kiwi"):
+            for weight in (0, 0.3, 1):
+                everything = index.api.main.get_hits(query, weight,
+                                                     mode="or")
+                for k in (1, 3, 10, 1000):
+                    assert index.api.main.get_hits(
+                        query, weight, k, mode="or") == everything[:k]
+                scores = {hit["docid"]: hit["score"] for hit in everything}
+                for hit in index.api.main.get_hits(query, weight):
+                    assert scores[hit["docid"]] == hit["score"]
+
+        # Every document with any term is a hit
+        hits = index.maxscore.top_hits(inverted_index, pagerank,
+                                       {"cherry": 1, "durian": 1}, 0.5)
+        assert {hit["docid"] for hit in hits} == \
+            set(inverted_index["cherry"][1]) | set(inverted_index["durian"][1])
+
+
+def test_or_mode_api(index_client, mocker):
+    """The mode parameter selects AND or OR semantics.
+
+    'index_client' is a fixture fuction that provides a Flask test server
+    interface. It is implemented in conftest.py and reused by many tests.
+    Docs: https://docs.pytest.org/en/latest/fixture.html
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a small one for this test.
+    """
+    mocker.patch.dict(index.api.main.serving["segment"], {"inverted_index": {
+        "apple": [1.0, {10: [1.0, 4.0], 20: [2.0, 9.0]}],
+        "banana": [2.0, {20: [1.0, 9.0], 30: [1.0, 1.0]}],
+    }})
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(16))
+    mocker.patch.object(index.api.main, "pagerank", {10: 0.1, 20: 0.2,
+                                                     30: 0.3})
+
+    response = index_client.get("/api/v1/hits/?q=apple+banana")
+    assert [hit["docid"] for hit in response.get_json()["hits"]] == [20]
+    response = index_client.get("/api/v1/hits/?q=apple+banana&mode=or")
+    assert sorted(hit["docid"] for hit in response.get_json()["hits"]) == \
+        [10, 20, 30]
+    response = index_client.get("/api/v1/hits/?q=apple+banana&mode=xor")
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+"""Index Server metrics tests."""
+import os
+import index.api.main
+import index.cache
+import index.metrics
+
+
+def test_histogram():
+    """Values are counted in buckets, quantiles are bucket upper bounds."""
+    histogram = index.metrics.Histogram([1, 10, 100])
+    for value in [0.5, 1, 2, 3, 50, 500]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"1": 2, "10": 2, "100": 1, "inf": 1}
+    assert snapshot["count"] == 6
+    assert snapshot["sum"] == 556.5
+    assert snapshot["max"] == 500
+    assert snapshot["p50"] == 10
+    assert snapshot["p90"] == 500
+    assert index.metrics.Histogram([1]).snapshot()["p50"] is None
+
+
+def test_metrics(index_client, mocker):
+    """Each query phase is timed, cached queries skip intersect and score.
+
+    'index_client' is a fixture fuction that provides a Flask test server
+    interface. It is implemented in conftest.py and reused by many tests.
+    Docs: https://docs.pytest.org/en/latest/fixture.html
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a small one and resets the metrics for this test.
+    """
+    mocker.patch.dict(index.api.main.serving["segment"], {"inverted_index": {
+        "apple": [1.0, {10: [1.0, 4.0], 20: [2.0, 9.0], 30: [1.0, 1.0]}],
+        "banana": [2.0, {10: [3.0, 4.0]}],
+    }})
+    mocker.patch.object(index.api.main, "pagerank", {10: 0.1, 20: 0.2,
+                                                     30: 0.3})
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(16))
+    mocker.patch.object(index.api.main, "metrics", index.metrics.Metrics())
+
+    for query in ["apple banana", "banana apple", "apple", "kiwi"]:
+        response = index_client.get(f"/api/v1/hits/?q={query}")
+        assert response.status_code == 200
+
+    response = index_client.get("/api/v1/metrics/")
+    assert response.status_code == 200
+    metrics = response.get_json()
+    latency = metrics["latency_ms"]
+    assert latency["total"]["count"] == 4
+    assert latency["parse"]["count"] == 4
+    assert latency["serialize"]["count"] == 4
+    # "banana apple" is cached and "kiwi" is not in the index
+    assert latency["intersect"]["count"] == 2
+    assert latency["score"]["count"] == 2
+    assert latency["total"]["max"] >= latency["score"]["max"]
+    assert metrics["postings"]["count"] == 3
+    assert metrics["postings"]["sum"] == 7
+    assert metrics["candidates"]["sum"] == 4
+    assert metrics["cache"]["hits"] == 1
+    assert metrics["pid"] == os.getpid()
+
+
+def test_metrics_shared():
+    """Histograms recorded in forked processes are summed over slots."""
+    metrics = index.metrics.Metrics(slots=2)
+    metrics.record_candidates(1)
+    pid = os.fork()
+    if not pid:
+        metrics.slot = 1
+        metrics.record_candidates(10)
+        with metrics.timer("total"):
+            pass
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert list(metrics.candidates.counts[0]) == [0, 1, 0, 0, 0, 0, 0, 0]
+    assert list(metrics.candidates.counts[1]) == [0, 1, 0, 0, 0, 0, 0, 0]
+    snapshot = metrics.snapshot()
+    assert snapshot["candidates"]["count"] == 2
+    assert snapshot["candidates"]["sum"] == 11
+    assert snapshot["candidates"]["max"] == 10
+    assert snapshot["candidates"]["p99"] == 10
+    assert snapshot["latency_ms"]["total"]["count"] == 1
@@ -0,0 +1,80 @@
+"""Index Server NumPy scoring tests."""
+import random
+import pytest
+import index
+import index.api.main
+import index.cache
+import index.segment
+import index.vector
+
+
+def test_numpy_scoring(mocker, tmp_path):
+    """NumPy scoring returns exactly the hits of pure Python scoring.
+
+    Both a parsed text segment and a binary segment are scored.
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a random one for this test.
+
+    'tmp_path' is a fixture provided by pytest.  It creates a temporary
+    directory for use within this test.
+    Docs: https://docs.pytest.org/en/latest/how-to/tmp_path.html
+
+    """
+    pytest.importorskip("numpy")
+    rand = random.Random(485)
+    doc_ids = rand.sample(range(1, 10**6), 200)
+    norms = {doc_id: rand.uniform(1, 100) for doc_id in doc_ids}
+    with (tmp_path/"inverted_index_0.txt").open("w", encoding="utf-8") \
+            as outfile:
+        for term in ("apple", "banana", "cherry", "durian"):
+            postings = rand.sample(doc_ids, rand.randint(20, 150))
+            outfile.write(f"{term} {rand.uniform(0.1, 3)} " + " ".join(
+                f"{doc_id} {rand.randint(1, 5)} {norms[doc_id]}"
+                for doc_id in postings
+            ) + "\n")
+    index.segment.write_segment(tmp_path/"inverted_index_0.txt",
+                                tmp_path/"inverted_index_0.seg")
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(0))
+    mocker.patch.object(index.api.main, "pagerank", {
+        doc_id: rand.choice([0.1, 0.2, 0.3]) for doc_id in doc_ids
+    })
+
+    queries = ["apple", "apple banana", "cherry banana cherry",
+               "apple banana cherry durian", "apple kiwi"]
+    for segment in ("inverted_index_0.txt", "inverted_index_0.seg"):
+        mocker.patch.dict(index.api.main.serving["segment"], {
+            "inverted_index": index.segment.load_index(tmp_path/segment),
+        })
+        for query in queries:
+            for weight in (0, 0.3, 1):
+                for k in (None, 1, 5, 1000):
+                    mocker.patch.dict(index.app.config,
+                                      {"INDEX_SCORING": "python"})
+                    expected = index.api.main.get_hits(query, weight, k)
+                    mocker.patch.dict(index.app.config,
+                                      {"INDEX_SCORING": "numpy"})
+                    actual = index.api.main.get_hits(query, weight, k)
+                    assert actual == expected
+
+
+def test_zero_query_vector(mocker):
+    """A query of terms in every document has no hits in every mode.
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a two document one for this test.
+    """
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(0))
+    mocker.patch.object(index.api.main, "pagerank", {1: 0.5, 2: 0.5})
+    mocker.patch.dict(index.api.main.serving["segment"], {
+        "inverted_index": index.segment.as_index({
+            "apple": [0.0, {1: [1.0, 1.0], 2: [2.0, 4.0]}],
+        }),
+    })
+    modes = ["python"] if index.vector.numpy is None else ["python", "numpy"]
+    for mode in modes:
+        mocker.patch.dict(index.app.config, {"INDEX_SCORING": mode})
+        assert not index.api.main.get_hits("apple", 0.5)
+    assert not index.api.main.get_hits("apple", 0.5, mode="or")
@@ -0,0 +1,124 @@
+"""Index Server pre-forked worker process tests."""
+import os
+import signal
+import subprocess
+import sys
+import time
+import requests
+from conftest import LiveIndexServer
+
+
+def worker_pids(parent):
+    """Return the PIDs of the worker processes of parent."""
+    completed_process = subprocess.run(
+        ["pgrep", "-P", str(parent.pid)],
+        stdout=subprocess.PIPE, text=True, check=False,
+    )
+    return set(map(int, completed_process.stdout.split()))
+
+
+def wait_for_workers(parent, num_workers):
+    """Wait until parent has num_workers workers, return their PIDs."""
+    for _ in range(50):
+        pids = worker_pids(parent)
+        if len(pids) == num_workers:
+            return pids
+        time.sleep(0.1)
+    raise AssertionError(f"Expected {num_workers} workers, found {pids}")
+
+
+def wait_for_new_workers(parent, old_pids):
+    """Wait until none of old_pids is a worker of parent, return the PIDs."""
+    for _ in range(50):
+        pids = worker_pids(parent)
+        if len(pids) == len(old_pids) and not pids & old_pids:
+            return pids
+        time.sleep(0.1)
+    raise AssertionError(f"Workers {old_pids} were not replaced")
+
+
+def test_prefork():
+    """Workers serve requests, are restarted when they die, and stop.
+
+    The server is started with the interpreter running the tests, because
+    the index-serve script may not be installed.
+    """
+    port = LiveIndexServer.get_open_port()
+    url = f"http://localhost:{port}/api/v1/"
+    with subprocess.Popen(
+        [
+            sys.executable, "-c", "import index.prefork; index.prefork.main()",
+            "--host", "localhost", "--port", str(port), "--workers", "2",
+        ],
+        env={**os.environ, "INDEX_PATH": "inverted_index_1.txt"},
+    ) as parent:
+        try:
+            pids = wait_for_workers(parent, 2)
+            for _ in range(4):
+                assert requests.get(url, timeout=5).status_code == 200
+
+            # Metrics of every worker are reported by any worker
+            for _ in range(4):
+                assert requests.get(url + "hits/", params={"q": "hello"},
+                                    timeout=5).status_code == 200
+            scrapes = [requests.get(url + "metrics/", timeout=5).json()
+                       for _ in range(4)]
+            assert all(scrape["latency_ms"]["total"]["count"] == 4
+                       for scrape in scrapes)
+            assert {scrape["pid"] for scrape in scrapes} <= pids
+
+            # A worker that dies is replaced
+            os.kill(pids.pop(), signal.SIGKILL)
+            new_pids = wait_for_workers(parent, 2)
+            assert pids < new_pids
+            for _ in range(4):
+                assert requests.get(url, timeout=5).status_code == 200
+        finally:
+            parent.terminate()
+            parent.wait(timeout=5)
+        assert parent.returncode == 0
+    assert not worker_pids(parent)
+
+
+def test_prefork_reload():
+    """A reload in any worker reaches every worker, even restarted ones."""
+    port = LiveIndexServer.get_open_port()
+    url = f"http://localhost:{port}/api/v1/reload/"
+    with subprocess.Popen(
+        [
+            sys.executable, "-c", "import index.prefork; index.prefork.main()",
+            "--host", "localhost", "--port", str(port), "--workers", "2",
+        ],
+        env={**os.environ, "INDEX_PATH": "inverted_index_1.txt"},
+    ) as parent:
+        try:
+            pids = wait_for_workers(parent, 2)
+            response = requests.post(
+                url, params={"index_path": "inverted_index_2.txt"}, timeout=5
+            )
+            assert response.status_code == 202
+
+            # The parent loads the segment and replaces both workers
+            pids = wait_for_new_workers(parent, pids)
+            for _ in range(4):
+                status = requests.get(url, timeout=5).json()
+                assert status["index_path"] == "inverted_index_2.txt"
+                assert status["generation"] == 1
+
+            # A worker restarted after the reload serves the new segment
+            os.kill(pids.pop(), signal.SIGKILL)
+            pids = wait_for_workers(parent, 2)
+            for _ in range(4):
+                status = requests.get(url, timeout=5).json()
+                assert status["index_path"] == "inverted_index_2.txt"
+
+            # SIGHUP reloads the serving segment file in every worker
+            parent.send_signal(signal.SIGHUP)
+            wait_for_new_workers(parent, pids)
+            for _ in range(4):
+                assert requests.get(url, timeout=5).json()["generation"] == 2
+        finally:
+            parent.terminate()
+            parent.wait(timeout=5)
+        assert parent.returncode == 0
+    assert not worker_pids(parent)
@@ -0,0 +1,82 @@
+"""Index Server segment reload tests."""
+import time
+import index
+import index.api.main
+import index.cache
+
+
+def wait_for_reload(index_client):
+    """Wait until no segment is loading, return the reload status."""
+    for _ in range(50):
+        status = index_client.get("/api/v1/reload/").get_json()
+        if status["loading"] is None:
+            return status
+        time.sleep(0.1)
+    raise AssertionError("Segment did not finish loading")
+
+
+def test_reload(index_client, mocker, tmp_path):
+    """A new segment is swapped in, a broken one leaves the old one serving.
+
+    'index_client' is a fixture fuction that provides a Flask test server
+    interface. It is implemented in conftest.py and reused by many tests.
+    Docs: https://docs.pytest.org/en/latest/fixture.html
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a small one and points the index server at a temporary
+    inverted_index directory for this test.
+
+    'tmp_path' is a fixture provided by pytest.  It creates a temporary
+    directory for use within this test.
+    Docs: https://docs.pytest.org/en/latest/how-to/tmp_path.html
+    """
+    mocker.patch.dict(index.api.main.serving, {"segment": {
+        "index_path": "inverted_index_0.txt",
+        "generation": 0,
+        "inverted_index": {"apple": [1.0, {10: [1.0, 1.0]}]},
+    }})
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(16))
+    mocker.patch.object(index.api.main, "pagerank", {10: 0.1, 20: 0.2})
+    mocker.patch.dict(index.app.config, {"PATH": str(tmp_path)})
+    (tmp_path/"inverted_index").mkdir()
+    (tmp_path/"inverted_index"/"inverted_index_0.txt").write_text(
+        "apple 1.0 10 1 1.0 20 1 1.0\n", encoding="utf-8")
+
+    response = index_client.get("/api/v1/hits/?q=apple&w=1")
+    assert [hit["docid"] for hit in response.get_json()["hits"]] == [10]
+
+    # Reload the same segment file after it was rebuilt
+    response = index_client.post("/api/v1/reload/")
+    assert response.status_code in (200, 202)
+    status = wait_for_reload(index_client)
+    assert status == {"index_path": "inverted_index_0.txt",
+                      "generation": 1, "loading": None, "error": None}
+    assert index.api.main.query_cache.stats()["size"] == 0
+    response = index_client.get("/api/v1/hits/?q=apple&w=1")
+    assert [hit["docid"] for hit in response.get_json()["hits"]] == [20, 10]
+
+    # A missing segment is reported and the old one keeps serving
+    response = index_client.post("/api/v1/reload/?index_path=missing.txt")
+    assert response.status_code in (200, 202)
+    status = wait_for_reload(index_client)
+    assert status["generation"] == 1
+    assert status["error"].startswith("missing.txt")
+    response = index_client.get("/api/v1/hits/?q=apple&w=1")
+    assert [hit["docid"] for hit in response.get_json()["hits"]] == [20, 10]
+
+    # A truncated segment is reported, and later reloads are not refused
+    (tmp_path/"inverted_index"/"truncated.txt").write_text(
+        "apple 1.0 10 1 1.0 20 1\n", encoding="utf-8")
+    response = index_client.post("/api/v1/reload/?index_path=truncated.txt")
+    assert response.status_code in (200, 202)
+    status = wait_for_reload(index_client)
+    assert status["generation"] == 1
+    assert status["error"].startswith("truncated.txt")
+    response = index_client.post("/api/v1/reload/")
+    assert response.status_code in (200, 202)
+    assert wait_for_reload(index_client)["generation"] == 2
+
+    # Segments outside the inverted_index directory are refused
+    response = index_client.post("/api/v1/reload/?index_path=../x.txt")
+    assert response.status_code == 400
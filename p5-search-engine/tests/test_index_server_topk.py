@@ -0,0 +1,40 @@
+"""Index Server top-k tests."""
+import index.api.main
+import index.cache
+
+
+def test_top_k(index_client, mocker):
+    """Only the k best hits are returned, ties broken by doc ID.
+
+    'index_client' is a fixture fuction that provides a Flask test server
+    interface. It is implemented in conftest.py and reused by many tests.
+    Docs: https://docs.pytest.org/en/latest/fixture.html
+
+    'mocker' is a fixture provided by pytest-mock.  It replaces the loaded
+    segment with a small one for this test.
+    """
+    mocker.patch.dict(index.api.main.serving["segment"], {"inverted_index": {
+        "apple": [1.0, {
+            doc_id: [1.0, 1.0] for doc_id in (30, 10, 20, 40, 50)
+        }],
+    }})
+    mocker.patch.object(index.api.main, "query_cache",
+                        index.cache.QueryCache(0))
+    mocker.patch.object(index.api.main, "pagerank", {
+        10: 0.1, 20: 0.3, 30: 0.3, 40: 0.2, 50: 0.3,
+    })
+
+    # All hits by default
+    response = index_client.get("/api/v1/hits/?q=apple&w=1")
+    assert response.status_code == 200
+    all_hits = response.get_json()["hits"]
+    assert [hit["docid"] for hit in all_hits] == [20, 30, 50, 40, 10]
+
+    # The k best, in the same order
+    for k in range(1, 7):
+        response = index_client.get(f"/api/v1/hits/?q=apple&w=1&k={k}")
+        assert response.status_code == 200
+        assert response.get_json()["hits"] == all_hits[:k]
+
+    response = index_client.get("/api/v1/hits/?q=apple&w=1&k=0")
+    assert response.status_code == 400